@@ -2,19 +2,25 @@
 """Automate adding a newly bought player to the _monitoring system_"""
 from datetime import    datetime
 
+from cache import response_cache_from_args
+from com_metrics import com_metrics_from_args, recording_com_calls
 import common
 from data import Source, ExtraPlayerInfo, Age
-from excel import Excel
 from hattrick import Hattrick
+from metrics import recording, request_metrics_from_args
+from session_store import session_store_from_args
 
 
 def _add_player(args):
     """Get all the stuff we need for a new player and add him to the monitoring system"""
     player_name = args.name
-    read_only = getattr(args, common.READ_ONLY_ARG)
-    ht = Hattrick(args.currency, args.user, args.password)  # pylint: disable=invalid-name
-    xl = Excel(args.spreadsheet, read_only)  # pylint: disable=invalid-name
-    with ht, xl:
+    cache = response_cache_from_args(args)
+    session_store = session_store_from_args(args)
+    ht = Hattrick(args.currency, args.user, args.password,  # pylint: disable=invalid-name
+                  cache=cache, session_store=session_store)
+    xl = common.persistence_from_args(args)  # pylint: disable=invalid-name
+    com_metrics = com_metrics_from_args(args)
+    with recording(request_metrics_from_args(args)), recording_com_calls(com_metrics), ht, xl:
         players_list_page = ht.download_player_list_page()
         player = ht.download_player_by_name(player_name, players_list_page)
         player.fill_from_cli_or_user(args)
@@ -0,0 +1,240 @@
+# coding=utf-8
+"""The asyncio flavour of the Hattrick scraper
+It shares the login flow and all the page parsing with the blocking `hattrick`
+module, only the downloading is done by awaitable aiohttp requests, so hundreds
+of page downloads can overlap on a single thread.
+"""
+import asyncio
+import sys
+import traceback
+from typing import Any, AsyncIterator, Iterable, Optional
+
+import aiohttp
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from data import Player, Team
+from hattrick import (
+    Hattrick, HtLink, PageType, OptionalInt, OptionalString, _ensure_login, _ensure_no_app_error,
+)
+
+
+def _cookie_header(session: aiohttp.ClientSession, url: str) -> str:
+    """Return the Cookie header value the `session` sends to `url`"""
+    cookies = session.cookie_jar.filter_cookies(url)
+    return "; ".join("{}={}".format(key, morsel.value) for (key, morsel) in cookies.items())
+
+
+def _to_page(response: aiohttp.ClientResponse, body: bytes, cookie_header: str) -> PageType:
+    """Convert a fully read aiohttp `response` into the requests response type that
+    all the parsing helpers of the `hattrick` module expect
+    """
+    # pylint: disable=protected-access
+    page = requests.models.Response()
+    page.status_code = response.status
+    page.reason = response.reason
+    page.url = str(response.url)
+    page.headers = CaseInsensitiveDict(response.headers)
+    page.encoding = response.charset
+    page._content = body
+    page._content_consumed = True
+
+    request = requests.models.PreparedRequest()
+    request.prepare(method=response.method, url=page.url, headers={"Cookie": cookie_header})
+    page.request = request
+    return page
+
+
+class AsyncHtLink:
+    """The awaitable hattrick link
+    Unlike HtLink, every instance has its own session and server state, and the
+    number of requests in flight is capped at `max_in_flight`
+    """
+
+    HEADER = HtLink.HEADER
+    MAX_IN_FLIGHT = 20
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT):
+        self.app_error_pattern = None
+        self.server_id = None
+        self.server_url = None
+        self.session = None
+        self.max_in_flight = max_in_flight
+        self._in_flight = None
+
+    async def request(
+            self, link: str, use_headers: bool = True,
+            method: str = "get", data: Any = None) -> PageType:
+        """Request the download of the link using the live session and return
+        the HTML response
+        Raise an exception if the final response code isn't 200 (OK).
+        The `link` must be a complete URL while `server_url` is None
+        and must be a sub-link otherwise
+        Every request is reported to the HtLink hooks
+        """
+        server_url = self.server_url
+        link_url = "{}/{}".format(server_url, link) if server_url is not None else link
+
+        params = {}
+        if use_headers:
+            params["headers"] = self.HEADER
+        if data is not None:
+            params["data"] = data
+
+        with HtLink.reporting(method, link) as report:
+            async with self._in_flight:
+                async with self.session.request(method.upper(), link_url, **params) as response:
+                    body = await response.read()
+                    cookie_header = _cookie_header(self.session, str(response.url))
+                    page = _to_page(response, body, cookie_header)
+            page.raise_for_status()
+            _ensure_no_app_error(self.app_error_pattern, page, data)
+            report(page)
+
+        return page
+
+    def start_session(self):
+        """Start the live session"""
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+        cookie_jar = aiohttp.CookieJar(unsafe=True)  # keep cookies of IP addressed servers too
+        self.session = aiohttp.ClientSession(connector=connector, cookie_jar=cookie_jar)
+
+    async def close_session(self):
+        """End the live session"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+class AsyncHattrick(Hattrick):
+    """Represent an asyncio Hattrick login-session
+    Use it as `async with AsyncHattrick(...) as ht:` and await its download methods
+    """
+    # the blocking download methods are deliberately replaced by awaitable ones
+    # pylint: disable=invalid-overridden-method,arguments-differ
+
+    def __init__(self, currency: str, user: OptionalString = None,
+                 password: OptionalString = None, max_in_flight: int = AsyncHtLink.MAX_IN_FLIGHT,
+                 site_url: OptionalString = None):
+        """Initialise a new session before login
+        `max_in_flight` is the maximum number of concurrent requests
+        `site_url` replaces `SITE_URL` (see Hattrick)
+        """
+        super(AsyncHattrick, self).__init__(currency, user, password, max_in_flight,
+                                            site_url=site_url)
+        self.link = AsyncHtLink(max_in_flight)
+
+    def __enter__(self):
+        """Refuse the blocking login"""
+        raise TypeError("Use 'async with' to login with {}".format(type(self).__name__))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Never called as __enter__ always fails"""
+
+    async def __aenter__(self):
+        """Login to Hattrick
+        If any step fail, an exception is raised so if we managed to enter, we are in.
+        In case of an exception, __aexit__ will run, so don't worry.
+        """
+        try:
+            self.link.start_session()
+            print("Connecting... ", end="")
+            response = await self.link.request(self.MAIN_PAGE, use_headers=False)
+            print("done")
+
+            login_form = self._login_form(response)
+
+            print("Login... ", end="")
+            response = await self.link.request(self.LOGIN_PAGE, method="post", data=login_form)
+            _ensure_login(response)
+            self.logged_in = True
+
+            (self.link.server_url, self.link.server_id) = self._parse_login_response(response)
+            self.link.app_error_pattern = self._translate_to_page_language("app_error")
+        except Exception:
+            await self.__aexit__(*sys.exc_info())
+            raise
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Logout and exit the session too, if we were logged in and/or the session was live"""
+        if self.logged_in:
+            await self.link.request(self.LOGOUT_LINK)
+            self.logged_in = False
+            print("We're out! :)")
+
+        await self.link.close_session()
+
+    async def download_player_list_page(self):
+        """Return the player list page html response object"""
+        return await self.link.request(self._players_list_link())
+
+    async def _download_sell_price_etimation_page(self, player_page: PageType):
+        """Return the requested page's html response object"""
+        link = self._parse_transfer_compare_link(player_page)
+        price_estimation_page = await self.link.request(link)
+        if self._there_is_more_transfer_to_load(price_estimation_page):
+            form = self._load_more_transfers_form(price_estimation_page)
+            price_estimation_page = await self.link.request(link, method="post", data=form)
+        return price_estimation_page
+
+    async def download_player_by_name(self, name, players_list_page,
+                                      raise_exception_if_not_found=True):
+        """Return the Player object for the given `name`
+        Raise an exception or just return `None` depending on `raise_exception_if_not_found`
+        """
+        (entry, player) = self._find_player_on_list(
+            name, players_list_page, raise_exception_if_not_found)
+        if player is not None:
+            player_page = await self.link.request(player.link)
+
+            self._update_player_from_player_page(player, player_page)
+            price_estimation_page = await self._download_sell_price_etimation_page(player_page)
+            player.sell_base_price = self._parse_sell_base_price(price_estimation_page)
+
+            self._update_national_team_player_status_from_list(player, entry)
+
+        return player
+
+    async def _download_player_or_report(self, name, players_list_page) -> Optional[Player]:
+        """Return the downloaded player or None if it failed, in which case the error
+        is printed
+        """
+        try:
+            player = await self.download_player_by_name(name, players_list_page)
+        except Exception:  # pylint: disable=broad-except
+            print("Failed to download '{}':".format(name))
+            traceback.print_exc()
+            player = None
+        return player
+
+    async def download_players(
+            self, names: Iterable[str], players_list_page: PageType,
+            max_workers: OptionalInt = None) -> AsyncIterator[Player]:
+        """Download the players named in `names` concurrently and yield each
+        Player object as soon as it is ready (i.e. not necessarily in the order of `names`)
+        The number of requests in flight is capped by the link, `max_workers` is
+        only accepted for compatibility with Hattrick.download_players.
+        If downloading a player fails, the error is printed and the rest of the
+        batch carries on.
+        """
+        del max_workers  # the link's in-flight cap does the limiting
+        tasks = [
+            asyncio.ensure_future(self._download_player_or_report(name, players_list_page))
+            for name in names
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                player = await next_done
+                if player is not None:
+                    yield player
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def download_team(self) -> Team:
+        """Return the Team object for our beloved team"""
+        finance_page = await self.link.request(self._team_finance_link())
+        return self._parse_team_finance(finance_page)
@@ -0,0 +1,213 @@
+# coding=utf-8
+"""The persistent on-disk HTTP response cache of the scraper
+Responses are saved into one file per request under the cache directory: a JSON line
+of the status, URL, headers and encoding followed by the raw body bytes. Nothing
+in there is ever executed, so a writable cache directory can't run code.
+Every link category has its own time-to-live and the directory is kept under a
+size limit by evicting the least recently used responses first.
+"""
+from concurrent.futures import Future
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import common
+
+
+HOUR = 60 * 60
+
+# only the pages of these link categories are cached, everything else (e.g. login)
+# is always downloaded
+DEFAULT_TTL_OF_LINK_CATEGORY = {
+    "players_list": 12 * HOUR,
+    "player": 12 * HOUR,
+    "finance": 12 * HOUR,
+    "transfer_compare": 72 * HOUR,
+}
+
+DEFAULT_MAX_SIZE = 100 * 1024 * 1024  # bytes
+
+CACHE_FILE_SUFFIX = ".response"
+
+
+def _request_key(method: str, link: str, data: Any) -> str:
+    """Return the cache key of a request as a hex digest"""
+    form_items = sorted(data.items()) if isinstance(data, dict) else data
+    raw_key = repr((method.lower(), link, form_items))
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+def _dump_response(saved_at: float, response: requests.Response, cache_file):
+    """Write the `response` saved at `saved_at` into the binary `cache_file`"""
+    request = response.request
+    meta = {
+        "saved_at": saved_at,
+        "status": response.status_code,
+        "reason": response.reason,
+        "url": response.url,
+        "headers": dict(response.headers),
+        "encoding": response.encoding,
+        "method": None if request is None else request.method,
+    }
+    cache_file.write(json.dumps(meta).encode("utf-8"))
+    cache_file.write(b"\n")
+    cache_file.write(response.content)
+
+
+def _read_response(cache_file):
+    """Return the (saved_at, response) pair read from the binary `cache_file`
+    Raise a ValueError (or a KeyError) if the file is malformed
+    """
+    meta = json.loads(cache_file.readline().decode("utf-8"))
+    # pylint: disable=protected-access
+    response = requests.models.Response()
+    response.status_code = int(meta["status"])
+    response.reason = meta["reason"]
+    response.url = meta["url"]
+    response.headers = CaseInsensitiveDict(meta["headers"])
+    response.encoding = meta["encoding"]
+    response._content = cache_file.read()
+    response._content_consumed = True
+    if meta["method"] is not None:
+        request = requests.models.PreparedRequest()
+        request.prepare(method=meta["method"], url=response.url)
+        response.request = request
+    return (float(meta["saved_at"]), response)
+
+
+class ResponseCache:
+    """A size-bounded LRU response cache on disk with per-link-category TTLs
+    Identical requests made at the same time are only downloaded once (single-flight).
+    """
+
+    def __init__(self, directory: str, max_age: Optional[float] = None,
+                 max_size: int = DEFAULT_MAX_SIZE,
+                 ttl_of_link_category: Optional[Dict[str, float]] = None):
+        """`max_age` (in seconds), if specified, overrides the TTL of every cached
+        link category
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_size = max_size
+        ttls = dict(DEFAULT_TTL_OF_LINK_CATEGORY if ttl_of_link_category is None
+                    else ttl_of_link_category)
+        if max_age is not None:
+            ttls = {category: max_age for category in ttls}
+        self.ttl_of_link_category = ttls
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        """Return the file path of the cached response for `key`"""
+        return os.path.join(self.directory, key + CACHE_FILE_SUFFIX)
+
+    def _load(self, key: str, ttl: float):
+        """Return the cached response for `key` or None if it's missing or expired"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as cache_file:
+                (saved_at, response) = _read_response(cache_file)
+        except (OSError, ValueError, KeyError, TypeError):
+            response = None
+        else:
+            if time.time() - saved_at > ttl:
+                response = None
+            else:
+                os.utime(path)  # the modification time is our LRU clock
+        return response
+
+    def _save(self, key: str, response):
+        """Save the `response` for `key` atomically and evict old responses if needed"""
+        (handle, temp_path) = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(handle, "wb") as cache_file:
+                _dump_response(time.time(), response, cache_file)
+            os.replace(temp_path, self._path(key))
+        except Exception:
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+            raise
+        self._evict()
+
+    def _evict(self):
+        """Remove the least recently used responses while the cache is too big"""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(CACHE_FILE_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size = sum(size for (_, size, _) in entries)
+            for (_, size, path) in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+                total_size -= size
+
+    def _fetch_single_flight(self, key: str, ttl: float, download: Callable[[], Any]):
+        """Return the cached response for `key` or download and cache it
+        If the same `key` is being fetched already, wait for that instead
+        """
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            is_leader = in_flight is None
+            if is_leader:
+                in_flight = self._in_flight[key] = Future()
+
+        if is_leader:
+            try:
+                response = self._load(key, ttl)
+                hit = response is not None
+                with self._lock:
+                    if hit:
+                        self.hits += 1
+                    else:
+                        self.misses += 1
+                if not hit:
+                    response = download()
+                    self._save(key, response)
+                in_flight.set_result(response)
+            except BaseException as error:
+                in_flight.set_exception(error)
+                raise
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+        else:
+            response = in_flight.result()
+        return response
+
+    def fetch(self, link_category: str, method: str, link: str, data: Any,
+              download: Callable[[], Any]):
+        """Return the cached response of the request or `download()` it (and cache it,
+        if the `link_category` is cacheable)
+        """
+        ttl = self.ttl_of_link_category.get(link_category)
+        if ttl is None:
+            response = download()
+        else:
+            response = self._fetch_single_flight(_request_key(method, link, data), ttl, download)
+        return response
+
+
+def response_cache_from_args(args) -> Optional[ResponseCache]:
+    """Return the ResponseCache configured on the command line or None if caching is off"""
+    directory = getattr(args, common.CACHE_DIR_ARG)
+    if directory is None:
+        cache = None
+    else:
+        max_age_in_hours = getattr(args, common.CACHE_MAX_AGE_ARG)
+        max_age = None if max_age_in_hours is None else max_age_in_hours * HOUR
+        cache = ResponseCache(directory, max_age=max_age)
+    return cache
@@ -0,0 +1,106 @@
+# coding=utf-8
+"""Per-operation COM round trips of the excel persistence module
+A ComMetrics is a sheet.ComCalls hook: it counts the round trips to the Excel application
+by kind (read, write, format and copy) for every Excel operation (e.g. update_player) and
+sums the wall time of the operations. At the end of a run it prints a summary table and
+exports the numbers as JSON.
+"""
+import contextlib
+import json
+from typing import Optional
+
+import common
+from sheet import ComCalls, ROUND_TRIP_KINDS
+
+
+# the round trips outside of every operation are attributed to this one
+NO_OPERATION = "(other)"
+
+
+class ComMetrics:
+    """Collect the COM round trips and the timings of the Excel operations of a run"""
+
+    def __init__(self, export_path: Optional[str] = None):
+        """`export_path` is where `recording_com_calls` exports the metrics to as JSON"""
+        self.export_path = export_path
+        self.round_trips_of_operation = {}
+        self.calls_of_operation = {}
+        self.seconds_of_operation = {}
+
+    def round_trip(self, operation: Optional[str], kind: str):
+        """Record a round trip of the `kind` made by the `operation` (if any)"""
+        round_trips = self.round_trips_of_operation.setdefault(
+            operation or NO_OPERATION, dict.fromkeys(ROUND_TRIP_KINDS, 0))
+        round_trips[kind] += 1
+
+    def operation_done(self, operation: str, seconds: float):
+        """Record a finished (or failed) operation"""
+        self.calls_of_operation[operation] = self.calls_of_operation.get(operation, 0) + 1
+        self.seconds_of_operation[operation] = (
+            self.seconds_of_operation.get(operation, 0.0) + seconds)
+
+    def summary(self) -> dict:
+        """Return the per-operation statistics and their total (see `to_json`)"""
+        operations = []
+        names = sorted(set(self.round_trips_of_operation) | set(self.calls_of_operation))
+        for name in names:
+            round_trips = self.round_trips_of_operation.get(
+                name, dict.fromkeys(ROUND_TRIP_KINDS, 0))
+            operations.append({
+                "operation": name,
+                "calls": self.calls_of_operation.get(name, 0),
+                "seconds": self.seconds_of_operation.get(name, 0.0),
+                "round_trips": sum(round_trips.values()),
+                **round_trips,
+            })
+        total = {
+            key: sum(operation[key] for operation in operations)
+            for key in ("calls", "seconds", "round_trips") + ROUND_TRIP_KINDS
+        }
+        return {"operations": operations, "total": total}
+
+    def summary_table(self) -> str:
+        """Return the summary as a printable table"""
+        summary = self.summary()
+        row_format = "{:<24} {:>5} {:>9} {:>7} {:>6} {:>6} {:>6} {:>6}"
+        lines = [row_format.format("operation", "calls", "seconds", "trips", *ROUND_TRIP_KINDS)]
+        for operation in summary["operations"] + [dict(summary["total"], operation="total")]:
+            lines.append(row_format.format(
+                operation["operation"], operation["calls"],
+                "{:.3f}".format(operation["seconds"]), operation["round_trips"],
+                *(operation[kind] for kind in ROUND_TRIP_KINDS)
+            ))
+        return "\n".join(lines)
+
+    def to_json(self) -> str:
+        """Return the summary as JSON"""
+        return json.dumps(self.summary(), indent=2)
+
+    def export(self, path: str):
+        """Write the metrics into `path` as JSON"""
+        with open(path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(self.to_json())
+
+
+@contextlib.contextmanager
+def recording_com_calls(metrics: Optional[ComMetrics]):
+    """Record the COM round trips into `metrics` (if any) while in the context, then
+    print the summary table and export the metrics into its `export_path` (if any)
+    """
+    if metrics is None:
+        yield
+    else:
+        ComCalls.add_hook(metrics)
+        try:
+            yield
+        finally:
+            ComCalls.remove_hook(metrics)
+            print(metrics.summary_table())
+            if metrics.export_path is not None:
+                metrics.export(metrics.export_path)
+
+
+def com_metrics_from_args(args) -> Optional[ComMetrics]:
+    """Return the ComMetrics configured on the command line or None"""
+    path = getattr(args, common.COM_METRICS_ARG)
+    return None if path is None else ComMetrics(export_path=path or None)
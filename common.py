@@ -8,6 +8,14 @@ import traceback
 
 READ_ONLY_ARG = "read_only"
 PAUSE_ARG = "pause"
+WORKERS_ARG = "workers"
+CACHE_DIR_ARG = "cache_dir"
+CACHE_MAX_AGE_ARG = "cache_max_age"
+SESSION_FILE_ARG = "session_file"
+METRICS_ARG = "metrics"
+SHADOW_WORKBOOK_ARG = "shadow_workbook"
+BACKEND_ARG = "backend"
+COM_METRICS_ARG = "com_metrics"
 
 
 class UserInputWasCancelled(Exception):
@@ -20,7 +28,7 @@ def cli_arg_parser():
         description="Let me help you with that repetitive stuff..."
     )
     parser.add_argument("-s", "--spreadsheet", required=True,
-                        help="the spreadsheet to be used as our database")
+                        help="the spreadsheet (or the SQLite history) to be used as our database")
     parser.add_argument("-c", "--currency", required=False, help="the currency HT uses",
                         default="eFt")
     parser.add_argument("-u", "--user", required=False, help="the hattrick user")
@@ -30,9 +38,52 @@ def cli_arg_parser():
     parser.add_argument("-r", "--{}".format(READ_ONLY_ARG), required=False,
                         help="run in read-only persistence layer mode",
                         action="store_true")
+    parser.add_argument("-d", "--{}".format(CACHE_DIR_ARG), required=False,
+                        help="cache the downloaded hattrick pages in this directory")
+    parser.add_argument("-m", "--{}".format(CACHE_MAX_AGE_ARG), required=False, type=float,
+                        help="override the max age (in hours) of every cached page")
+    parser.add_argument("-k", "--{}".format(SESSION_FILE_ARG), required=False,
+                        help=("keep the hattrick session in this file (only readable by you)"
+                              " and reuse it next time instead of logging in again"))
+    parser.add_argument("-M", "--{}".format(METRICS_ARG), required=False,
+                        help=("print the hattrick request statistics at the end and export them"
+                              " into this file (JSON if it ends with .json, Prometheus text"
+                              " otherwise)"))
+    parser.add_argument("-W", "--{}".format(SHADOW_WORKBOOK_ARG), required=False,
+                        help=("read every sheet of the spreadsheet once and only write back the"
+                              " changed cells at the end"),
+                        action="store_true")
+    parser.add_argument("-B", "--{}".format(BACKEND_ARG), required=False,
+                        choices=("xlwings", "openpyxl", "sqlite"), default="xlwings",
+                        help=("open the spreadsheet in Excel (xlwings), read and write the"
+                              " .xlsx file directly without Excel (openpyxl) or keep the history in"
+                              " an SQLite database instead (sqlite)"))
+    parser.add_argument("-X", "--{}".format(COM_METRICS_ARG), required=False, nargs="?",
+                        const="",
+                        help=("print the COM round trips (and the times) of the Excel operations"
+                              " at the end and export them into this JSON file (if it's given)"))
     return parser
 
 
+def persistence_from_args(args):
+    """Return the persistence layer chosen on the command line
+    (the Excel workbook or the SQLite history, they have the same interface)
+    """
+    # the persistence modules import this one
+    # pylint: disable=import-outside-toplevel
+    from excel import Excel
+    from history import HistoryStore, SQLITE_BACKEND
+
+    read_only = getattr(args, READ_ONLY_ARG)
+    backend = getattr(args, BACKEND_ARG)
+    if backend == SQLITE_BACKEND:
+        persistence = HistoryStore(args.spreadsheet, read_only)
+    else:
+        persistence = Excel(args.spreadsheet, read_only, getattr(args, SHADOW_WORKBOOK_ARG),
+                            backend)
+    return persistence
+
+
 @contextlib.contextmanager
 def maybe_pause_at_the_end(pause):
     """pause at the end if `pause` is True"""
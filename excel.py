@@ -1,32 +1,25 @@
 # coding=utf-8
 """The excel persistence module"""
-from abc import abstractmethod
 from collections import namedtuple
 import contextlib
 from datetime import date, datetime, timedelta
+import functools
+import json
 import os.path
-import re
 import sys
 from typing import Any, Dict, List
-import xlwings as xl
-from xlwings.utils import rgb_to_int
-
-from overrides import overrides
 
 from data import Player, Team, NUM_AUCTION_DAYS
+from sheet import (FIRST_ROW, FIRST_COLUMN, ComCalls, HeaderIndex, Sheet, ValueAndFormat,
+                   NtpValueAndFormat, ValueWithNormalFormat, contiguous_spans, is_formula)
+from xlsx import XlsxWorkbook
 
 
-CellType = xl.Range
-RangeType = xl.Range
-RowType = xl.Range
-ColumnType = xl.Range
-SheetType = xl.Sheet
-SheetsType = List[SheetType]
+XLWINGS_BACKEND = "xlwings"  # the workbook is opened in the Excel application
+OPENPYXL_BACKEND = "openpyxl"  # the .xlsx file is read and written directly
+BACKENDS = (XLWINGS_BACKEND, OPENPYXL_BACKEND)
 
-FIRST_CELL = "A1"
-FIRST_ROW = "1:1"
-FIRST_DATA_ROW = "2:2"
-FIRST_COLUMN = "A:A"
+FIRST_DATA_ROW_NUMBER = 2
 
 SOLD_PLAYER_MARKER = '$'
 NEW_PLAYER_MARKER = '@'
@@ -35,129 +28,125 @@ NEXT_PLAYER_NAME_ATTRIBUTE = "next_player_name"
 DATE_COLUMN = "Dátum"
 BUY_PRICE_COLUMN = "Vételi ár"
 
+TEAM_SHEET = "Csapat"
+TOTAL_LABEL = "Összesen"
+BOARD_RESERVES_LABEL = "Az igazgatóság tartaléka"
+TEAM_LABELS_SEARCH_SIZE = 49  # the labels are looked for in the top left 49x49 cells
 
-def _is_player_sheet(sheet: SheetType):
-    """Return whether the specified sheet is a player sheet"""
-    return sheet[FIRST_CELL].value == DATE_COLUMN
+# the layout file remembers where things were found in the workbook for the next run
+LAYOUT_FILE_SUFFIX = ".layout.json"
+TEAM_LABELS_LAYOUT_KEY = "team_labels"
 
 
-def _update_value_next_to_named_cell(cell: CellType, name: str, value: Any):
-    """Update the value of the cell on the right side of the named cell
-    iff the cell is indeed the named cell.
-    """
-    if cell.value == name:
-        next_cell = cell.offset(row_offset=0, column_offset=1)
-        next_cell.value = value
-        found = True
-    else:
-        found = False
-    return found
+def _is_player_sheet(sheet: Sheet):
+    """Return whether the specified sheet is a player sheet"""
+    return sheet.value(1, 1) == DATE_COLUMN
 
 
-def _find_cell_by_name(cells: RangeType, value: str, num_empty_cells_means_eor=3):
-    """Return the cell if it was found in the range, or None
-    The range is ended if there are `num_empty_cells_means_eor` consecutive empty
-    cells in it
+def _find_labels_in_grid(grid: List[list], labels: List[str], first_cell=(1, 1)) -> Dict:
+    """Return the (row, column) cell of the first occurrence (row by row) of each label
+    found in the `grid` read from `first_cell` on
     """
-    named_cell = None
-    none_counter = 0
-    for cell in cells:
-        if cell.value is None:
-            none_counter += 1
-        else:
-            none_counter = 0
-            if cell.value == value:
-                named_cell = cell
-                break
-        if none_counter == num_empty_cells_means_eor:
-            break
-    return named_cell
-
-
-def _cell_by_row_and_header(sheet: SheetType, row_number: int, header_name: str):
-    """Find and return a cell based on its `header_name` and `row_number`"""
-    headers = sheet[FIRST_ROW]
-    header = _find_cell_by_name(headers, header_name)
-    if header is None:
-        raise RuntimeError("Failed to find '{}' in '{}'!".format(header_name, headers))
-    return sheet.range(row_number, header.column)
-
-
-def _cell_by_column_and_header(sheet: SheetType, column_number: int, header_name: str):
-    """Find and return a cell based on its `header_name` and `column_number`"""
-    headers = sheet[FIRST_COLUMN]
-    header = _find_cell_by_name(headers, header_name)
-    if header is None:
-        raise RuntimeError("Failed to find '{}' in '{}'!".format(header_name, headers))
-    return sheet.range(header.row, column_number)
-
-
-class ValueAndFormat:  # pylint: disable=too-few-public-methods
-    """Store a value and allow custom cell formatting via inheritance"""
-
-    def __init__(self, value):
-        self.value = value
-
-    @abstractmethod
-    def format_cell_win32(self, cell: CellType):
-        """The abstract cell formatter function
-        WARNING: this makes the script Windows dependent!
-        """
+    cell_of_label = {}
+    for (row_index, row) in enumerate(grid):
+        for (column_index, value) in enumerate(row):
+            if value in labels and value not in cell_of_label:
+                cell_of_label[value] = (first_cell[0] + row_index, first_cell[1] + column_index)
+    return cell_of_label
 
 
-class NtpValueAndFormat(ValueAndFormat):  # pylint: disable=too-few-public-methods
-    """National Team Player formatter"""
+def _labels_are_still_there(sheet: Sheet, cell_of_label: Dict) -> bool:
+    """Return whether all the labels are still in their (row, column) cells
+    (checked with one read of the cells' bounding rectangle)
+    """
+    rows = [row for (row, _) in cell_of_label.values()]
+    columns = [column for (_, column) in cell_of_label.values()]
+    first_cell = (min(rows), min(columns))
+    grid = sheet.read(first_cell, (max(rows), max(columns)))
+    return all(
+        grid[row - first_cell[0]][column - first_cell[1]] == label
+        for (label, (row, column)) in cell_of_label.items()
+    )
+
+
+def _find_labels(sheet: Sheet, labels: List[str], remembered_cell_of_label: Dict) -> Dict:
+    """Return the (row, column) cells of the labels found on the sheet
+    The remembered cells are checked first, the used range (up to
+    TEAM_LABELS_SEARCH_SIZE rows and columns) is only read if they are outdated.
+    """
+    if (remembered_cell_of_label and set(remembered_cell_of_label) == set(labels)
+            and _labels_are_still_there(sheet, remembered_cell_of_label)):
+        cell_of_label = remembered_cell_of_label
+    else:
+        (last_row, last_column) = sheet.last_cell()
+        grid = sheet.read((1, 1), (min(last_row, TEAM_LABELS_SEARCH_SIZE),
+                                   min(last_column, TEAM_LABELS_SEARCH_SIZE)))
+        cell_of_label = _find_labels_in_grid(grid, labels)
+    return cell_of_label
 
-    def __init__(self):
-        super(NtpValueAndFormat, self).__init__("IGEN!!!")
 
-    @overrides
-    def format_cell_win32(self, cell: CellType):
-        """Apply the emblematic NTP formatting to the cell
-        WARNING: this makes the script Windows dependent!
-        """
-        cell.api.Font.Bold = True
-        nice_green = (0, 176, 80)
-        cell.api.Font.Color = rgb_to_int(nice_green)
+def _load_layout(path: str) -> dict:
+    """Return the remembered layout of the workbook (empty if there's none)"""
+    try:
+        with open(path, encoding="utf-8") as layout_file:
+            layout = json.load(layout_file)
+    except (OSError, ValueError):
+        layout = {}
+    return layout
 
 
-class ValueWithNormalFormat(ValueAndFormat):  # pylint: disable=too-few-public-methods
-    """Normal format with no special colour or font or anything"""
+def _save_layout(path: str, layout: dict):
+    """Remember the `layout` of the workbook for the next run (if we can)"""
+    try:
+        with open(path, "w", encoding="utf-8") as layout_file:
+            json.dump(layout, layout_file, indent=2, ensure_ascii=False)
+    except OSError as error:
+        print("(failed to remember the layout: {}) ".format(error), end="")
 
-    @overrides
-    def format_cell_win32(self, cell: CellType):
-        """(Re-)set the format to the normal
-        WARNING: this makes the script Windows dependent!
-        """
-        cell.api.Font.Bold = False
-        black = (0, 0, 0)
-        cell.api.Font.Color = rgb_to_int(black)
 
+def _format_cells(sheet: Sheet, value_of_cell: Dict[tuple, Any]):
+    """Apply the formats of the ValueAndFormat values to their (row, column) cells
+    All the cells of a format type are formatted together (see LiveSheet.format)
+    """
+    cells_of_type = {}
+    for (cell, generic_value) in value_of_cell.items():
+        if isinstance(generic_value, ValueAndFormat):
+            (_, cells) = cells_of_type.setdefault(type(generic_value), (generic_value, []))
+            cells.append(cell)
 
-def _set_and_maybe_format_cell(cell: CellType, generic_value):
-    """Set the `cell`'s value and also format it if `generic_value` is of type ValueAndFormat"""
-    if isinstance(generic_value, ValueAndFormat):
-        cell.value = generic_value.value
-        generic_value.format_cell_win32(cell)
-    else:
-        cell.value = generic_value
+    for (formatter, cells) in cells_of_type.values():
+        sheet.format(cells, formatter)
 
 
-def _update_row_based_on_map(sheet: SheetType, row_number: int, header_value_map: Dict) -> None:
-    """Update a row in the sheet based on the provided mapping"""
-    for (header, value) in header_value_map.items():
-        cell = _cell_by_row_and_header(sheet, row_number, header)
-        _set_and_maybe_format_cell(cell, value)
+def _update_row_based_on_map(sheet: Sheet, headers: HeaderIndex, row_number: int,
+                             header_value_map: Dict) -> None:
+    """Update a row in the sheet based on the provided mapping
+    Every span of adjacent cells is written at once and then formatted (see _format_cells)
+    """
+    value_of_column = {
+        headers.position_or_raise(header): value for (header, value) in header_value_map.items()
+    }
+    for (first_column, values) in contiguous_spans(value_of_column):
+        sheet.write((row_number, first_column), [values])
+    _format_cells(sheet, {(row_number, column): value
+                          for (column, value) in value_of_column.items()})
 
 
-def _update_column_based_on_map(sheet: SheetType, column_number: int, header_value_map: Dict):
-    """Update a column in the sheet based on the provided mapping"""
-    for (header, value) in header_value_map.items():
-        cell = _cell_by_column_and_header(sheet, column_number, header)
-        _set_and_maybe_format_cell(cell, value)
+def _update_column_based_on_map(sheet: Sheet, headers: HeaderIndex, column_number: int,
+                                header_value_map: Dict):
+    """Update a column in the sheet based on the provided mapping
+    Every span of adjacent cells is written at once and then formatted (see _format_cells)
+    """
+    value_of_row = {
+        headers.position_or_raise(header): value for (header, value) in header_value_map.items()
+    }
+    for (first_row, values) in contiguous_spans(value_of_row):
+        sheet.write((first_row, column_number), [[value] for value in values])
+    _format_cells(sheet, {(row, column_number): value for (row, value) in value_of_row.items()})
 
 
-def _update_player(player: Player, sheet: SheetType, row_number: int) -> None:
+def _update_player(player: Player, sheet: Sheet, headers: HeaderIndex,
+                   row_number: int) -> None:
     """Update the `player`'s info in the given `sheet` on the specified `row`"""
     is_ntp = player.ntp_status.is_national_team_player
     header_value_map = {
@@ -169,22 +158,26 @@ def _update_player(player: Player, sheet: SheetType, row_number: int) -> None:
         "Erőnlét": str(player.stamina),
         "Eladási alapár": player.sell_base_price,
     }
-    _update_row_based_on_map(sheet, row_number, header_value_map)
+    _update_row_based_on_map(sheet, headers, row_number, header_value_map)
+
+
+def _as_date(value):
+    """Return the value as a date if it's a datetime (or as it is otherwise)"""
+    return value.date() if isinstance(value, datetime) else value
 
 
-def _date_with_row(last_cell_with_value: CellType):
+def _date_with_row(sheet: Sheet, row_number: int):
     """Return a DateWithRow with "date" and "row" fields"""
-    date_of_last_update = last_cell_with_value.options(dates=date).value
-    row_number = last_cell_with_value.row
+    date_of_last_update = _as_date(sheet.value(row_number, 1))
     return namedtuple("DateWithRow", "date row")(date_of_last_update, row_number)
 
 
-def _check_and_try_fixing_date_of_last_update(last_cell_with_value: CellType) -> date:
+def _check_and_try_fixing_date_of_last_update(sheet: Sheet, row_number: int) -> date:
     """Check if it's sensible and convert to date if it's a string
     If it does not make sense (e.g. the value is None) -> RuntimeError
     If it's neither a date nor a string -> ValueError
     """
-    last_update = _date_with_row(last_cell_with_value)
+    last_update = _date_with_row(sheet, row_number)
     if last_update.date is None:
         raise RuntimeError("Failed to find the date of last update on row {}"
                            .format(last_update.row))
@@ -200,42 +193,28 @@ def _check_and_try_fixing_date_of_last_update(last_cell_with_value: CellType) ->
     return date_value
 
 
-def _get_row_by_number(sheet: SheetType, row_number: int) -> RowType:
-    """Return the row (aka range) of the sheet for row_number:row_number"""
-    return sheet.range("{row}:{row}".format(row=row_number))
-
-
-def _get_column_by_number(sheet: SheetType, column_number: int) -> ColumnType:
-    """Return the column (aka range) of the sheet for column_number:column_number"""
-    column_index = column_number - 1
-    _ensure_valid_index(column_index)
-    return sheet[:, column_index]
-
-
-def _get_todays_row(sheet: SheetType, last_cell_with_value: CellType, today: date) -> RowType:
-    """Get today's row which we might need to create as a copy of the previous
-    or just return it if it exists already.
+def _get_todays_row(sheet: Sheet, headers: HeaderIndex, last_row_with_value: int,
+                    today: date) -> int:
+    """Get the number of today's row which we might need to create as a copy of the
+    previous or just return it if it exists already.
     """
-    date_of_last_update = last_cell_with_value.options(dates=date).value
-    row_number = last_cell_with_value.row
+    date_of_last_update = _as_date(sheet.value(last_row_with_value, 1))
     if date_of_last_update == today:
-        todays_row = _get_row_by_number(sheet, row_number)
+        todays_row = last_row_with_value
     else:
-        previous_row = _get_row_by_number(sheet, row_number)
-        this_row = previous_row.row + 1
-        todays_row = _get_row_by_number(sheet, this_row)
-        previous_row.copy(destination=todays_row)
+        todays_row = last_row_with_value + 1
+        sheet.copy_row(last_row_with_value, todays_row)
 
         header_value_map = {
             DATE_COLUMN: today,
             BUY_PRICE_COLUMN: None,  # we only store it on the first row, but this is a copy
         }
-        _update_row_based_on_map(sheet, this_row, header_value_map)
+        _update_row_based_on_map(sheet, headers, todays_row, header_value_map)
     return todays_row
 
 
 @contextlib.contextmanager
-def _run_if_not_read_only(read_only: bool):
+def run_if_not_read_only(read_only: bool):
     """Only yield if we are not in `read_only` mode"""
     if read_only:
         print("skipped (read-only mode)")
@@ -244,38 +223,58 @@ def _run_if_not_read_only(read_only: bool):
         print("done")
 
 
-def _is_formula_cell(cell: CellType) -> bool:
-    """Return whether the specified cell contains a formula"""
-    return bool(re.search("^=", cell.formula))
+def _clear_until_first_formula(sheet: Sheet, first_cell: tuple, last_cell: tuple):
+    """Clear the cells of the rectangle (row by row) until the first formula
+    The formulas are read at once and the cells are cleared with (at most) two writes.
+    """
+    formulas = sheet.read_formulas(first_cell, last_cell)
+    num_cleared_rows = 0
+    num_cleared_cells_of_last_row = 0
+    for row_formulas in formulas:
+        formula_offsets = [offset for (offset, formula) in enumerate(row_formulas)
+                           if is_formula(formula)]
+        if formula_offsets:
+            num_cleared_cells_of_last_row = formula_offsets[0]
+            break
+        num_cleared_rows += 1
+
+    (first_row, first_column) = first_cell
+    if num_cleared_rows > 0:
+        sheet.write(first_cell, [[None] * len(formulas[0])] * num_cleared_rows)
+    if num_cleared_cells_of_last_row > 0:
+        sheet.write((first_row + num_cleared_rows, first_column),
+                    [[None] * num_cleared_cells_of_last_row])
 
 
 def _add_player_to_central_player_sheet(  # pylint: disable=too-many-arguments
-        player: Player, sheet: SheetType, headers: RowType,
+        player: Player, sheet: Sheet, headers: HeaderIndex,
         reserve_price_header: str, final_price_header: str, date_header: str) -> None:
     """Add player to the left of its next player sheet (or MAYDO just to the beginning
     if that's missing) and update its first column
+    The `headers` (of the first row) are invalidated as the columns are shifted.
     """
     next_player_name = getattr(player, NEXT_PLAYER_NAME_ATTRIBUTE, "Dunno")
     if next_player_name == "Dunno":
-        raise ValueError("Failed to find '{}' in '{}'!".format(player.name, headers))
+        raise ValueError("Failed to find '{}' in '{}'!{}".format(
+            player.name, sheet.name, FIRST_ROW))
     if next_player_name is None:  # the first player ever
         raise NotImplementedError("Add manually")  # MAYDO automate when everything else works
     # there is at least one more player
-    cell = _find_cell_by_name(headers, next_player_name)
-    if cell is None:
-        raise ValueError("Failed to find '{}' in '{}'!".format(next_player_name, headers))
-    next_player_range = _get_column_by_number(sheet, cell.column)
-    next_player_range = next_player_range.resize(column_size=2)
-    next_player_range.insert()
-    new_player_range = _get_column_by_number(sheet, next_player_range.column - 2)
-    new_player_range = new_player_range.resize(column_size=2)
-    next_player_range.copy(new_player_range)
-    for maybe_outdated_cell in new_player_range:
-        if _is_formula_cell(maybe_outdated_cell):
-            break
-        maybe_outdated_cell.value = None
-
-    update_column = new_player_range.column
+    next_player_column = headers.position(next_player_name)
+    if next_player_column is None:
+        raise ValueError("Failed to find '{}' in '{}'!{}".format(
+            next_player_name, sheet.name, FIRST_ROW))
+    num_player_columns = 2
+    sheet.insert_columns(next_player_column, num_player_columns)
+    headers.invalidate()
+    new_player_column = next_player_column
+    sheet.copy_columns(next_player_column + num_player_columns, new_player_column,
+                       num_player_columns)
+    (last_row, _) = sheet.last_cell()  # there's nothing to clear below the used range
+    _clear_until_first_formula(sheet, (1, new_player_column),
+                               (last_row, new_player_column + num_player_columns - 1))
+
+    update_column = new_player_column
     header_value_map = {
         "Név": player.name,
         "Forrás": player.extra.source.value,
@@ -288,8 +287,11 @@ def _add_player_to_central_player_sheet(  # pylint: disable=too-many-arguments
     return (update_column, header_value_map)
 
 
-def _update_central_player_sheet(player: Player, sheet: SheetType) -> None:
+def _update_central_player_sheet(player: Player, sheet: Sheet, row_headers: HeaderIndex,
+                                 column_headers: HeaderIndex) -> None:
     """Find an existing player in the sheet or add the new player and update its relevant values
+    The player names are the `row_headers` (of the first row) while the `column_headers`
+    (of the first column) name the values
     """
     base_header_value_map = {
         "Kor (év)": player.age.years,
@@ -302,17 +304,16 @@ def _update_central_player_sheet(player: Player, sheet: SheetType) -> None:
         "Gólszerzés": player.extra.skillz.scoring,
     }
 
-    headers = sheet[FIRST_ROW]
     reserve_price_header = "Kikiáltási ár"
     final_price_header = "Végső ár"
     date_header = "Érkezés -> Távozás"
-    cell = _find_cell_by_name(headers, player.name)
-    if cell is None:
+    player_column = row_headers.position(player.name)
+    if player_column is None:
         (update_column, specific_header_value_map) = _add_player_to_central_player_sheet(
-            player, sheet, headers, reserve_price_header, final_price_header, date_header
+            player, sheet, row_headers, reserve_price_header, final_price_header, date_header
         )
     else:
-        update_column = cell.column + 1
+        update_column = player_column + 1
         specific_header_value_map = {
             reserve_price_header: player.sell_base_price,
             final_price_header: player.sell_base_price,
@@ -320,89 +321,128 @@ def _update_central_player_sheet(player: Player, sheet: SheetType) -> None:
         }
 
     header_value_map = {**base_header_value_map, **specific_header_value_map}
-    _update_column_based_on_map(sheet, update_column, header_value_map)
-
-
-# MAYDO encapsulate all these basic, sheet-specific operations in our own Sheet class
-
-def _sheets_of_sheet(sheet: SheetType) -> SheetsType:
-    """Return the sheets that this sheet is part of"""
-    return sheet.book.sheets
+    _update_column_based_on_map(sheet, column_headers, update_column, header_value_map)
 
 
-def _ensure_valid_index(index: int):
-    """Raise IndexError if the index is smaller than zero"""
-    if index < 0:
-        raise IndexError("'{}' supposed to be a non-negative integer")
+# the kinds of sheets in the catalogue
+OTHER_SHEET = "other"
+PLAYER_SHEET = "player"  # a monitored player
+SOLD_PLAYER_SHEET = "sold"
+NEW_PLAYER_SHEET = "new"  # the template of the new player sheets
 
+CatalogueEntry = namedtuple("CatalogueEntry", "name index kind sheet")
 
-def _sheet_index(sheet: SheetType) -> int:
-    """Return the zero-based sheet index"""
-    zero_based_index = sheet.index - 1
-    _ensure_valid_index(zero_based_index)
-    return zero_based_index
 
-
-def _offset_sheet(sheet: SheetType, offset: int) -> SheetType:
-    """Return the sheet on the offset or None if there's no sheet there"""
-    try:
-        zero_based_index = _sheet_index(sheet)
-        requested_sheet = _sheets_of_sheet(sheet)[zero_based_index + offset]
-    except IndexError:
-        requested_sheet = None
-    return requested_sheet
+def _sheet_kind(sheet: Sheet) -> str:
+    """Return the kind of the sheet (see the catalogue)
+    Only the first cell of the unmarked sheets is read to find the player sheets.
+    """
+    name = sheet.name
+    if SOLD_PLAYER_MARKER in name:
+        kind = SOLD_PLAYER_SHEET
+    elif NEW_PLAYER_MARKER in name:
+        kind = NEW_PLAYER_SHEET
+    elif _is_player_sheet(sheet):
+        kind = PLAYER_SHEET
+    else:
+        kind = OTHER_SHEET
+    return kind
 
 
-def _copy_sheet_win32(
-        source: SheetType, before_this_sheet: SheetType, name: str) -> SheetType:
-    """Create a copy of a sheet before another sheet
-    WARNING: this makes the script Windows dependent!
+class SheetCatalogue:
+    """The name, the (0-based) index, the kind and the sheet of every sheet of the workbook
+    It's built when the workbook is opened and it's kept up-to-date as sheets are copied
+    (see copy_sheet), so looking a sheet up never goes to the workbook.
     """
-    source.api.Copy(Before=before_this_sheet.api)
-    new_sheet = _offset_sheet(before_this_sheet, offset=-1)
-    new_sheet.name = name
-    return new_sheet
-
-
-def _find_sheet_by_regex(regex: str, sheets: SheetsType) -> SheetType:
-    """Find a sheet by the regex searched in sheet names or return None"""
-    found_sheet = None
-    for sheet in sheets:
-        if re.search(regex, sheet.name):
-            found_sheet = sheet
-            break
-    return found_sheet
-
 
-def _player_name_to_the_right(sheet: SheetType) -> str:
+    def __init__(self, workbook):
+        self._workbook = workbook
+        self._entries = [CatalogueEntry(sheet.name, index, _sheet_kind(sheet), sheet)
+                         for (index, sheet) in enumerate(workbook.sheets())]
+        self._entry_of_name = {entry.name: entry for entry in self._entries}
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def entry(self, name: str) -> CatalogueEntry:
+        """Return the entry of the named sheet or None"""
+        return self._entry_of_name.get(name)
+
+    def sheet(self, name: str) -> Sheet:
+        """Return the named sheet or raise a KeyError"""
+        return self._entry_of_name[name].sheet
+
+    def offset(self, entry: CatalogueEntry, offset: int) -> CatalogueEntry:
+        """Return the entry on the offset or None if there's no sheet there"""
+        index = entry.index + offset
+        return self._entries[index] if 0 <= index < len(self._entries) else None
+
+    def first(self, kind: str) -> CatalogueEntry:
+        """Return the first entry of the kind or None"""
+        return next((entry for entry in self._entries if entry.kind == kind), None)
+
+    def copy_sheet(self, source: CatalogueEntry, before_this_entry: CatalogueEntry,
+                   name: str) -> CatalogueEntry:
+        """Copy a sheet before another one and catalogue the new sheet (as a player sheet)"""
+        sheet = self._workbook.copy_sheet(source.sheet, before_this_entry.sheet, name)
+        index = before_this_entry.index
+        new_entry = CatalogueEntry(name, index, PLAYER_SHEET, sheet)
+        self._entries.insert(index, new_entry)
+        for shifted_index in range(index + 1, len(self._entries)):
+            shifted_entry = self._entries[shifted_index]._replace(index=shifted_index)
+            self._entries[shifted_index] = shifted_entry
+            self._entry_of_name[shifted_entry.name] = shifted_entry
+        self._entry_of_name[name] = new_entry
+        return new_entry
+
+
+def _player_name_to_the_right(catalogue: SheetCatalogue, entry: CatalogueEntry) -> str:
     """Return the player's name arrived before this player or None
     Players are stored in arrival order
     """
-    next_sheet = _offset_sheet(sheet, offset=1)
-    raw_player_name = next_sheet.name
-    if SOLD_PLAYER_MARKER in raw_player_name:
-        player_name = raw_player_name.replace(SOLD_PLAYER_MARKER, "")
-    elif NEW_PLAYER_MARKER in raw_player_name:
+    next_entry = catalogue.offset(entry, offset=1)
+    if next_entry.kind == SOLD_PLAYER_SHEET:
+        player_name = next_entry.name.replace(SOLD_PLAYER_MARKER, "")
+    elif next_entry.kind == NEW_PLAYER_SHEET:
         player_name = None
     else:
-        player_name = raw_player_name
+        player_name = next_entry.name
     return player_name
 
 
+def _com_operation(method):
+    """Decorate an Excel method to attribute its COM round trips to it (see ComCalls)"""
+    @functools.wraps(method)
+    def method_in_operation(*args, **kwargs):
+        with ComCalls.operation(method.__name__):
+            return method(*args, **kwargs)
+    return method_in_operation
+
+
 class Excel:
     """Excel-based HT persistence layer"""
 
     CENTRAL_PLAYER_SHEET = "Nevelde"
 
-    def __init__(self, file: str, read_only: bool):
+    def __init__(self, file: str, read_only: bool, shadow: bool = False,
+                 backend: str = XLWINGS_BACKEND):
+        """The `backend` is one of BACKENDS
+        In `shadow` mode the sheets are read once and only the changed cells are written
+        back at the end (see ShadowSheet), the openpyxl backend works in memory anyway.
+        """
         if not os.path.isfile(file):
             raise ValueError("Cannot find '{}'".format(file))
+        if backend not in BACKENDS:
+            raise ValueError("Unknown backend '{}' (choose from {})".format(backend, BACKENDS))
         self._file = file
+        self._layout_file = file + LAYOUT_FILE_SUFFIX
+        self._changed_layout = None  # only remembered once the workbook is saved
         self._read_only = read_only
         self._workbook = None
+        self._catalogue = None
         self._central_player_sheet = None
-        self._player_sheets = {}
-        self._monitored_players_names = []
+        self._shadow = shadow
+        self._backend = backend
         self._today = date.today()
 
     def __enter__(self):
@@ -412,9 +452,18 @@ class Excel:
         In case of an exception, __exit__ will run, so don't worry.
         """
         try:
-            self._workbook = xl.Book(self._file, read_only=self._read_only)
-            print("Opened '{}' (read-only mode: {})".format(self._file, self._read_only))
-            self._central_player_sheet = self._sheets()[self.CENTRAL_PLAYER_SHEET]
+            with ComCalls.operation("open"):
+                if self._backend == OPENPYXL_BACKEND:
+                    self._workbook = XlsxWorkbook(self._file, self._read_only)
+                else:
+                    # only this backend needs xlwings (and the Excel application)
+                    # pylint: disable=import-outside-toplevel
+                    from live_sheet import XlwingsWorkbook
+                    self._workbook = XlwingsWorkbook(self._file, self._read_only, self._shadow)
+                self._workbook.begin()
+                print("Opened '{}' (read-only mode: {})".format(self._file, self._read_only))
+                self._catalogue = SheetCatalogue(self._workbook)
+                self._central_player_sheet = self._sheet(self.CENTRAL_PLAYER_SHEET)
         except Exception:
             self.__exit__(*sys.exc_info())
             raise
@@ -422,125 +471,142 @@ class Excel:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
-        """Save the workbook to file, if there was no exception, and we are not in read-only mode
+        """Recalculate and save the workbook to file, if there was no exception, and we are not
+        in read-only mode, otherwise the changes are discarded
+        A changed layout is only remembered once the workbook has been saved.
+        The whole run is one transaction: the application's screen updates, recalculation and
+        events are suspended since __enter__ and they are restored here whatever happens.
         When __exit__ returns True, any exception passed to it is swallowed.
         When __exit__ returns False, the exception is re-raised.
         """
         there_was_no_exception = exc_type is None
 
-        if self._read_only:
-            print("Nothing to save as we're in read-only mode. Bye!")
-        else:
-            if there_was_no_exception:
+        try:
+            if self._read_only:
+                print("Nothing to save as we're in read-only mode. Bye!")
+            elif there_was_no_exception:
                 if self._workbook is not None:
-                    print("Saving '{}'...".format(self._file))
+                    with ComCalls.operation("save"):
+                        self._workbook.flush()
+                        print("Saving '{}'...".format(self._file))
+                        self._workbook.save()
+                        self._workbook.end()  # restoring the application is part of it
+                    if self._changed_layout is not None:
+                        _save_layout(self._layout_file, self._changed_layout)
             else:
                 print("One or more exceptions have invalidated the update!")
+                if self._workbook is not None:
+                    self._workbook.discard()
+        finally:
+            if self._workbook is not None:
+                self._workbook.end()  # unless it has ended already
 
         success = there_was_no_exception
 
         return success
 
-    def _sheets(self) -> SheetsType:
-        """Return the list of existing sheets"""
-        if self._workbook is None:
+    def _sheet_catalogue(self) -> SheetCatalogue:
+        """Return the catalogue of the sheets"""
+        if self._catalogue is None:
             raise RuntimeError("Tried accessing sheets when we don't even have a workbook!")
-        return self._workbook.sheets
+        return self._catalogue
 
+    def _sheet(self, name: str) -> Sheet:
+        """Return the named sheet or raise a KeyError"""
+        return self._sheet_catalogue().sheet(name)
+
+    @_com_operation
     def monitored_players_names(self) -> List[str]:
         """Return the list of the monitored players' names (read-only operation)"""
         print("excel -> player list... ", end="")
 
-        for sheet in self._sheets():
-            if _is_player_sheet(sheet):
-                player_is_active = not any(
-                    marker in sheet.name
-                    for marker in (SOLD_PLAYER_MARKER, NEW_PLAYER_MARKER)
-                )
-                if player_is_active:
-                    self._player_sheets[sheet.name] = sheet
-                    self._monitored_players_names.append(sheet.name)
+        names = [entry.name for entry in self._sheet_catalogue() if entry.kind == PLAYER_SHEET]
 
         print("done")
-        return self._monitored_players_names
+        return names
 
+    @_com_operation
     def update_team(self, team: Team) -> None:
         """Find the right place in the spreadsheet and update it with team's
         info (unless we're in read-only mode)"""
         print("Team -> excel... ", end="")
 
-        with _run_if_not_read_only(self._read_only):
-            team_sheet = self._sheets()["Csapat"]
-            range_size = 50
-            updated_total = False
-            updated_board_reserves = False
-            for row in range(1, range_size):
-                for col in range(1, range_size):
-                    cell = team_sheet.range((row, col))
-
-                    updated = _update_value_next_to_named_cell(cell, "Összesen",
-                                                               team.finance.total)
-                    updated_total = updated_total or updated
-
-                    updated = _update_value_next_to_named_cell(cell, "Az igazgatóság tartaléka",
-                                                               team.finance.board_reserves)
-                    updated_board_reserves = updated_board_reserves or updated
-
-                    if updated_total and updated_board_reserves:
-                        break  # we've updated everything we wanted
-            team_sheet["A1"].value = self._today
-
+        with run_if_not_read_only(self._read_only):
+            team_sheet = self._sheet(TEAM_SHEET)
+            value_of_label = {
+                TOTAL_LABEL: team.finance.total,
+                BOARD_RESERVES_LABEL: team.finance.board_reserves,
+            }
+            layout = _load_layout(self._layout_file)
+            remembered_cell_of_label = {
+                label: tuple(cell)
+                for (label, cell) in layout.get(TEAM_LABELS_LAYOUT_KEY, {}).items()
+            }
+            cell_of_label = _find_labels(team_sheet, list(value_of_label),
+                                         remembered_cell_of_label)
+            for (label, (row, column)) in cell_of_label.items():
+                team_sheet.write((row, column + 1), [[value_of_label[label]]])
+            team_sheet.write((1, 1), [[self._today]])
+
+            if cell_of_label != remembered_cell_of_label:
+                layout[TEAM_LABELS_LAYOUT_KEY] = cell_of_label
+                self._changed_layout = layout
+
+    @_com_operation
     def update_player(self, player: Player) -> None:
         """Store the `player`'s updated info on his tab in the spreadsheet
         (unless we're in read-only mode)
-
-        WARNING call monitored_players_names() before this function to build the list
-        of sheets once
         """
-        # MAYDO clean-up the dependency on monitored_players_names
         print("### Update '{}' -> excel... ".format(player.name), end="")
 
-        with _run_if_not_read_only(self._read_only):
-            try:
-                sheet = self._player_sheets[player.name]
-            except KeyError:
-                raise RuntimeError("Have you called monitored_players_names before this function?")
+        with run_if_not_read_only(self._read_only):
+            entry = self._sheet_catalogue().entry(player.name)
+            if entry is None or entry.kind != PLAYER_SHEET:
+                raise RuntimeError("'{}' is not a monitored player".format(player.name))
+            sheet = entry.sheet
+
+            last_row_with_value = sheet.last_row_of_block(1)
 
-            last_cell_with_value = sheet["A:A"].end("down")
+            _check_and_try_fixing_date_of_last_update(sheet, last_row_with_value)
 
-            _check_and_try_fixing_date_of_last_update(last_cell_with_value)
+            headers = sheet.headers()
+            todays_row = _get_todays_row(sheet, headers, last_row_with_value, self._today)
 
-            todays_row = _get_todays_row(sheet, last_cell_with_value, self._today)
+            _update_player(player, sheet, headers, todays_row)
 
-            _update_player(player, sheet, todays_row.row)
+            self._update_central_player_sheet(player)
 
-            _update_central_player_sheet(player, self._central_player_sheet)
+    def _update_central_player_sheet(self, player: Player):
+        """Update (or add) the `player` on the central player sheet"""
+        sheet = self._central_player_sheet
+        _update_central_player_sheet(player, sheet, sheet.headers(FIRST_ROW),
+                                     sheet.headers(FIRST_COLUMN))
 
+    @_com_operation
     def add_player(self, player: Player) -> None:
         """Add a new player to excel (unless we're in read-only mode)"""
         print("### Add '{}' -> excel... ".format(player.name), end="")
 
-        with _run_if_not_read_only(self._read_only):
-            name = player.name
-            player_sheet = None
-            for sheet in self._sheets():
-                if name == sheet.name:
-                    player_sheet = sheet
-                    break
-
-            if player_sheet is None:
-                latest_player_sheet = _offset_sheet(self._central_player_sheet, offset=1)
-                new_player_sheet = _find_sheet_by_regex(NEW_PLAYER_MARKER, self._sheets())
-                player_sheet = _copy_sheet_win32(new_player_sheet, latest_player_sheet, name)
-                arrival_row = player_sheet[FIRST_DATA_ROW]
-                row_number = arrival_row.row
+        with run_if_not_read_only(self._read_only):
+            catalogue = self._sheet_catalogue()
+            player_entry = catalogue.entry(player.name)
+
+            if player_entry is None:
+                latest_player_entry = catalogue.offset(
+                    catalogue.entry(self.CENTRAL_PLAYER_SHEET), offset=1)
+                player_entry = catalogue.copy_sheet(catalogue.first(NEW_PLAYER_SHEET),
+                                                    latest_player_entry, player.name)
+                player_sheet = player_entry.sheet
+                row_number = FIRST_DATA_ROW_NUMBER
                 header_value_map = {
                     DATE_COLUMN: player.extra.arrival,
                     BUY_PRICE_COLUMN: player.extra.buy_price,
                 }
-                _update_row_based_on_map(player_sheet, row_number, header_value_map)
-                _update_player(player, player_sheet, row_number)  # to fill in the common columns
+                headers = player_sheet.headers()
+                _update_row_based_on_map(player_sheet, headers, row_number, header_value_map)
+                # to fill in the common columns
+                _update_player(player, player_sheet, headers, row_number)
 
-            next_player_name = _player_name_to_the_right(player_sheet)
+            next_player_name = _player_name_to_the_right(catalogue, player_entry)
             setattr(player, NEXT_PLAYER_NAME_ATTRIBUTE, next_player_name)
-            _update_central_player_sheet(player, self._central_player_sheet)
+            self._update_central_player_sheet(player)
@@ -0,0 +1,536 @@
+# coding=utf-8
+"""A local stand-in for the Hattrick site to exercise and benchmark the scraper
+It serves templated versions of the pages the `hattrick` module reads: the main
+(login) page with the ASP.NET form fields, the players list, the player, transfer
+compare and finance pages. The login sets the cookie the scraper parses the team
+id from and redirects to a fake game server. Every request can be delayed and
+made fail on purpose.
+
+The game server part of the URLs is kept in the path, e.g.
+http://127.0.0.1:8080/www87.hattrick.org/Club/Players/?TeamID=1
+so `Hattrick.SERVER_PATTERN` matches it just like a real server URL.
+
+Run it standalone or benchmark a full update run against it:
+    python fake_hattrick.py serve --port 8080 --latency 0.05
+    python fake_hattrick.py bench --players 40 --latency 0.05 --workers 10
+"""
+import argparse
+import hashlib
+from http import HTTPStatus
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import common
+
+
+SERVER_ID = 87
+SERVER_PREFIX = "/www{}.hattrick.org".format(SERVER_ID)
+SESSION_COOKIE = "ht_session"
+CURRENCY = "eFt"
+
+USER = "stevensson"
+PASSWORD = "secret"
+TEAM_ID = 123456
+TEAM_NAME = "Fake FC"
+
+FIRST_NAMES = ("Ádám", "Béla", "Csaba", "Dénes", "Elemér", "Ferenc", "Gábor", "Huba")
+LAST_NAMES = ("Kovács", "Nagy", "Szabó", "Tóth", "Varga", "Horváth", "Kiss", "Molnár")
+SPECIALITIES = ("Technikás", "Gyors", "Jól fejelő", "Erőteljes", "Kiszámíthatatlan",
+                "Ellenálló", "Csapatjátékos", None)
+
+FILLER = "<div class=\"filler\">Lorem ipsum dolor sit amet, consectetur adipiscing elit</div>"
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="hu">
+<head><title>{title}</title></head>
+<body>
+<form method="post" id="aspnetForm">
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{viewstate}" />
+<input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="{generator}" />
+{header}
+{content}
+{filler}
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{validation}" />
+</form>
+</body>
+</html>
+"""
+
+TEAM_HEADER_TEMPLATE = """<div id="header">
+<a href="/Club/?TeamID={team_id}" title="{team_name}">{team_name}</a>
+</div>"""
+
+LOGIN_FAILURE_CONTENT = """<span id="ctl00_CPContent_ucLogin_lblFailureText">\
+Hibás felhasználónév
+vagy jelszó</span>"""
+
+PLAYERS_LIST_ROW_TEMPLATE = """<tr>
+<td><a href="/Club/Players/Player.aspx?playerId={player_id}&BrowseIds=" title="{name}">\
+{name}</a>{transfer_listed}</td>
+<td>{nt}</td>
+</tr>"""
+
+PLAYER_CONTENT_TEMPLATE = """<h1>{name}</h1>
+<p>{years} éves és {days} napos</p>
+<p>{speciality}</p>
+<table>
+<tr><td>TSI</td>
+<td class="right">{tsi}</td></tr>
+<tr id="ctl00_ctl00_CPContent_CPMain_ucPlayerSkills_trForm"><td>Forma</td>
+<td><span class="denominationNumber" level='{form}'></span></td></tr>
+<tr id="ctl00_ctl00_CPContent_CPMain_ucPlayerSkills_trStamina"><td>Erőnlét</td>
+<td><span class="denominationNumber" level='{stamina}'></span></td></tr>
+<tr id="ctl00_ctl00_CPContent_CPMain_ucPlayerSkills_trPlaymaker"><td>Játékszervezés</td>
+<td><span class="denominationNumber" level='{playmaking}'></span></td></tr>
+<tr id="ctl00_ctl00_CPContent_CPMain_ucPlayerSkills_trWinger"><td>Szélsőjáték</td>
+<td><span class="denominationNumber" level='{winger}'></span></td></tr>
+<tr id="ctl00_ctl00_CPContent_CPMain_ucPlayerSkills_trPasser"><td>Átadás</td>
+<td><span class="denominationNumber" level='{passing}'></span></td></tr>
+<tr id="ctl00_ctl00_CPContent_CPMain_ucPlayerSkills_trScorer"><td>Gólszerzés</td>
+<td><span class="denominationNumber" level='{scoring}'></span></td></tr>
+</table>
+<p>{stars}</p>
+<p>{nt}</p>
+<a href="/Club/Transfers/TransferCompare.aspx?playerId={player_id}">\
+Átigazolási összehasonlítás</a>"""
+
+TRANSFER_ROW = ("<tr><td>Hasonló játékos</td>"
+                "<td class=\"right\">1&nbsp;000&nbsp;000 eFt</td></tr>")
+
+TRANSFER_COMPARE_CONTENT_TEMPLATE = """<table>
+{transfers}
+<tr><th>&nbsp;</th><th>Átlagérték</th>
+<th class="right transfer-compare-bid">{price} {currency}</th></tr>
+</table>
+{more_transfers}"""
+
+MORE_TRANSFERS_LINK = ("<a id=\"ctl00_ctl00_CPContent_CPMain_lnkMoreTransfers\""
+                       " href=\"javascript:__doPostBack('ctl00$ctl00$CPContent$CPMain"
+                       "$lnkMoreTransfers','')\">Még több átigazolás</a>")
+
+FINANCE_CONTENT_TEMPLATE = """<table>
+<tr><td>Készpénz:</td><td>{total} {currency}</td></tr>
+<tr><td>Az igazgatóság tartaléka:</td>
+<td>{board_reserves} {currency}</td></tr>
+<tr><td>Összesen:</td>
+<td>{grand_total} {currency}</td></tr>
+</table>"""
+
+APP_ERROR_CONTENT = "<h1>Alkalmazáshiba</h1>"
+
+
+def _money(amount: int) -> str:
+    """Return the amount formatted the way Hattrick does e.g. 1 234 567"""
+    return "{:,}".format(amount).replace(",", "&nbsp;")
+
+
+class FakePlayer:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """A deterministic fake player"""
+
+    def __init__(self, index: int):
+        generator = random.Random(index)
+        self.player_id = 400000000 + index
+        self.name = "{} {}".format(LAST_NAMES[index % len(LAST_NAMES)],
+                                   FIRST_NAMES[(index // len(LAST_NAMES)) % len(FIRST_NAMES)])
+        if index >= len(FIRST_NAMES) * len(LAST_NAMES):
+            self.name = "{} {}".format(self.name, index)
+        self.years = generator.randint(17, 34)
+        self.days = generator.randint(0, 111)
+        self.tsi = generator.randint(500, 50000)
+        self.form = generator.randint(1, 8)
+        self.stamina = generator.randint(1, 9)
+        self.skills = {skill: generator.randint(1, 15)
+                       for skill in ("playmaking", "winger", "passing", "scoring")}
+        self.speciality = generator.choice(SPECIALITIES)
+        self.stars = generator.choice((None, 1.5, 2.5, 3.0, 4.5))
+        self.transfer_listed = generator.random() < 0.2
+        self.national_team_player = generator.random() < 0.1
+        self.national_team_player_prospect = (not self.national_team_player
+                                              and generator.random() < 0.2)
+        self.price = generator.randint(100, 5000) * 1000
+        self.more_transfers = generator.random() < 0.5
+
+
+class FakeHattrick:  # pylint: disable=too-many-instance-attributes
+    """The state and pages of the fake site"""
+
+    def __init__(self, num_players: int = 30, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, app_error_rate: float = 0.0,
+                 filler_lines: int = 200, seed: int = 0):
+        """`latency` (+ a random `jitter`) seconds delay every response,
+        `error_rate` of the responses are HTTP 500s and `app_error_rate` of them
+        are Hattrick application errors, while `filler_lines` makes the pages bigger
+        """
+        self.players = [FakePlayer(index) for index in range(num_players)]
+        self.player_of_id = {player.player_id: player for player in self.players}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.app_error_rate = app_error_rate
+        self.filler = "\n".join([FILLER] * filler_lines)
+        self.sessions = set()
+        self.num_requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _form_fields(self, path: str) -> Dict[str, str]:
+        """Return the (stable) ASP.NET form field values of the page at `path`"""
+        digest = hashlib.sha256(path.encode("utf-8")).hexdigest()
+        return {
+            "viewstate": "/wEP" + digest[:40],
+            "generator": digest[40:48].upper(),
+            "validation": "/wEd" + digest[48:],
+        }
+
+    def page(self, path: str, title: str, content: str, team_header: bool = True) -> str:
+        """Return a full page with the `content`"""
+        header = (TEAM_HEADER_TEMPLATE.format(team_id=TEAM_ID, team_name=TEAM_NAME)
+                  if team_header else "")
+        return PAGE_TEMPLATE.format(title=title, header=header, content=content,
+                                    filler=self.filler, **self._form_fields(path))
+
+    def form_is_valid(self, path: str, form: Dict[str, str]) -> bool:
+        """Return whether the posted `form` has the ASP.NET field values of the page"""
+        expected = self._form_fields(path)
+        return (form.get("__VIEWSTATE") == expected["viewstate"]
+                and form.get("__VIEWSTATEGENERATOR") == expected["generator"]
+                and form.get("__EVENTVALIDATION") == expected["validation"])
+
+    def delay_and_maybe_fail(self) -> Optional[str]:
+        """Sleep for the configured latency and return the injected error, if any:
+        "http" or "app"
+        """
+        with self._lock:
+            self.num_requests += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            dice = self._random.random()
+        if delay > 0:
+            time.sleep(delay)
+        if dice < self.error_rate:
+            error = "http"
+        elif dice < self.error_rate + self.app_error_rate:
+            error = "app"
+        else:
+            error = None
+        return error
+
+    def login(self, form: Dict[str, str]) -> Optional[str]:
+        """Return a new session token if the `form` is a valid login or None"""
+        valid = (self.form_is_valid("/en/", form)
+                 and form.get("ctl00$CPContent$ucLogin$txtUserName") == USER
+                 and form.get("ctl00$CPContent$ucLogin$txtPassword") == PASSWORD)
+        token = None
+        if valid:
+            token = secrets.token_hex(16)
+            with self._lock:
+                self.sessions.add(token)
+        return token
+
+    def logout(self, token: Optional[str]):
+        """Invalidate the session `token`"""
+        with self._lock:
+            self.sessions.discard(token)
+
+    def players_list_content(self) -> str:
+        """Return the content of the players list page"""
+        rows = [
+            PLAYERS_LIST_ROW_TEMPLATE.format(
+                player_id=player.player_id, name=player.name,
+                transfer_listed=(' <img class="transferlisted" alt="Eladó" />'
+                                 if player.transfer_listed else ""),
+                nt=("A játékos a válogatott csapatának is tagja!"
+                    if player.transfer_listed and player.national_team_player else ""),
+            )
+            for player in self.players
+        ]
+        return "<table>\n{}\n</table>".format("\n".join(rows))
+
+    def player_content(self, player: FakePlayer) -> str:
+        """Return the content of the `player`'s page"""
+        if player.national_team_player and not player.transfer_listed:
+            nt_text = "A játékos a válogatott csapatának is tagja!"
+        elif player.national_team_player_prospect:
+            nt_text = "A játékos a nemzeti csapatának jelöltje"
+        else:
+            nt_text = ""
+        return PLAYER_CONTENT_TEMPLATE.format(
+            name=player.name, player_id=player.player_id, years=player.years,
+            days=player.days, speciality=player.speciality or "", tsi=_money(player.tsi),
+            form=player.form, stamina=player.stamina,
+            stars=("" if player.stars is None
+                   else "Átlagos csillagérték {}".format(player.stars)),
+            nt=nt_text, **player.skills,
+        )
+
+    def transfer_compare_content(self, player: FakePlayer, more_loaded: bool) -> str:
+        """Return the content of the `player`'s transfer compare page"""
+        can_load_more = player.more_transfers and not more_loaded
+        return TRANSFER_COMPARE_CONTENT_TEMPLATE.format(
+            transfers="\n".join([TRANSFER_ROW] * (50 if more_loaded else 10)),
+            price=_money(player.price).replace("&nbsp;", " "), currency=CURRENCY,
+            more_transfers=MORE_TRANSFERS_LINK if can_load_more else "",
+        )
+
+    def finance_content(self) -> str:
+        """Return the content of the finance page"""
+        (total, board_reserves) = (12345678, 2000000)
+        return FINANCE_CONTENT_TEMPLATE.format(
+            total=_money(total), board_reserves=_money(board_reserves),
+            grand_total=_money(total + board_reserves), currency=CURRENCY,
+        )
+
+
+class FakeHattrickRequestHandler(BaseHTTPRequestHandler):
+    """Serve the pages of the `FakeHattrick` of the server"""
+
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def site(self) -> FakeHattrick:
+        """Return the fake site"""
+        return self.server.site
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Be quiet, the benchmarks print enough"""
+
+    def _session_token(self) -> Optional[str]:
+        """Return the valid session token of the request or None"""
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        token = cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+        return token if token in self.site.sessions else None
+
+    def _send(self, status: HTTPStatus, body: str = "", headers: Optional[dict] = None):
+        """Send a complete response"""
+        encoded_body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(encoded_body)))
+        for (key, value) in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        try:
+            self.wfile.write(encoded_body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the scraper may stop reading as soon as it has found what it needed
+
+    def _redirect(self, location: str, headers: Optional[dict] = None):
+        """Send a redirect to `location`"""
+        self._send(HTTPStatus.FOUND, headers={"Location": location, **(headers or {})})
+
+    def _read_form(self) -> Dict[str, str]:
+        """Return the posted form"""
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True)
+        return {key: values[-1] for (key, values) in form.items()}
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve a page"""
+        self._handle(form=None)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Serve a posted form"""
+        self._handle(form=self._read_form())
+
+    def _handle(self, form: Optional[Dict[str, str]]):
+        """Route the request (after the injected latency and errors)"""
+        error = self.site.delay_and_maybe_fail()
+        url = urlsplit(re.sub("/{2,}", "/", self.path))  # the scraper joins links with a "/"
+        query = {key: values[-1] for (key, values) in parse_qs(url.query).items()}
+        if error == "http":
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal Server Error")
+        elif error == "app":
+            self._send(HTTPStatus.OK, self.site.page(url.path, "Hiba", APP_ERROR_CONTENT))
+        elif url.path.startswith("/en/"):
+            self._handle_site(url.path, form)
+        elif url.path.startswith(SERVER_PREFIX):
+            self._handle_game_server(url.path[len(SERVER_PREFIX):], query, form)
+        else:
+            self._send(HTTPStatus.NOT_FOUND, "Not Found")
+
+    def _handle_site(self, path: str, form: Optional[Dict[str, str]]):
+        """Serve the main page and the login"""
+        if form is None:
+            self._send(HTTPStatus.OK,
+                       self.site.page("/en/", "Hattrick", "<p>Üdv!</p>", team_header=False))
+        elif (token := self.site.login(form)) is not None and path == "/en/Startpage3.aspx":
+            cookie = SimpleCookie()
+            cookie[SESSION_COOKIE] = token
+            cookie[SESSION_COOKIE]["path"] = "/"
+            cookie["ht_user"] = "userId=1&currentTeamId={}".format(TEAM_ID)
+            cookie["ht_user"]["path"] = "/"
+            set_cookie_headers = cookie.output(header="").split("\r\n")
+            self.send_response(HTTPStatus.FOUND)
+            self.send_header("Location", "{}/MyHattrick/".format(SERVER_PREFIX))
+            self.send_header("Content-Length", "0")
+            for set_cookie in set_cookie_headers:
+                self.send_header("Set-Cookie", set_cookie.strip())
+            self.end_headers()
+        else:
+            self._send(HTTPStatus.OK, self.site.page(path, "Hattrick", LOGIN_FAILURE_CONTENT,
+                                                     team_header=False))
+
+    def _handle_game_server(self, path: str, query: Dict[str, str],
+                            form: Optional[Dict[str, str]]):
+        """Serve the pages of the logged in user"""
+        token = self._session_token()
+        site = self.site
+        if token is None:
+            self._redirect("/en/")
+        elif query.get("action") == "logout":
+            site.logout(token)
+            self._redirect("/en/")
+        elif path.startswith("/Club/Players/Player"):
+            player = site.player_of_id.get(int(query.get("playerId", 0)))
+            if player is None:
+                self._send(HTTPStatus.NOT_FOUND, "Not Found")
+            else:
+                self._send(HTTPStatus.OK,
+                           site.page(path, player.name, site.player_content(player)))
+        elif path.startswith("/Club/Players"):
+            self._send(HTTPStatus.OK, site.page(path, "Játékosok", site.players_list_content()))
+        elif path.startswith("/Club/Transfers/TransferCompare"):
+            self._handle_transfer_compare(path, query, form)
+        elif path.startswith("/Club/Finances"):
+            self._send(HTTPStatus.OK, site.page(path, "Pénzügyek", site.finance_content()))
+        elif re.match(r"^/(MyHattrick/|Club/$)", path):
+            self._send(HTTPStatus.OK, site.page(path, TEAM_NAME, "<p>{}</p>".format(TEAM_NAME)))
+        else:
+            self._send(HTTPStatus.NOT_FOUND, "Not Found")
+
+    def _handle_transfer_compare(self, path: str, query: Dict[str, str],
+                                 form: Optional[Dict[str, str]]):
+        """Serve the transfer compare page and its "load more transfers" post back"""
+        site = self.site
+        player = site.player_of_id.get(int(query.get("playerId", 0)))
+        if player is None:
+            self._send(HTTPStatus.NOT_FOUND, "Not Found")
+        elif form is None:
+            self._send(HTTPStatus.OK, site.page(
+                path, "Átigazolások", site.transfer_compare_content(player, more_loaded=False)))
+        elif (site.form_is_valid(path, form)
+              and form.get("__EVENTTARGET") == "ctl00$ctl00$CPContent$CPMain$lnkMoreTransfers"):
+            self._send(HTTPStatus.OK, site.page(
+                path, "Átigazolások", site.transfer_compare_content(player, more_loaded=True)))
+        else:
+            self._send(HTTPStatus.OK, site.page(path, "Hiba", APP_ERROR_CONTENT))
+
+
+class _QuietThreadingHTTPServer(ThreadingHTTPServer):
+    """Don't report the connections the scraper drops after an early-exit read"""
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class FakeHattrickServer:
+    """Run a FakeHattrick site on a local HTTP server in a background thread
+    Use it as a context manager and point Hattrick at its `url`:
+        with FakeHattrickServer(FakeHattrick(latency=0.05)) as server:
+            with Hattrick(CURRENCY, USER, PASSWORD, site_url=server.url) as ht:
+                ...
+    """
+
+    def __init__(self, site: Optional[FakeHattrick] = None, host: str = "127.0.0.1",
+                 port: int = 0):
+        self.site = FakeHattrick() if site is None else site
+        self._server = _QuietThreadingHTTPServer((host, port), FakeHattrickRequestHandler)
+        self._server.daemon_threads = True
+        self._server.site = self.site
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Return the site URL of the server"""
+        (host, port) = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        """Serve in the current thread until interrupted"""
+        self._server.serve_forever()
+
+
+def _site_from_args(args) -> FakeHattrick:
+    """Return the fake site configured on the command line"""
+    return FakeHattrick(num_players=args.players, latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, app_error_rate=args.app_error_rate,
+                        filler_lines=args.filler_lines, seed=args.seed)
+
+
+def _serve(args):
+    """Serve the fake site until interrupted"""
+    server = FakeHattrickServer(_site_from_args(args), port=args.port)
+    print("Serving the fake Hattrick on {} (user: '{}' password: '{}')"
+          .format(server.url, USER, PASSWORD))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def _bench(args):
+    """Log in, download the team and every player from the fake site and print the timings"""
+    from hattrick import Hattrick  # pylint: disable=import-outside-toplevel
+
+    with FakeHattrickServer(_site_from_args(args)) as server:
+        started = time.perf_counter()
+        with Hattrick(CURRENCY, USER, PASSWORD, max_workers=args.workers,
+                      site_url=server.url) as ht:  # pylint: disable=invalid-name
+            logged_in = time.perf_counter()
+            ht.download_team()
+            players_list_page = ht.download_player_list_page()
+            names = [player.name for player in server.site.players]
+            num_players = sum(1 for _ in ht.download_players(names, players_list_page))
+            downloaded = time.perf_counter()
+
+    print("login: {:.3f}s players: {}/{} in {:.3f}s ({:.1f} players/s) requests: {}".format(
+        logged_in - started, num_players, len(names), downloaded - logged_in,
+        num_players / (downloaded - logged_in), server.site.num_requests))
+
+
+def main():
+    """parse args and serve or benchmark the fake site"""
+    parser = argparse.ArgumentParser(description="A local stand-in for the Hattrick site")
+    parser.add_argument("command", choices=("serve", "bench"))
+    parser.add_argument("--port", type=int, default=8080, help="the port to serve on")
+    parser.add_argument("--players", type=int, default=30, help="the number of players")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="the delay of every response in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="the maximum random extra delay of every response in seconds")
+    parser.add_argument("--error_rate", type=float, default=0.0,
+                        help="the ratio of HTTP 500 responses")
+    parser.add_argument("--app_error_rate", type=float, default=0.0,
+                        help="the ratio of Hattrick application error responses")
+    parser.add_argument("--filler_lines", type=int, default=200,
+                        help="the number of filler lines on every page")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the injected errors")
+    parser.add_argument("-w", "--{}".format(common.WORKERS_ARG), type=int, default=10,
+                        help="the maximum number of concurrent downloads (bench only)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        _serve(args)
+    else:
+        _bench(args)
+
+
+if __name__ == "__main__":
+    main()
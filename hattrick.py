@@ -5,90 +5,100 @@ Supported Hattrick page languages:
 Supported users:
     - Stevensson
 """
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextlib
 from getpass import getpass
-import io
 from pprint import pprint
 import re
 import sys
-from typing import Any, Callable, Optional
+import threading
+import time
+import traceback
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+from requests.cookies import create_cookie
+from urllib3.util.retry import Retry
 
-from data import Player, Age, NationalPlayerStatus, Team, Skillz, Speciality, Ability
+from data import Player, NationalPlayerStatus, Team
+from page_parsing import (
+    BlockValueFindState, LanguageDependentText, NoPatternMatchError, PageType,
+    PlayerPageExtractor, PlayersListEntry, PlayersListIndex, _find_values_in_blocks,
+    _find_values_in_line, _page_text, _parse_int_values_from_blocks_into,
+    _raise_and_try_dumping_page_error, _replace_html_spaces, _store_int_values_found_in_blocks,
+)
 
 
-PageType = requests.models.Response
 OptionalString = Optional[str]
 OptionalInt = Optional[int]
 
-LEVEL_PATTERN = r"level='(?P<value>[0-9]+)'"
 
+# the first matching pattern decides the category of a link
+LINK_CATEGORY_PATTERNS = (
+    ("logout", r"action=logout"),
+    ("login", r"Startpage3\.aspx"),
+    ("player", r"Club/Players/Player"),
+    ("players_list", r"Club/Players"),
+    ("transfer_compare", r"Club/Transfers/TransferCompare"),
+    ("finance", r"Club/Finances"),
+)
 
-def _page_text(page: PageType) -> str:
-    """Return the specified `page`'s text"""
-    return page.text
 
+# what the HtLink hooks are told about every request
+# (`cached` requests were served from the response cache without touching the network)
+RequestRecord = namedtuple("RequestRecord",
+                           "method category status bytes latency retries cached")
 
-def _dump_a_page_to_file(page: PageType, file_name: str):
-    """Dump the text of `page` into `file_name`
-    It might raise all kinds of io errors...
-    """
-    with io.open(file_name, mode="w", encoding="utf-8") as dump_file:
-        dump_file.write(_page_text(page))
 
+def link_category(link: str) -> str:
+    """Return the category of the hattrick `link` or "other" if it isn't known"""
+    for (category, pattern) in LINK_CATEGORY_PATTERNS:
+        if re.search(pattern, link):
+            return category
+    return "other"
 
-def _raise_and_try_dumping_page_error(
-        base_error_message: str, dump_suffix: str, page: PageType, regex: str = None,
-        exception_type: Exception = RuntimeError):
-    """Raise an `exception_type` error and try to dump the `page` to
-    crashdump.`dump_suffix`.html
-    `base_error_message` will be extended with (the optional) `regex` and the
-    dump file name if dumping succeeded
-    """
-    saved_page_file = "crashdump.{}.html".format(dump_suffix)
-    try:
-        _dump_a_page_to_file(page, saved_page_file)
-    except Exception:  # pylint: disable=broad-except
-        saved_page_file = None
-
-    if regex is not None:
-        error_message = "{} regex: '{}'".format(base_error_message, regex)
-    else:
-        error_message = base_error_message
 
-    if saved_page_file is not None:
-        error_message = ("{} this page dump might help: '{}'").format(
-            error_message, saved_page_file
-        )
+def _num_retries(response: Optional[PageType]) -> int:
+    """Return how many times the adapter retried the request of the `response`"""
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    return len(retries.history) if getattr(retries, "history", None) else 0
 
-    raise exception_type(error_message)
+
+def _ensure_no_app_error(app_error_pattern: OptionalString, response: PageType, data: Any):
+    """Check whether the response contains an application error
+    If so, raise an exception
+    """
+    if app_error_pattern is not None:
+        if re.search(app_error_pattern, _page_text(response)):
+            if data is not None:
+                pprint("We've tried to use this data:{}".format(data))
+            _raise_and_try_dumping_page_error(
+                "'{}'!".format(app_error_pattern), "app_error", response
+            )
 
 
 class HtLink:
     """The hattrick link abstraction"""
 
     APP_ERROR_PATTERN = None
+    CACHE = None
+    HOOKS = []
     HEADER = {
         "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36"
                       " (KHTML, like Gecko) Chrome/51.0.2704.103 Safari/537.36"
     }
+    POOL_SIZE = 10
+    # the failed GET requests (e.g. connection errors or these statuses) are retried this
+    # many times with an exponential backoff (see start_session)
+    MAX_RETRIES = 3
+    RETRY_BACKOFF_FACTOR = 0.5
+    RETRY_STATUSES = (500, 502, 503, 504)
     SERVER_ID = None
     SERVER_URL = None
     SESSION = None
 
-    @classmethod
-    def _ensure_no_app_error(cls, response: PageType, data: Any):
-        """Check whether the response contains an application error
-        If so, raise an exception
-        """
-        if cls.APP_ERROR_PATTERN is not None:
-            if re.search(cls.APP_ERROR_PATTERN, _page_text(response)):
-                if data is not None:
-                    pprint("We've tried to use this data:{}".format(data))
-                _raise_and_try_dumping_page_error(
-                    "'{}'!".format(cls.APP_ERROR_PATTERN), "app_error", response
-                )
-
     @classmethod
     def request(
             cls, link: str, use_headers: bool = True,
@@ -100,34 +110,189 @@ class HtLink:
         and must be a sub-link otherwise
         If `method` is not a valid session method, AttributeError will be
         raised
+        If a `CACHE` is set, the response might come from there
+        Every request is reported to the `HOOKS` (see `add_hook`)
         """
-        session_method = getattr(cls.SESSION, method)
+        with cls.reporting(method, link) as report:
+            if cls.CACHE is None:
+                response = cls._download(link, use_headers, method, data)
+                report(response)
+            else:
+                downloaded = []
+
+                def download():
+                    """Download the page and remember that it wasn't in the cache"""
+                    downloaded.append(True)
+                    return cls._download(link, use_headers, method, data)
+
+                response = cls.CACHE.fetch(link_category(link), method, link, data, download)
+                report(response, cached=not downloaded)
+        return response
+
+    @classmethod
+    def add_hook(cls, hook):
+        """Add a `hook` to be told about every request and page parse
+        A hook has a `request_done(RequestRecord)` and a `page_parsed(category, seconds)`
+        method, both of which might be called from several threads at once
+        (see metrics.RequestMetrics)
+        """
+        cls.HOOKS = cls.HOOKS + [hook]
+
+    @classmethod
+    def remove_hook(cls, hook):
+        """Remove a hook added by `add_hook`"""
+        cls.HOOKS = [added for added in cls.HOOKS if added is not hook]
 
+    @classmethod
+    @contextlib.contextmanager
+    def reporting(cls, method: str, link: str):
+        """Time the request in the context and report it to the hooks at the end
+        The context gives a function to tell it the response (and whether it came
+        from the cache), while a failed request is reported with the response of the
+        exception, if any, or with status 0 (e.g. on connection and application errors)
+        """
+        hooks = cls.HOOKS
+        outcome = {}
+        started = time.perf_counter()
+        try:
+            yield lambda response, cached=False: outcome.update(response=response, cached=cached)
+        except Exception as error:
+            outcome.setdefault("response", getattr(error, "response", None))
+            raise
+        finally:
+            if hooks:
+                latency = time.perf_counter() - started
+                response = outcome.get("response")
+                record = RequestRecord(
+                    method=method.lower(), category=link_category(link),
+                    status=0 if response is None else response.status_code,
+                    bytes=0 if response is None else len(response.content),
+                    latency=latency, retries=_num_retries(response),
+                    cached=outcome.get("cached", False),
+                )
+                for hook in hooks:
+                    hook.request_done(record)
+
+    @classmethod
+    @contextlib.contextmanager
+    def parsing(cls, page: PageType):
+        """Time the parsing of the `page` in the context and report it to the hooks"""
+        hooks = cls.HOOKS
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if hooks:
+                seconds = time.perf_counter() - started
+                category = link_category(page.url or "")
+                for hook in hooks:
+                    hook.page_parsed(category, seconds)
+
+    @classmethod
+    def _link_url(cls, link: str) -> str:
+        """Return the complete URL of the `link` (see `request`)"""
         server_url = cls.SERVER_URL
-        link_url = "{}/{}".format(server_url, link) if server_url is not None else link
+        return "{}/{}".format(server_url, link) if server_url is not None else link
 
+    @classmethod
+    def _request_params(cls, use_headers: bool, data: Any) -> dict:
+        """Return the keyword arguments of the session request"""
         params = {}
         if use_headers:
             params["headers"] = cls.HEADER
         if data is not None:
             params["data"] = data
+        return params
+
+    @classmethod
+    def _download(cls, link: str, use_headers: bool, method: str, data: Any) -> PageType:
+        """Download the link using the live session (see `request`)"""
+        session_method = getattr(cls.SESSION, method)
 
-        response = session_method(link_url, **params)
+        response = session_method(cls._link_url(link), **cls._request_params(use_headers, data))
         response.raise_for_status()
-        cls._ensure_no_app_error(response, data)
+        _ensure_no_app_error(cls.APP_ERROR_PATTERN, response, data)
+
+        return response
+
+    @classmethod
+    def find_values_in_blocks(
+            cls, search: dict, link: str, method: str = "get", data: Any = None) -> PageType:
+        """Request the link (see `request`) and find the things specified in the `search`
+        dictionary (see _find_values_in_blocks) while the page is being downloaded
+        The download stops as soon as all of them are found (or an application error
+        shows up), so the returned page only has the content read until then.
+        With a `CACHE` the whole page is requested and searched afterwards, so only
+        complete pages are cached.
+        """
+        if cls.CACHE is None:
+            with cls.reporting(method, link) as report:
+                response = cls._stream_until_found(search, link, method, data)
+                report(response)
+        else:
+            response = cls.request(link, method=method, data=data)
+            _find_values_in_blocks(search, response)
+        return response
 
+    @classmethod
+    def _stream_until_found(cls, search: dict, link: str, method: str, data: Any) -> PageType:
+        """Stream the link using the live session while looking for the things specified
+        in the `search` dictionary and for the application error line by line
+        """
+        # pylint: disable=protected-access
+        session_method = getattr(cls.SESSION, method)
+        app_error_regex = None if cls.APP_ERROR_PATTERN is None else re.compile(
+            cls.APP_ERROR_PATTERN)
+
+        params = cls._request_params(use_headers=True, data=data)
+        with session_method(cls._link_url(link), stream=True, **params) as response:
+            response.raise_for_status()
+            read_lines = []
+            found_app_error = False
+            for byte_line in response.iter_lines():
+                read_lines.append(byte_line)
+                raw_line = byte_line.decode("utf-8")
+                if app_error_regex is not None and app_error_regex.search(raw_line):
+                    found_app_error = True
+                    break
+                if _find_values_in_line(search, _replace_html_spaces(raw_line)):
+                    break
+        # closed, so an unfinished download also closed its connection, but keep
+        # what we've read, so the page can be dumped as usual
+        response._content = b"\n".join(read_lines)
+        response._content_consumed = True
+
+        if found_app_error:
+            _ensure_no_app_error(cls.APP_ERROR_PATTERN, response, data)
         return response
 
     @classmethod
-    def start_session(cls):
-        """Start the live session"""
+    def start_session(cls, pool_size: OptionalInt = None, cache=None):
+        """Start the live session
+        The session keeps up to `pool_size` (default: `POOL_SIZE`) connections
+        alive, so it can be shared by concurrent downloads, and retries the failed
+        GET requests (see `MAX_RETRIES`)
+        The optional `cache` is a cache.ResponseCache
+        """
+        cls.CACHE = cache
+        pool_size = cls.POOL_SIZE if pool_size is None else pool_size
         cls.SESSION = requests.Session()
+        # the last response of the retries is returned as it is, so the callers still check
+        # its status (and every RequestRecord tells how many retries it took)
+        retry = Retry(total=cls.MAX_RETRIES, backoff_factor=cls.RETRY_BACKOFF_FACTOR,
+                      status_forcelist=cls.RETRY_STATUSES, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retry)
+        cls.SESSION.mount("https://", adapter)
+        cls.SESSION.mount("http://", adapter)
 
     @classmethod
     def close_session(cls):
-        """End the live session"""
+        """End the live session and forget the server it was talking to"""
         if cls.SESSION is not None:
             cls.SESSION.__exit__()
+            cls.SESSION = None
+        (cls.SERVER_URL, cls.SERVER_ID, cls.APP_ERROR_PATTERN) = (None, None, None)
 
 
 def _parse_login_status(response: PageType):
@@ -148,237 +313,6 @@ def _ensure_login(response: PageType):
         )
 
 
-class NoDefinitionInThisLanguageError(Exception):
-    """Should be raised if we try to get the translation for a supported language
-    in LanguageDependentText, but it is None
-    """
-
-
-class LanguageDependentText:
-    """Store all the translations of a text in these 'language fields'"""
-
-    SUPPORTED_LANGUAGES = ["hungarian", "english"]
-
-    def __init__(self, **kwargs):
-        for language in self.SUPPORTED_LANGUAGES:
-            setattr(self, language, kwargs[language])
-
-    def translate_to(self, language: str):
-        """Get the text in the specified language
-        If the language is not supported -> AttributeError
-        If the language is supported, but the text is None ->
-        NoDefinitionInThisLanguageError
-        """
-        text = getattr(self, language)
-        if text is None:
-            available_definitions = {
-                language: value
-                for language in dir(self)
-                if not language.startswith("__")
-                and (value := getattr(self, language)) is not None
-            }
-            error_message = ("{} available definitions: {}"
-                             .format(language, available_definitions))
-            raise NoDefinitionInThisLanguageError(error_message)
-        return text
-
-    @classmethod
-    def find_language_in(cls, page: PageType):
-        """Find and return the page's language or raise a RuntimeError"""
-        page_language_regex = r'lang="(?P<language_id>[^"]+)"'
-        if match := re.search(page_language_regex, _page_text(page)):
-            page_language_pattern_to_script_language_mapping = {
-                "hu": cls.SUPPORTED_LANGUAGES[0],
-                "en": cls.SUPPORTED_LANGUAGES[1],
-            }
-            language_id = match.group("language_id")
-            if language_id not in page_language_pattern_to_script_language_mapping:
-                supported_language_ids = " ".join(
-                    page_language_pattern_to_script_language_mapping.keys()
-                )
-                raise RuntimeError(
-                    (
-                        "Unsupported page language id: '{}'"
-                        " The supported language ids are '{}'"
-                    ).format(language_id, supported_language_ids)
-                )
-
-            language = page_language_pattern_to_script_language_mapping[language_id]
-        else:
-            _raise_and_try_dumping_page_error(
-                "Failed to detect the page's language",
-                "lang",
-                page,
-                page_language_regex,
-            )
-        return language
-
-
-def _remove_witespace(raw_string: str) -> str:
-    """Return a new string without any whitespace"""
-    return "".join(raw_string.split())
-
-
-def _string_to_int(raw_string: str) -> int:
-    """Convert a string that contain numbers and optionally whitespace to int
-    """
-    return int(_remove_witespace(raw_string))
-
-
-class NoPatternMatchError(Exception):
-    """Raise when a pattern matching failed"""
-
-
-class FindState:
-    """Preserve state for a find algorithm with multiple phases"""
-
-    def __init__(self):
-        self.found_value = None
-        self._was_in_block = False
-        self._lines_parsed_in_block = 0
-
-    def found(self):
-        """Return if the searched value was found"""
-        return self.found_value is not None
-
-    def get_int_or_raise_and_try_dumping_page_error(
-            self, base_error_message: str, dump_suffix: str, page: PageType, regex: str = None):
-        """As its name suggests: it tries to return the `found_value` as `int`, or
-        if it wasn't found, call _raise_and_try_dumping_page_error()
-        If converting the found value to `int` fails, some kind of exception
-        will be raised too
-        """
-        if self.found():
-            int_value = _string_to_int(self.found_value)
-        else:
-            _raise_and_try_dumping_page_error(
-                base_error_message, dump_suffix, page, regex, NoPatternMatchError
-            )
-        return int_value
-
-    def find_in_a_block(self, block_pattern: str, value_pattern: str, text: str,
-                        num_lines_of_block: OptionalInt = None):
-        """Find the `block_pattern` then look for the `value_pattern` and, once found,
-        save it into this instance
-
-        `num_lines_of_block` can be used to end the block before the end of `text`
-        """
-        block_ends_at_text_end = num_lines_of_block is None
-        still_in_block = (block_ends_at_text_end
-                          or (self._lines_parsed_in_block < num_lines_of_block))
-        if self._was_in_block and still_in_block and not self.found():
-            if match := re.search(value_pattern, text):
-                self.found_value = match.group("value")
-            self._lines_parsed_in_block += 1
-
-        if not self.found() and re.search(block_pattern, text):
-            self._was_in_block = True
-
-
-class BlockValueFindState(FindState):
-    """Preserve state for block-value pattern-finding algorithms with multi-phases"""
-
-    def __init__(self, block_pattern: str, value_pattern: str,
-                 num_lines_of_block: OptionalInt = None):
-        super(BlockValueFindState, self).__init__()
-        self.block_pattern = block_pattern
-        self.value_pattern = value_pattern
-        self.num_lines_of_block = num_lines_of_block
-
-    def find_in(self, text: str):
-        """Find the `block_pattern` then look for the `value_pattern` and, once found,
-        save it into this instance
-        """
-        self.find_in_a_block(self.block_pattern, self.value_pattern, text, self.num_lines_of_block)
-
-
-def _bytes_to_string(value: bytes) -> str:
-    r"""Convert `value` to string by also replacing the following HTML
-    characters:
-    \xa0 -> " "
-    &nbsp; -> " "
-    """
-    return value.decode("utf-8").replace("\xa0", " ").replace("&nbsp;", " ")
-
-
-def _find_values_in_blocks(search: dict, page: PageType):
-    """Find the things specified in the `search` dictionary on the `page`
-    The expected search dictionary format is this:
-    {
-        '<thing>': BlockValueFindState,
-    }
-    Return whether all of them was found
-    """
-    found_all = False
-    for byte_line in page.iter_lines():
-        string_line = _bytes_to_string(byte_line)
-
-        found_all = True
-        for pattern in search.values():
-            pattern.find_in(string_line)
-            if not pattern.found():
-                found_all = False
-
-        if found_all:
-            break
-    return found_all
-
-
-def _parse_int_values_from_blocks_into(container, search: dict, page: PageType):
-    """Find the things specified in the `search` dictionary on the `page`
-    and convert them into int values to be stored in the `container`
-    """
-    _find_values_in_blocks(search, page)
-
-    for (attribute, string_value) in search.items():
-        not_found_error_message = "Failed to find '{}'".format(attribute)
-        int_value = string_value.get_int_or_raise_and_try_dumping_page_error(
-            not_found_error_message, attribute, page, string_value.block_pattern
-        )
-        setattr(container, attribute, int_value)
-
-
-def _parse_single_int_from_block(
-        page: PageType, name: str, block_pattern: str, value_pattern: str) -> int:
-    """Parse an int from a block and return that or raise RuntimeError with page dump"""
-    search = {name: BlockValueFindState(block_pattern, value_pattern)}
-    _find_values_in_blocks(search, page)
-
-    result = search[name]
-    return result.get_int_or_raise_and_try_dumping_page_error(
-        "Failed to find the '{}'".format(name), name, page, result.value_pattern,
-    )
-
-
-def _parse_player_tsi(player_page: PageType) -> int:
-    """Parse and return the player's TSI or raise a RuntimeError"""
-    return _parse_single_int_from_block(player_page, "TSI",
-                                        block_pattern=r"TSI</td>",
-                                        value_pattern=r">(?P<value>[^><]+)</td>")
-
-
-def _parse_player_ability(player_page: PageType, name, block_pattern, value_pattern) -> Ability:
-    """Parse and return a player ability or raise a RuntimeError or ValueError"""
-    integer = _parse_single_int_from_block(
-        player_page, name, block_pattern, value_pattern
-    )
-    return Ability.parse_from_int(integer)
-
-
-def _parse_player_form(player_page: PageType) -> Ability:
-    """Parse and return the player's form or raise a RuntimeError"""
-    return _parse_player_ability(player_page, "form",
-                                 block_pattern=r"PlayerSkills_trForm",
-                                 value_pattern=LEVEL_PATTERN)
-
-
-def _parse_player_stamina(player_page: PageType) -> Ability:
-    """Parse and return the player's stamina or raise a RuntimeError"""
-    return _parse_player_ability(player_page, "stamina",
-                                 block_pattern=r"PlayerSkills_trStamina",
-                                 value_pattern=LEVEL_PATTERN)
-
-
 def _parse_team_id(page: PageType) -> int:
     """Parse and return the team id or raise a RuntimeError"""
     team_id_pattern = r"currentTeamId=(?P<team_id>\d+)"
@@ -440,9 +374,11 @@ def _get_from_user_if_none(maybe_none_value: OptionalString, get_from_user_funct
 class Hattrick:
     """Represent a Hattrick login-session"""
 
-    MAIN_PAGE = "https://www.hattrick.org/en/"
+    SITE_URL = "https://www.hattrick.org"
+
+    MAIN_PAGE = "{}/en/".format(SITE_URL)
 
-    LOGIN_PAGE = "https://www.hattrick.org/en/Startpage3.aspx"
+    LOGIN_PAGE = "{}/en/Startpage3.aspx".format(SITE_URL)
 
     # we lookup up the value of these when we POST request forms
     LOOKUP_FORM_FIELD_KEYS = (
@@ -451,6 +387,8 @@ class Hattrick:
         "__VIEWSTATEGENERATOR",
     )
 
+    SERVER_PATTERN = r"^(?P<server_url>.*www(?P<server_id>\d+)\.hattrick\.org)"
+
     TOKEN = (";;System.Web.Extensions, Version=4.0.0.0, Culture=neutral,"
              " PublicKeyToken=31bf3856ad364e35:en-GB:ad6c4949-7f20-401f-a40f"
              "-4d4c52722104:ea597d4b:b25378d2")
@@ -476,6 +414,7 @@ class Hattrick:
 
     PLAYERS_LINK = "Club/Players"
     TRANSFER_COMPARE_LINK = "Club/Transfers/TransferCompare"
+    TEAM_LINK = "Club/?TeamID="
     TEAM_LINK_PATTERN = r"Club/\?TeamID="
     TEAM_FINANCE_LINK = "Club/Finances/?teamId="
 
@@ -548,18 +487,36 @@ class Hattrick:
         )
     }
 
-    def __init__(self, currency: str, user: str = None, password: str = None):
-        """Initialise a new session before login"""
+    def __init__(self, currency: str, user: str = None, password: str = None,
+                 max_workers: int = HtLink.POOL_SIZE, cache=None, session_store=None,
+                 site_url: OptionalString = None):
+        """Initialise a new session before login
+        `max_workers` is the maximum number of concurrent downloads
+        `cache` is an optional cache.ResponseCache for the downloaded pages
+        `session_store` is an optional session_store.SessionStore to keep the logged
+        in session between runs instead of logging out
+        `site_url` replaces `SITE_URL` to log in somewhere else e.g. to a fake_hattrick
+        server
+        """
         if currency is None:
             raise ValueError("The currency cannot be None")
+        if site_url is not None:
+            # pylint: disable=invalid-name
+            self.MAIN_PAGE = "{}/en/".format(site_url)
+            self.LOGIN_PAGE = "{}/en/Startpage3.aspx".format(site_url)
 
         self.currency = currency
+        self.max_workers = max_workers
+        self.cache = cache
+        self.session_store = session_store
         self.user = user
         self.password = password
         self.server_id = None
         self.team = None
         self.language = None
         self.logged_in = False
+        self._players_list_index = (None, None)
+        self._players_list_index_lock = threading.Lock()
 
     def _translate_to(self, key: str, language: str) -> str:
         """Translate the value for `key` from `self.DICTIONARY` to the specified
@@ -594,38 +551,124 @@ class Hattrick:
         for key in self.LOOKUP_FORM_FIELD_KEYS:
             _update_form_with_dynamic_value(page, key, form)
 
-    def __enter__(self):
-        """Login to Hattrick
-        If any step fail, an exception is raised so if we managed to enter, we are in.
-        In case of an exception, __exit__ will run, so don't worry.
+    def _login_form(self, main_page: PageType) -> dict:
+        """Return a new login form filled in with the credentials (asking the user
+        for the missing ones) and the lookup values of the `main_page`
         """
-        try:
-            HtLink.start_session()
-            print("Connecting... ", end="")
-            response = HtLink.request(self.MAIN_PAGE, use_headers=False)
-            print("done")
-
-            self.LOGIN_FORM[self.USER_FIELD] = _get_from_user_if_none(self.user, _get_user)
-            self.LOGIN_FORM[self.PASSWORD_FIELD] = _get_from_user_if_none(self.password, getpass)
-            self._fill_in_form_with_lookup_values(response, self.LOGIN_FORM)
-
-            print("Login... ", end="")
-            response = HtLink.request(self.LOGIN_PAGE, method="post", data=self.LOGIN_FORM)
-            response.raise_for_status()
-            _ensure_login(response)
-            self.logged_in = True
-
-            server_pattern = r"^(?P<server_url>.*www(?P<server_id>\d+)\.hattrick\.org)"
-            if match := re.search(server_pattern, response.url):
-                HtLink.SERVER_URL = match.group("server_url")
-                HtLink.SERVER_ID = int(match.group("server_id"))
+        form = dict(self.LOGIN_FORM)
+        self.user = _get_from_user_if_none(self.user, _get_user)
+        form[self.USER_FIELD] = self.user
+        form[self.PASSWORD_FIELD] = _get_from_user_if_none(self.password, getpass)
+        self._fill_in_form_with_lookup_values(main_page, form)
+        return form
+
+    def _parse_login_response(self, response: PageType) -> Tuple[str, int]:
+        """Parse our team and the page language from the post-login `response` and
+        return the (server url, server id) pair we were redirected to or raise
+        a RuntimeError
+        """
+        with HtLink.parsing(response):
+            if match := re.search(self.SERVER_PATTERN, response.url):
                 team_id = _parse_team_id(response)
                 team_name = self._parse_team_name_by_id(response, team_id)
                 self.team = Team(team_id=team_id, name=team_name)
                 self.language = LanguageDependentText.find_language_in(response)
-                HtLink.APP_ERROR_PATTERN = self._translate_to_page_language("app_error")
+                server = (match.group("server_url"), int(match.group("server_id")))
             else:
                 raise RuntimeError("Unexpected URL: '{}'".format(response.url))
+        return server
+
+    def _session_state(self) -> dict:
+        """Return everything we need to resume the current session later"""
+        cookies = [
+            {
+                "name": cookie.name, "value": cookie.value, "domain": cookie.domain,
+                "path": cookie.path, "secure": cookie.secure, "expires": cookie.expires,
+            }
+            for cookie in HtLink.SESSION.cookies
+        ]
+        return {
+            "user": self.user,
+            "server_url": HtLink.SERVER_URL,
+            "server_id": HtLink.SERVER_ID,
+            "team_id": self.team.id,
+            "team_name": self.team.name,
+            "language": self.language,
+            "cookies": cookies,
+        }
+
+    def _is_logged_in_page(self, page: PageType) -> bool:
+        """Return whether the `page` was served to our logged in team"""
+        team_link_regex = r'a href="/{}{}"'.format(self.TEAM_LINK_PATTERN, self.team.id)
+        return (bool(re.search(self.SERVER_PATTERN, page.url))
+                and _parse_login_status(page)
+                and bool(re.search(team_link_regex, _page_text(page))))
+
+    def _try_resuming(self, state: dict) -> bool:
+        """Restore the stored session `state` on the live session and return whether
+        it's still logged in (checked with a single request)
+        """
+        try:
+            for cookie in state["cookies"]:
+                HtLink.SESSION.cookies.set_cookie(create_cookie(**cookie))
+            (HtLink.SERVER_URL, HtLink.SERVER_ID) = (state["server_url"], state["server_id"])
+            self.team = Team(team_id=state["team_id"], name=state["team_name"])
+            self.language = state["language"]
+            HtLink.APP_ERROR_PATTERN = self._translate_to_page_language("app_error")
+            response = HtLink.request("{}{}".format(self.TEAM_LINK, self.team.id))
+            resumed = self._is_logged_in_page(response)
+        except (KeyError, TypeError, AttributeError, RuntimeError, requests.RequestException):
+            resumed = False
+        return resumed
+
+    def _resume_stored_session(self) -> bool:
+        """Try resuming the session of the session store and return whether it worked
+        A stale session is forgotten, so the caller can do a full login.
+        """
+        state = None if self.session_store is None else self.session_store.load()
+        resumed = False
+        if state is not None and self.user in (None, state.get("user")):
+            print("Resuming the stored session... ", end="")
+            resumed = self._try_resuming(state)
+            if resumed:
+                self.user = state["user"]
+                print("we're in! :)")
+            else:
+                print("it's stale")
+                self.session_store.clear()
+                HtLink.SESSION.cookies.clear()
+                (HtLink.SERVER_URL, HtLink.SERVER_ID, HtLink.APP_ERROR_PATTERN) = (None, None, None)
+                (self.team, self.language) = (None, None)
+        return resumed
+
+    def _login(self):
+        """Do the full login to Hattrick on the live session"""
+        print("Connecting... ", end="")
+        response = HtLink.request(self.MAIN_PAGE, use_headers=False)
+        print("done")
+
+        login_form = self._login_form(response)
+
+        print("Login... ", end="")
+        response = HtLink.request(self.LOGIN_PAGE, method="post", data=login_form)
+        response.raise_for_status()
+        _ensure_login(response)
+        self.logged_in = True
+
+        (HtLink.SERVER_URL, HtLink.SERVER_ID) = self._parse_login_response(response)
+        HtLink.APP_ERROR_PATTERN = self._translate_to_page_language("app_error")
+
+    def __enter__(self):
+        """Login to Hattrick (or resume the stored session)
+        If any step fail, an exception is raised so if we managed to enter, we are in.
+        In case of an exception, __exit__ will run, so don't worry.
+        """
+        try:
+            HtLink.start_session(pool_size=self.max_workers, cache=self.cache)
+            if self._resume_stored_session():
+                self.logged_in = True
+            else:
+                self._login()
         except Exception:
             self.__exit__(*sys.exc_info())
             raise
@@ -633,85 +676,84 @@ class Hattrick:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """Logout and exit the session too, if we were logged in and/or the session was live"""
+        """Logout (or store the session for the next run) and exit the session too,
+        if we were logged in and/or the session was live
+        """
         if self.logged_in:
-            HtLink.request(self.LOGOUT_LINK)
+            if self.session_store is None:
+                HtLink.request(self.LOGOUT_LINK)
+                print("We're out! :)")
+            else:
+                self.session_store.save(self._session_state())
+                print("Session stored for the next run")
             self.logged_in = False
-            print("We're out! :)")
 
         HtLink.close_session()
 
+    def _players_list_link(self) -> str:
+        """Return the link of our team's players list page"""
+        return "{}/?TeamID={}".format(self.PLAYERS_LINK, self.team.id)
+
     def download_player_list_page(self):
         """Return the player list page html response object"""
-        players_url_suffix = "{}/?TeamID={}".format(self.PLAYERS_LINK, self.team.id)
-        return HtLink.request(players_url_suffix)
-
-    def _parse_player_age(self, player_page: PageType):
-        """Parse and return the player's age or raise a RuntimeError"""
-        age_pattern = self._translate_to_page_language("age")
-        if match := re.search(age_pattern, _page_text(player_page)):
-            age = Age(int(match.group("years")), int(match.group("days")))
-        else:
-            _raise_and_try_dumping_page_error(
-                "Failed to find the player's age", "age", player_page, age_pattern
+        return HtLink.request(self._players_list_link())
+
+    # page language -> PlayerPageExtractor
+    _PLAYER_PAGE_EXTRACTORS = {}
+
+    def _player_page_extractor(self) -> PlayerPageExtractor:
+        """Return the (shared) player page extractor of the page's language"""
+        extractor = self._PLAYER_PAGE_EXTRACTORS.get(self.language)
+        if extractor is None:
+            extractor = PlayerPageExtractor(self.DICTIONARY, self.language)
+            self._PLAYER_PAGE_EXTRACTORS[self.language] = extractor
+        return extractor
+
+    def players_list_index(self, players_list_page: PageType) -> PlayersListIndex:
+        """Return the index of the `players_list_page`
+        The index of the last page is reused, so it's only built once per page.
+        """
+        with self._players_list_index_lock:
+            (indexed_page, index) = self._players_list_index
+            if indexed_page is not players_list_page:
+                with HtLink.parsing(players_list_page):
+                    index = PlayersListIndex(players_list_page, self.PLAYERS_LINK,
+                                             self._translate_to_page_language("nt"))
+                self._players_list_index = (players_list_page, index)
+        return index
+
+    def _update_national_team_player_status_from_list(
+            self, player: Player, entry: PlayersListEntry):
+        """Update the player's ::NationalPlayerStatus (parsed from the player's page)
+        with what the players list page says
+        """
+        if not player.ntp_status.is_national_team_player and entry.national_team_player:
+            player.ntp_status = NationalPlayerStatus(
+                is_national_team_player=True,
+                is_national_team_player_prospect=False,
             )
-        return age
-
-    def _player_regex(
-            self, name: str, player_link_group="player_link", player_id_group="player_id"):
-        """Return the regular expression to find the named player on the player list page."""
-        return ((r'\<a href="(?P<{}>/{}/Player[^ ]+'
-                 r'playerId=(?P<{}>\d+)&[^ ]+)" title="[^"]+">{}')
-                .format(player_link_group, self.PLAYERS_LINK, player_id_group, name))
-
-    def _parse_national_team_player_status(
-            self, player_page: PageType, player_name: str, players_list_page: PageType):
-        """Parse and return the player's ::NationalPlayerStatus"""
-        nt_player_prospect = False
-        nt_pattern = self._translate_to_page_language("nt")
-        nt_player = bool(re.search(nt_pattern, _page_text(player_page)))
-        if not nt_player:
-            # If a NT player is on sale his status is only visible on the players
-            # list page for some reason
-            player_on_sale_regex = "{}.*transferlisted".format(self._player_regex(player_name))
-            patterns = BlockValueFindState(block_pattern=player_on_sale_regex,
-                                           value_pattern=r'(?P<value>{})'.format(nt_pattern),
-                                           num_lines_of_block=10)
-            _find_values_in_blocks({"nt": patterns}, players_list_page)
-
-            if patterns.found():
-                nt_player = True
-            else:
-                nt_prospect_pattern = self._translate_to_page_language("nt_prospect")
-                nt_player_prospect = bool(re.search(nt_prospect_pattern,
-                                                    _page_text(player_page)))
 
-        return NationalPlayerStatus(
-            is_national_team_player=nt_player,
-            is_national_team_player_prospect=nt_player_prospect,
-        )
+    def _load_more_transfers_form(self, page: PageType) -> dict:
+        """Return a new "load more transfers" form filled in with the lookup values
+        of the original `page`
+        """
+        form = dict(self.LOAD_MORE_TRANSFERS_FORM)  # a private copy per (concurrent) request
+        self._fill_in_form_with_lookup_values(page, form)
+        return form
 
-    def _load_more_transfers(self, page, link):
+    def _load_more_transfers(self, page, link, search: dict):
         """Load more transfers using the original `page` and return this "updated page"
         which supposed to list more transfers
+        The things specified in `search` are looked for while the page is downloading.
         """
-        self._fill_in_form_with_lookup_values(page, self.LOAD_MORE_TRANSFERS_FORM)
-        return HtLink.request(link, method="post", data=self.LOAD_MORE_TRANSFERS_FORM)
+        return HtLink.find_values_in_blocks(search, link, method="post",
+                                            data=self._load_more_transfers_form(page))
 
-    def _download_sell_price_etimation_page(self, player_page: PageType):
-        """Return the requested page's html response object"""
+    def _parse_transfer_compare_link(self, player_page: PageType) -> str:
+        """Parse and return the player's transfer compare link or raise a RuntimeError"""
         regex = r'a href="/(?P<link>{}[^"]+)"'.format(self.TRANSFER_COMPARE_LINK)
         if match := re.search(regex, _page_text(player_page)):
             link = match.group("link")
-            price_estimation_page = HtLink.request(link)
-
-            there_is_more_transfer_to_load = re.search(
-                self.FURTHER_TRANSFERS_LINK_ID, _page_text(price_estimation_page)
-            )
-            if there_is_more_transfer_to_load:
-                price_estimation_page = self._load_more_transfers(
-                    price_estimation_page, link
-                )
         else:
             _raise_and_try_dumping_page_error(
                 "Failed to find the player's transfer compare link",
@@ -719,141 +761,183 @@ class Hattrick:
                 player_page,
                 regex,
             )
+        return link
+
+    def _there_is_more_transfer_to_load(self, price_estimation_page: PageType) -> bool:
+        """Return whether the transfer compare page can list more transfers"""
+        return bool(re.search(self.FURTHER_TRANSFERS_LINK_ID, _page_text(price_estimation_page)))
+
+    def _download_sell_price_etimation_page(self, player_page: PageType, search: dict):
+        """Return the requested page's html response object with the things specified
+        in `search` looked up on it
+        """
+        link = self._parse_transfer_compare_link(player_page)
+        # the lookup form values of this page might be anywhere, so it's read in full
+        price_estimation_page = HtLink.request(link)
+        if self._there_is_more_transfer_to_load(price_estimation_page):
+            price_estimation_page = self._load_more_transfers(price_estimation_page, link, search)
+        else:
+            with HtLink.parsing(price_estimation_page):
+                _find_values_in_blocks(search, price_estimation_page)
         return price_estimation_page
 
     def _parse_player_sell_base_price(self, player_page: PageType):
         """Parse and return the player's base sell price
         To do that we need to navigate to the sell price estimation page first
         """
-        price_estimation_page = self._download_sell_price_etimation_page(player_page)
-
+        search = self._sell_base_price_search()
+        price_estimation_page = self._download_sell_price_etimation_page(player_page, search)
+        return self._sell_base_price_found(search, price_estimation_page)
+
+    def _parse_sell_base_price(self, price_estimation_page: PageType) -> int:
+        """Parse and return the base sell price from the sell price estimation page"""
+        search = self._sell_base_price_search()
+        with HtLink.parsing(price_estimation_page):
+            _find_values_in_blocks(search, price_estimation_page)
+        return self._sell_base_price_found(search, price_estimation_page)
+
+    def _sell_base_price_search(self) -> dict:
+        """Return a new search for the base sell price (see _find_values_in_blocks)"""
         avg_price_block_pattern = self._translate_to_page_language("avg_price_block")
         price_pattern = r'right transfer-compare-bid">(?P<value>[0-9 ]+) {}</th>'.format(
             self.currency
         )
-
-        search = {
+        return {
             "sell_base_price": BlockValueFindState(block_pattern=avg_price_block_pattern,
                                                    value_pattern=price_pattern),
         }
-        _find_values_in_blocks(search, price_estimation_page)
 
+    def _sell_base_price_found(self, search: dict, price_estimation_page: PageType) -> int:
+        """Return the base sell price found by the `search` or raise a NoPatternMatchError"""
         sell_base_price = search["sell_base_price"]
         return sell_base_price.get_int_or_raise_and_try_dumping_page_error(
             "Failed to find the player's base sell price", "bsp",
             price_estimation_page, sell_base_price.value_pattern,
         )
 
-    def _parse_speciality(self, player_page: PageType):
-        """Parse the speciality of the player, if any"""
-        spec_tags = {
-            self._translate_to_page_language(tag): tag
-            for tag in self.DICTIONARY if "spec:" in tag
-        }
-        spec_tags_pattern = r"(?P<spec>{})".format('|'.join(spec_tags.keys()))
-        if match := re.search(spec_tags_pattern, _page_text(player_page)):
-            tag = spec_tags[match.group("spec")]
-            english_name_of_spec = self._translate_to(tag, "english")
-            speciality = Speciality.parse_from_string(english_name_of_spec)
-        else:
-            speciality = Speciality.Nothing
-        return speciality
-
-    def _parse_player_skillz(self, player_page: PageType):
-        """Parse the player's skillz"""
-        search = {
-            "playmaking": BlockValueFindState(block_pattern="PlayerSkills_trPlaymaker",
-                                              value_pattern=LEVEL_PATTERN),
-            "winger": BlockValueFindState(block_pattern="PlayerSkills_trWinger",
-                                          value_pattern=LEVEL_PATTERN),
-            "passing": BlockValueFindState(block_pattern="PlayerSkills_trPasser",
-                                           value_pattern=LEVEL_PATTERN),
-            "scoring": BlockValueFindState(block_pattern="PlayerSkills_trScorer",
-                                           value_pattern=LEVEL_PATTERN),
-        }
-        skillz = Skillz()
-        _parse_int_values_from_blocks_into(skillz, search, player_page)
-
-        skillz.speciality = self._parse_speciality(player_page)
-
-        return skillz
-
-    def _parse_player_stars(self, player_page: PageType):
-        """If there were previous games for this players, we'll return his star-rating
-        Otherwise, we'll return None.
+    def _update_player_from_player_page(self, player: Player, page: PageType):
+        """Parse all the info available on the player's own `page` into the specified `player`
         """
-        star_pattern = self._translate_to_page_language("avg_star_value")
-        if match := re.search(star_pattern, _page_text(player_page)):
-            stars = float(match.group("stars"))
-        else:
-            stars = None
-        return stars
+        with HtLink.parsing(page):
+            self._player_page_extractor().extract_into(player, page)
 
     def _update_player(self, player: Player, page: PageType):
         """Parse all the info we need from `page` into the specified `player`
         """
-        player.age = self._parse_player_age(page)
-        player.tsi = _parse_player_tsi(page)
-        player.form = _parse_player_form(page)
-        player.stamina = _parse_player_stamina(page)
+        self._update_player_from_player_page(player, page)
         player.sell_base_price = self._parse_player_sell_base_price(page)
-        player.extra.skillz = self._parse_player_skillz(page)
-        player.extra.stars = self._parse_player_stars(page)
+
+    def _find_player_on_list(self, name, players_list_page, raise_exception_if_not_found=True):
+        """Return the players list entry of the named player and a new Player object
+        with its link and id
+        Raise an exception or just return `(None, None)` depending on
+        `raise_exception_if_not_found`
+        """
+        entry = self.players_list_index(players_list_page).by_name(name)
+        if entry is not None:
+            player = Player(name, link=entry.link, player_id=entry.player_id)
+        elif raise_exception_if_not_found:
+            raise RuntimeError(
+                "could not find any player named '{}' on the players list!".format(name)
+            )
+        else:
+            player = None
+        return (entry, player)
 
     def download_player_by_name(self, name, players_list_page, raise_exception_if_not_found=True):
         """Return the Player object for the given `name`
         Raise an exception or just return `None` depending on `raise_exception_if_not_found`
         """
-        player_regex = self._player_regex(
-            name, player_link_group="player_link", player_id_group="player_id")
-        if match := re.search(player_regex, _page_text(players_list_page)):
-            player = Player(
-                name,
-                link=match.group("player_link"),
-                player_id=match.group("player_id"),
-            )
+        (entry, player) = self._find_player_on_list(
+            name, players_list_page, raise_exception_if_not_found)
+        if player is not None:
             player_page = HtLink.request(player.link)
 
             self._update_player(player, player_page)
 
-            player.ntp_status = self._parse_national_team_player_status(
-                player_page, player.name, players_list_page)
-        elif raise_exception_if_not_found:
-            raise RuntimeError(
-                "could not find any player based on '{}'!".format(player_regex)
-            )
-        else:
-            player = None
+            self._update_national_team_player_status_from_list(player, entry)
 
         return player
 
-    def _download_team_finance_page(self):
-        """Return the team-finance-page's html response object"""
-        team_finance_url_suffix = "{}{}".format(self.TEAM_FINANCE_LINK, self.team.id)
-        return HtLink.request(team_finance_url_suffix)
+    def download_players(
+            self, names: Iterable[str], players_list_page: PageType,
+            max_workers: OptionalInt = None) -> Iterator[Player]:
+        """Download the players named in `names` concurrently and yield each
+        Player object as soon as it is ready (i.e. not necessarily in the order of `names`)
+        At most `max_workers` (default: `self.max_workers`) players are downloaded
+        at the same time.
+        If downloading a player fails, the error is printed and the rest of the
+        batch carries on.
+        """
+        max_workers = self.max_workers if max_workers is None else max_workers
+        self.players_list_index(players_list_page)  # index it once, before the workers need it
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.download_player_by_name, name, players_list_page): name
+                for name in names
+            }
+            for future in as_completed(futures):
+                try:
+                    player = future.result()
+                except Exception:  # pylint: disable=broad-except
+                    print("Failed to download '{}':".format(futures[future]))
+                    traceback.print_exc()
+                else:
+                    yield player
+
+    def _team_finance_link(self) -> str:
+        """Return the link of our team's finance page"""
+        return "{}{}".format(self.TEAM_FINANCE_LINK, self.team.id)
+
+    def _download_team_finance_page(self, search: dict):
+        """Return the team-finance-page's html response object with the things specified
+        in `search` looked up on it (the download stops once all of them are found)
+        """
+        return HtLink.find_values_in_blocks(search, self._team_finance_link())
 
     def download_team(self):
         """Return the Team object for our beloved team"""
-        finance_page = self._download_team_finance_page()
+        search = self._team_finance_search()
+        finance_page = self._download_team_finance_page(search)
+        return self._parse_team_finance(finance_page, search)
 
-        money_pattern = r"(?P<value>[0-9][0-9 ]+) {}".format(self.currency)
-        try:
-            total_pattern = self._translate_to_page_language("total")
-            reserves_pattern = self._translate_to_page_language("board_reserves")
-            search = {
-                "total": BlockValueFindState(block_pattern=total_pattern,
-                                             value_pattern=money_pattern),
-                "board_reserves": BlockValueFindState(block_pattern=reserves_pattern,
-                                                      value_pattern=money_pattern),
-            }
-            _parse_int_values_from_blocks_into(self.team.finance, search, finance_page)
-        except NoPatternMatchError:
-            cash_pattern = self._translate_to_page_language("cash")
-            search = {
-                "total": BlockValueFindState(block_pattern=cash_pattern,
-                                             value_pattern=money_pattern),
-            }
-            _parse_int_values_from_blocks_into(self.team.finance, search, finance_page)
-            self.team.finance.board_reserves = 0
+    def _money_pattern(self) -> str:
+        """Return the pattern of an amount of money in our currency"""
+        return r"(?P<value>[0-9][0-9 ]+) {}".format(self.currency)
+
+    def _team_finance_search(self) -> dict:
+        """Return a new search for the total and the board reserves
+        (see _find_values_in_blocks)
+        """
+        money_pattern = self._money_pattern()
+        total_pattern = self._translate_to_page_language("total")
+        reserves_pattern = self._translate_to_page_language("board_reserves")
+        return {
+            "total": BlockValueFindState(block_pattern=total_pattern,
+                                         value_pattern=money_pattern),
+            "board_reserves": BlockValueFindState(block_pattern=reserves_pattern,
+                                                  value_pattern=money_pattern),
+        }
+
+    def _parse_team_finance(self, finance_page: PageType, search: Optional[dict] = None):
+        """Parse the team finance info from the `finance_page` into our team and return it
+        `search` is the already done _team_finance_search on the page, if any
+        """
+        money_pattern = self._money_pattern()
+        with HtLink.parsing(finance_page):
+            try:
+                if search is None:
+                    search = self._team_finance_search()
+                    _find_values_in_blocks(search, finance_page)
+                _store_int_values_found_in_blocks(self.team.finance, search, finance_page)
+            except NoPatternMatchError:
+                # not everything was found, so the whole page was read
+                cash_pattern = self._translate_to_page_language("cash")
+                search = {
+                    "total": BlockValueFindState(block_pattern=cash_pattern,
+                                                 value_pattern=money_pattern),
+                }
+                _parse_int_values_from_blocks_into(self.team.finance, search, finance_page)
+                self.team.finance.board_reserves = 0
 
         return self.team
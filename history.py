@@ -0,0 +1,403 @@
+# coding=utf-8
+"""The SQLite persistence module
+It has the same interface as the excel persistence module, but every update is an indexed
+insert (or update) in the history of the team and the players, so it doesn't get slower
+season by season. The workbook layout can be regenerated from the history on demand
+(see export_workbook).
+"""
+import argparse
+from datetime import date, datetime, timedelta
+import os.path
+import sqlite3
+import sys
+from typing import List, Optional
+from urllib.request import pathname2url
+
+import openpyxl
+
+from data import Ability, Player, Source, Speciality, Team, NUM_AUCTION_DAYS
+from excel import (Excel, BUY_PRICE_COLUMN, DATE_COLUMN, NEW_PLAYER_MARKER, SOLD_PLAYER_MARKER,
+                   TEAM_SHEET, TOTAL_LABEL, BOARD_RESERVES_LABEL, run_if_not_read_only)
+from sheet import NtpValueAndFormat
+
+
+SQLITE_BACKEND = "sqlite"  # the history is kept in an SQLite database (see HistoryStore)
+
+# every table is clustered on its primary key, so both the appends and the date range
+# queries are index lookups however long the history is
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS team_finance (
+    date TEXT PRIMARY KEY,
+    total REAL,
+    board_reserves REAL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    player_id TEXT,
+    sold INTEGER NOT NULL DEFAULT 0,
+    arrival TEXT,
+    buy_price REAL,
+    source TEXT,
+    speciality TEXT,
+    stars REAL,
+    playmaking INTEGER,
+    winger INTEGER,
+    passing INTEGER,
+    scoring INTEGER,
+    reserve_price REAL,
+    final_price REAL,
+    central_date TEXT
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS players_by_arrival ON players (sold, arrival);
+
+CREATE TABLE IF NOT EXISTS player_snapshots (
+    name TEXT NOT NULL REFERENCES players (name),
+    date TEXT NOT NULL,
+    age_years INTEGER,
+    age_days INTEGER,
+    tsi INTEGER,
+    is_ntp INTEGER,
+    form INTEGER,
+    stamina INTEGER,
+    sell_base_price REAL,
+    PRIMARY KEY (name, date)
+) WITHOUT ROWID;
+"""
+
+FIRST_DAY = "0001-01-01"
+LAST_DAY = "9999-12-31"
+
+PLAYER_HEADERS = [DATE_COLUMN, BUY_PRICE_COLUMN, "Kor (év)", "Kor (nap)", "TSI",
+                  "Válogatott?", "Forma", "Erőnlét", "Eladási alapár"]
+CENTRAL_HEADERS = ["Név", "Forrás", "Spec", "Kor (év)", "Kor (nap)", "TSI", "Csillagok",
+                   "Játékszervezés", "Szélsőjáték", "Átadás", "Gólszerzés", "Kikiáltási ár",
+                   "Végső ár", "Érkezés -> Távozás"]
+NEW_PLAYER_SHEET = NEW_PLAYER_MARKER + "Új"
+
+
+def _day(value) -> Optional[str]:
+    """Return the date (or datetime) as an ISO date string (None stays None)"""
+    if isinstance(value, datetime):
+        value = value.date()
+    return None if value is None else value.isoformat()
+
+
+def _as_date(value: Optional[str]) -> Optional[date]:
+    """Return the ISO date string as a date (None stays None)"""
+    return None if value is None else date.fromisoformat(value)
+
+
+def _enum_name(value) -> Optional[str]:
+    """Return the name of the enum member (None stays None)"""
+    return None if value is None else value.name
+
+
+def _ability_level(ability: Ability) -> Optional[int]:
+    """Return the level of the ability (None stays None)"""
+    return None if ability is None else ability.value.integer
+
+
+class HistoryStore:
+    """SQLite-based HT persistence layer
+    A run is a single transaction: it's committed at the end, unless there was an exception
+    (or we are in read-only mode).
+    """
+
+    def __init__(self, file: str, read_only: bool):
+        if read_only and not os.path.isfile(file):
+            raise ValueError("Cannot find '{}'".format(file))
+        self._file = file
+        self._read_only = read_only
+        self._connection = None
+        self._today = date.today()
+
+    def __enter__(self):
+        """Open (or create) self._file
+        In case of an exception, __exit__ will run, so don't worry.
+        """
+        try:
+            if self._read_only:
+                uri = "file:{}?mode=ro".format(pathname2url(os.path.abspath(self._file)))
+                self._connection = sqlite3.connect(uri, uri=True)
+            else:
+                self._connection = sqlite3.connect(self._file)
+                self._connection.executescript(SCHEMA)
+            self._connection.row_factory = sqlite3.Row
+            print("Opened '{}' (read-only mode: {})".format(self._file, self._read_only))
+        except Exception:
+            self.__exit__(*sys.exc_info())
+            raise
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        """Commit the transaction, if there was no exception, and we are not in read-only mode
+        When __exit__ returns True, any exception passed to it is swallowed.
+        When __exit__ returns False, the exception is re-raised.
+        """
+        there_was_no_exception = exc_type is None
+
+        if self._connection is not None:
+            if self._read_only:
+                print("Nothing to save as we're in read-only mode. Bye!")
+            elif there_was_no_exception:
+                print("Saving '{}'...".format(self._file))
+                self._connection.commit()
+            else:
+                print("One or more exceptions have invalidated the update!")
+                self._connection.rollback()
+            self._connection.close()
+            self._connection = None
+
+        success = there_was_no_exception
+
+        return success
+
+    def _execute(self, sql: str, parameters=()) -> sqlite3.Cursor:
+        """Execute the statement on the open database"""
+        if self._connection is None:
+            raise RuntimeError("Tried accessing the history when we don't even have a database!")
+        return self._connection.execute(sql, parameters)
+
+    def _is_monitored(self, name: str) -> bool:
+        """Return whether the player is known and not sold yet"""
+        row = self._execute("SELECT sold FROM players WHERE name = ?", (name,)).fetchone()
+        return row is not None and not row["sold"]
+
+    def _save_snapshot(self, player: Player, day: date):
+        """Store (or overwrite) the `player`'s snapshot of the day"""
+        self._execute(
+            "INSERT OR REPLACE INTO player_snapshots"
+            " (name, date, age_years, age_days, tsi, is_ntp, form, stamina, sell_base_price)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (player.name, _day(day), player.age.years, player.age.days, player.tsi,
+             player.ntp_status.is_national_team_player, _ability_level(player.form),
+             _ability_level(player.stamina), player.sell_base_price))
+
+    def _save_central_attributes(self, player: Player, reserve_price, final_price,
+                                 central_date):
+        """Update the attributes of the `player` shown on the central player sheet"""
+        skillz = player.extra.skillz
+        self._execute(
+            "UPDATE players SET stars = ?, playmaking = ?, winger = ?, passing = ?,"
+            " scoring = ?, reserve_price = ?, final_price = ?, central_date = ?"
+            " WHERE name = ?",
+            (player.extra.stars, skillz.playmaking, skillz.winger, skillz.passing,
+             skillz.scoring, reserve_price, final_price, _day(central_date), player.name))
+
+    def monitored_players_names(self) -> List[str]:
+        """Return the list of the monitored players' names, the latest arrival first
+        (read-only operation)
+        """
+        print("history -> player list... ", end="")
+        rows = self._execute(
+            "SELECT name FROM players WHERE sold = 0 ORDER BY arrival DESC").fetchall()
+        print("done")
+        return [row["name"] for row in rows]
+
+    def update_team(self, team: Team) -> None:
+        """Store today's finances of the team (unless we're in read-only mode)"""
+        print("Team -> history... ", end="")
+
+        with run_if_not_read_only(self._read_only):
+            self._execute(
+                "INSERT OR REPLACE INTO team_finance (date, total, board_reserves)"
+                " VALUES (?, ?, ?)",
+                (_day(self._today), team.finance.total, team.finance.board_reserves))
+
+    def update_player(self, player: Player) -> None:
+        """Store the `player`'s snapshot of today (unless we're in read-only mode)"""
+        print("### Update '{}' -> history... ".format(player.name), end="")
+
+        with run_if_not_read_only(self._read_only):
+            if not self._is_monitored(player.name):
+                raise RuntimeError("'{}' is not a monitored player".format(player.name))
+            self._save_snapshot(player, self._today)
+            self._save_central_attributes(player, player.sell_base_price,
+                                          player.sell_base_price,
+                                          self._today + timedelta(days=NUM_AUCTION_DAYS))
+
+    def add_player(self, player: Player) -> None:
+        """Add a new player to the history (unless we're in read-only mode)
+        An already known player only gets his central attributes updated.
+        """
+        print("### Add '{}' -> history... ".format(player.name), end="")
+
+        with run_if_not_read_only(self._read_only):
+            extra = player.extra
+            known = self._execute("SELECT 1 FROM players WHERE name = ?",
+                                  (player.name,)).fetchone()
+            if known is None:
+                self._execute(
+                    "INSERT INTO players"
+                    " (name, player_id, arrival, buy_price, source, speciality)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (player.name, player.id, _day(extra.arrival), extra.buy_price,
+                     _enum_name(extra.source), _enum_name(extra.skillz.speciality)))
+                self._save_snapshot(player, extra.arrival or self._today)
+            self._save_central_attributes(player, extra.reserve_price, extra.buy_price,
+                                          extra.arrival)
+
+    def mark_sold(self, name: str) -> None:
+        """Stop monitoring the player (unless we're in read-only mode)"""
+        print("### Sold '{}' -> history... ".format(name), end="")
+
+        with run_if_not_read_only(self._read_only):
+            if not self._is_monitored(name):
+                raise RuntimeError("'{}' is not a monitored player".format(name))
+            self._execute("UPDATE players SET sold = 1 WHERE name = ?", (name,))
+
+    def players(self) -> List[sqlite3.Row]:
+        """Return every player (sold ones too), the latest arrival first"""
+        return self._execute("SELECT * FROM players ORDER BY arrival DESC").fetchall()
+
+    def player_history(self, name: str, first_day: date = None,
+                       last_day: date = None) -> List[sqlite3.Row]:
+        """Return the player's snapshots between the days (both inclusive), oldest first"""
+        return self._execute(
+            "SELECT * FROM player_snapshots WHERE name = ? AND date BETWEEN ? AND ?"
+            " ORDER BY date",
+            (name, _day(first_day) or FIRST_DAY, _day(last_day) or LAST_DAY)).fetchall()
+
+    def latest_snapshot(self, name: str) -> Optional[sqlite3.Row]:
+        """Return the player's latest snapshot (None if there are none yet)"""
+        return self._execute(
+            "SELECT * FROM player_snapshots WHERE name = ? ORDER BY date DESC LIMIT 1",
+            (name,)).fetchone()
+
+    def team_finance_history(self, first_day: date = None,
+                             last_day: date = None) -> List[sqlite3.Row]:
+        """Return the team's finances between the days (both inclusive), oldest first"""
+        return self._execute(
+            "SELECT * FROM team_finance WHERE date BETWEEN ? AND ? ORDER BY date",
+            (_day(first_day) or FIRST_DAY, _day(last_day) or LAST_DAY)).fetchall()
+
+    def latest_team_finance(self) -> Optional[sqlite3.Row]:
+        """Return the latest finances of the team (None if there are none yet)"""
+        return self._execute(
+            "SELECT * FROM team_finance ORDER BY date DESC LIMIT 1").fetchone()
+
+
+def _export_team_sheet(store: HistoryStore, worksheet):
+    """Write the latest finances of the team with their labels"""
+    finance = store.latest_team_finance()
+    if finance is not None:
+        worksheet.cell(1, 1, _as_date(finance["date"]))
+        for (row_number, (label, value)) in enumerate(
+                ((TOTAL_LABEL, finance["total"]),
+                 (BOARD_RESERVES_LABEL, finance["board_reserves"])), 3):
+            worksheet.cell(row_number, 1, label)
+            worksheet.cell(row_number, 2, value)
+
+
+def _enum_value(enum_type, name: Optional[str]):
+    """Return the (displayed) value of the named enum member (None stays None)"""
+    return None if name is None else enum_type[name].value
+
+
+def _export_central_player_sheet(store: HistoryStore, worksheet, players: List[sqlite3.Row]):
+    """Write the central player sheet: a pair of columns per player, the latest arrival first"""
+    for (row_number, header) in enumerate(CENTRAL_HEADERS, 2):
+        worksheet.cell(row_number, 1, header)
+    for (index, player) in enumerate(players):
+        name_column = 2 + 2 * index
+        latest = store.latest_snapshot(player["name"])
+        value_of_header = {
+            "Név": player["name"],
+            "Forrás": _enum_value(Source, player["source"]),
+            "Spec": _enum_value(Speciality, player["speciality"]),
+            "Kor (év)": None if latest is None else latest["age_years"],
+            "Kor (nap)": None if latest is None else latest["age_days"],
+            "TSI": None if latest is None else latest["tsi"],
+            "Csillagok": player["stars"],
+            "Játékszervezés": player["playmaking"],
+            "Szélsőjáték": player["winger"],
+            "Átadás": player["passing"],
+            "Gólszerzés": player["scoring"],
+            "Kikiáltási ár": player["reserve_price"],
+            "Végső ár": player["final_price"],
+            "Érkezés -> Távozás": _as_date(player["central_date"]),
+        }
+        worksheet.cell(1, name_column, player["name"])
+        for (row_number, header) in enumerate(CENTRAL_HEADERS, 2):
+            worksheet.cell(row_number, name_column + 1, value_of_header[header])
+
+
+def _export_player_sheet(store: HistoryStore, worksheet, player: sqlite3.Row):
+    """Write the player's snapshots day by day"""
+    for (column_number, header) in enumerate(PLAYER_HEADERS, 1):
+        worksheet.cell(1, column_number, header)
+    for (row_number, snapshot) in enumerate(store.player_history(player["name"]), 2):
+        ntp = NtpValueAndFormat() if snapshot["is_ntp"] else None
+        values = [
+            _as_date(snapshot["date"]),
+            player["buy_price"] if row_number == 2 else None,
+            snapshot["age_years"],
+            snapshot["age_days"],
+            snapshot["tsi"],
+            "Nem" if ntp is None else ntp.value,
+            None if snapshot["form"] is None else str(Ability.parse_from_int(snapshot["form"])),
+            (None if snapshot["stamina"] is None
+             else str(Ability.parse_from_int(snapshot["stamina"]))),
+            snapshot["sell_base_price"],
+        ]
+        for (column_number, value) in enumerate(values, 1):
+            worksheet.cell(row_number, column_number, value)
+        if ntp is not None:
+            ntp.format_cell_openpyxl(worksheet.cell(row_number, PLAYER_HEADERS.index(
+                "Válogatott?") + 1))
+
+
+def export_workbook(store: HistoryStore, file: str):
+    """Regenerate the workbook of the history in the layout of the excel persistence module:
+    the team sheet, the central player sheet, a sheet per player (the latest arrival first,
+    the sold ones marked) and the new player sheet at the end
+    Only the data is exported, the formulas, the charts and the formats (apart from the NTP's)
+    of the original workbook are not.
+    """
+    book = openpyxl.Workbook()
+    team_worksheet = book.active
+    team_worksheet.title = TEAM_SHEET
+    _export_team_sheet(store, team_worksheet)
+
+    players = store.players()
+    _export_central_player_sheet(store, book.create_sheet(Excel.CENTRAL_PLAYER_SHEET), players)
+    for player in players:
+        title = (SOLD_PLAYER_MARKER if player["sold"] else "") + player["name"]
+        _export_player_sheet(store, book.create_sheet(title), player)
+
+    new_player_worksheet = book.create_sheet(NEW_PLAYER_SHEET)
+    for (column_number, header) in enumerate(PLAYER_HEADERS, 1):
+        new_player_worksheet.cell(1, column_number, header)
+
+    book.save(file)
+
+
+def main():
+    """parse args and export the history or mark a player sold"""
+    parser = argparse.ArgumentParser(description="Manage the SQLite history of the team")
+    parser.add_argument("command", choices=("export", "sold"))
+    parser.add_argument("-s", "--spreadsheet", required=True,
+                        help="the SQLite database of the history")
+    parser.add_argument("-o", "--output", default=None,
+                        help="the workbook to export the history to (export only)")
+    parser.add_argument("-n", "--name", default=None,
+                        help="the sold player's full name (sold only)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        if args.output is None:
+            parser.error("the export needs an --output workbook")
+        with HistoryStore(args.spreadsheet, read_only=True) as store:
+            export_workbook(store, args.output)
+    else:
+        if args.name is None:
+            parser.error("marking a player sold needs his --name")
+        with HistoryStore(args.spreadsheet, read_only=False) as store:
+            store.mark_sold(args.name)
+
+
+if __name__ == "__main__":
+    main()
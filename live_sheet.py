@@ -0,0 +1,522 @@
+# coding=utf-8
+"""The xlwings backend of the excel persistence module
+The workbook is opened in the Excel application and every sheet access is a COM round trip
+to it (see ComCalls), which makes the script Windows dependent.
+"""
+from datetime import date
+import functools
+import inspect
+from typing import List
+import xlwings as xl
+
+from overrides import overrides
+
+from sheet import COPY, FORMAT, READ, WRITE, ComCalls, Sheet, ValueAndFormat, contiguous_spans
+
+
+RangeType = xl.Range
+RowType = xl.Range
+ColumnType = xl.Range
+SheetType = xl.Sheet
+SheetsType = List[SheetType]
+
+# the maximum length of a (union) range address Excel accepts
+MAX_ADDRESS_LENGTH = 255
+
+
+# the date and time values xlwings returns are datetime.datetime (a datetime.date)
+_PLAIN_TYPES = (type(None), bool, int, float, str, bytes, list, tuple, dict, date)
+# the attributes that xlwings serves without a round trip (the COM object's handle and
+# a range with other conversion options)
+_LOCAL_ATTRIBUTES = ("api", "options")
+# the kind of the round trip of the methods (every other one is a write)
+_KIND_OF_METHOD = {
+    "Book": READ,  # opening the workbook
+    "range": READ,
+    "end": READ,
+    "resize": READ,
+    "copy": COPY,
+    "Copy": COPY,  # the COM method of a sheet
+}
+
+
+def _unwrap(value):
+    """Return the xlwings (or COM) object of a _ComProxy or the value itself"""
+    # pylint: disable=protected-access
+    return value._target if isinstance(value, _ComProxy) else value
+
+
+def _is_method(value) -> bool:
+    """Return whether the attribute `value` is a method (or a class) to be called
+    (a COM object of the dynamic dispatch is callable too, but it isn't a method)
+    """
+    return inspect.ismethod(value) or inspect.isfunction(value) or inspect.isclass(value)
+
+
+class _ComProxy:
+    """An xlwings (or COM) object whose every attribute read, attribute write and method
+    call is reported to ComCalls as a round trip (see _KIND_OF_METHOD), except for the
+    _LOCAL_ATTRIBUTES
+    The objects it returns are proxies too (unless they are plain values), so wrapping the
+    xlwings module counts every access of the workbook. The writes are reported as
+    `write_kind` e.g. FORMAT for a range being formatted (see _formatting).
+    """
+
+    __slots__ = ("_target", "_write_kind")
+
+    def __init__(self, target, write_kind: str = WRITE):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_write_kind", write_kind)
+
+    def _wrap(self, value):
+        """Return the value or, unless it's a plain one, its proxy"""
+        return value if isinstance(value, _PLAIN_TYPES) else _ComProxy(value, self._write_kind)
+
+    def __getattr__(self, name: str):
+        value = getattr(self._target, name)
+        if _is_method(value):
+            kind = None if name in _LOCAL_ATTRIBUTES else _KIND_OF_METHOD.get(name,
+                                                                              self._write_kind)
+            attribute = self._method(value, kind)
+        else:
+            if name not in _LOCAL_ATTRIBUTES:
+                ComCalls.report(READ)
+            attribute = self._wrap(value)
+        return attribute
+
+    def _method(self, method, kind):
+        """Return the `method` reporting a round trip of the `kind` (if any) when called"""
+        @functools.wraps(method)
+        def reported_method(*args, **kwargs):
+            if kind is not None:
+                ComCalls.report(kind)
+            return self._wrap(method(*(_unwrap(arg) for arg in args),
+                                     **{key: _unwrap(arg) for (key, arg) in kwargs.items()}))
+        return reported_method
+
+    def __setattr__(self, name: str, value):
+        ComCalls.report(self._write_kind)
+        setattr(self._target, name, _unwrap(value))
+
+    def __getitem__(self, key):
+        ComCalls.report(READ)
+        return self._wrap(self._target[key])
+
+    def __iter__(self):
+        for item in self._target:
+            ComCalls.report(READ)
+            yield self._wrap(item)
+
+    def __repr__(self):
+        return "_ComProxy({!r})".format(self._target)
+
+
+def _formatting(cells: _ComProxy) -> _ComProxy:
+    """Return the proxy of the `cells` whose writes are reported as formatting"""
+    return _ComProxy(_unwrap(cells), FORMAT)
+
+
+def _column_letters(column_number: int) -> str:
+    """Return the A1-style letters of the (one-based) column number"""
+    letters = ""
+    while column_number > 0:
+        (column_number, remainder) = divmod(column_number - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def _cell_address(row_number: int, column_number: int) -> str:
+    """Return the A1-style address of the cell"""
+    return "{}{}".format(_column_letters(column_number), row_number)
+
+
+def _rectangles(cells) -> List[tuple]:
+    """Return the (first cell, last cell) rectangles covering the (row, column) cells
+    The spans of adjacent cells of a row are merged with the same spans of the rows below.
+    """
+    columns_of_row = {}
+    for (row_number, column_number) in cells:
+        columns_of_row.setdefault(row_number, {})[column_number] = column_number
+
+    rectangles = []
+    rows_of_span = {}
+    for row_number in sorted(columns_of_row):
+        spans = [(first_column, first_column + len(columns) - 1)
+                 for (first_column, columns) in contiguous_spans(columns_of_row[row_number])]
+        for (span, (first_row, last_row)) in list(rows_of_span.items()):
+            if span not in spans or last_row != row_number - 1:
+                rectangles.append(((first_row, span[0]), (last_row, span[1])))
+                del rows_of_span[span]
+        for span in spans:
+            (first_row, _) = rows_of_span.get(span, (row_number, None))
+            rows_of_span[span] = (first_row, row_number)
+    rectangles.extend(((first_row, span[0]), (last_row, span[1]))
+                      for (span, (first_row, last_row)) in rows_of_span.items())
+    return sorted(rectangles)
+
+
+def _as_rows(values, num_rows: int, num_columns: int) -> List[list]:
+    """Return the value(s) read from a `num_rows` x `num_columns` range as a list of rows
+    (xlwings may return a single value for a cell and a flat list for a row or a column)
+    """
+    if not isinstance(values, (list, tuple)):
+        rows = [[values]]
+    elif values and not isinstance(values[0], (list, tuple)):
+        rows = [list(values)] if num_rows == 1 else [[value] for value in values]
+    else:
+        rows = [list(row) for row in values]
+    if len(rows) != num_rows or any(len(row) != num_columns for row in rows):
+        raise ValueError("Expected {}x{} values and not '{}'".format(num_rows, num_columns,
+                                                                       values))
+    return rows
+
+
+def _grid_value(grid: List[list], row_number: int, column_number: int, empty):
+    """Return the value of the cell in the grid (`empty` outside of it)"""
+    try:
+        value = grid[row_number - 1][column_number - 1]
+    except IndexError:
+        value = empty
+    return value
+
+
+def _formula_of_value(value) -> str:
+    """Return the formula (or constant as text) of a cell after writing the `value` into it"""
+    return "" if value is None else str(value)
+
+
+class LiveSheet(Sheet):
+    """A sheet of the workbook opened in the Excel application where every access goes
+    to the application (and is counted, as the sheet is a _ComProxy of XlwingsWorkbook)
+    """
+
+    def __init__(self, sheet: SheetType):
+        super(LiveSheet, self).__init__()
+        self.sheet = sheet
+        self._name = None
+
+    @property
+    @overrides
+    def name(self) -> str:
+        """The name of the sheet (it's only read once, a wrapped sheet is never renamed)"""
+        if self._name is None:
+            self._name = self.sheet.name
+        return self._name
+
+    @overrides
+    def last_cell(self) -> tuple:
+        """Return the last (row, column) cell of the used range"""
+        last_cell = self.sheet.used_range.last_cell
+        return (last_cell.row, last_cell.column)
+
+    @overrides
+    def last_row_of_block(self, column_number: int) -> int:
+        """Return the last row of the block of non-empty cells at the top of the column"""
+        return _get_column_by_number(self.sheet, column_number).end("down").row
+
+    @overrides
+    def value(self, row_number: int, column_number: int):
+        """Return the value of the cell"""
+        return self.sheet.range(row_number, column_number).value
+
+    @overrides
+    def formula(self, row_number: int, column_number: int) -> str:
+        """Return the formula (or the constant as text) of the cell"""
+        return self.sheet.range(row_number, column_number).formula
+
+    @overrides
+    def read(self, first_cell: tuple, last_cell: tuple) -> List[list]:
+        """Return the values of the rectangle between the cells"""
+        return self.sheet.range(first_cell, last_cell).options(ndim=2).value
+
+    @overrides
+    def read_formulas(self, first_cell: tuple, last_cell: tuple) -> List[list]:
+        """Return the formulas (or the constants as text) of the rectangle between the cells"""
+        formulas = self.sheet.range(first_cell, last_cell).formula
+        return _as_rows(formulas, last_cell[0] - first_cell[0] + 1,
+                        last_cell[1] - first_cell[1] + 1)
+
+    @overrides
+    def write(self, first_cell: tuple, rows: List[list]):
+        """Write the rows of values from the `first_cell` on with a single range write"""
+        last_cell = (first_cell[0] + len(rows) - 1, first_cell[1] + len(rows[0]) - 1)
+        if len(rows) > 1:
+            value = rows
+        else:
+            value = rows[0] if len(rows[0]) > 1 else rows[0][0]
+        self.sheet.range(first_cell, last_cell).value = value
+
+    @overrides
+    def format(self, cells: List[tuple], formatter: ValueAndFormat):
+        """Format the cells at once through a union range
+        (or a few, if the union's address would be too long)
+        """
+        union = []
+        for address in [_cell_address(*cell) for cell in cells] + [None]:
+            union_is_full = (address is None
+                             or len(",".join(union + [address])) > MAX_ADDRESS_LENGTH)
+            if union and union_is_full:
+                formatter.format_cell_win32(_formatting(self.sheet.range(",".join(union))))
+                union = []
+            union.append(address)
+
+    @overrides
+    def copy_row(self, source_row_number: int, destination_row_number: int):
+        """Copy a row (with its formulas and formats) over another one
+        Only the cells of the used range are copied, not the whole row of the grid.
+        """
+        (_, last_column_number) = self.last_cell()
+        source_row = self.sheet.range((source_row_number, 1),
+                                      (source_row_number, last_column_number))
+        source_row.copy(destination=self.sheet.range((destination_row_number, 1)))
+
+    @overrides
+    def insert_columns(self, column_number: int, count: int):
+        """Insert `count` empty columns before the column (the rest shift to the right)"""
+        _get_column_by_number(self.sheet, column_number).resize(column_size=count).insert()
+
+    @overrides
+    def copy_columns(self, source_column_number: int, destination_column_number: int,
+                     count: int):
+        """Copy `count` columns (with their formulas and formats) over other ones"""
+        source = _get_column_by_number(self.sheet, source_column_number)
+        destination = _get_column_by_number(self.sheet, destination_column_number)
+        source.resize(column_size=count).copy(destination.resize(column_size=count))
+
+
+class ShadowSheet(LiveSheet):
+    """A sheet whose used range (values and formulas) is read into a grid on first use
+    The reads are served from the grid, while the writes only change the grid and
+    mark the cells dirty until flush() writes them in bulk and then formats them.
+    Copying rows and inserting columns flushes first, changes the live sheet and
+    mirrors the change in the grid (where the copied formulas keep their old results).
+    """
+
+    def __init__(self, sheet: SheetType):
+        super(ShadowSheet, self).__init__(sheet)
+        self._values = None
+        self._formulas = None
+        self._dirty_cells = set()
+        self._formatter_of_cell = {}
+
+    def _load(self):
+        """Read the used range into the grid unless it's there already"""
+        if self._values is None:
+            last_cell = super(ShadowSheet, self).last_cell()
+            self._values = _as_rows(super(ShadowSheet, self).read((1, 1), last_cell),
+                                    *last_cell)
+            self._formulas = super(ShadowSheet, self).read_formulas((1, 1), last_cell)
+
+    def _grow(self, num_rows: int, num_columns: int):
+        """Make the grid at least `num_rows` x `num_columns` large"""
+        self._load()
+        num_columns = max(num_columns, len(self._values[0]))
+        for (grid, empty) in ((self._values, None), (self._formulas, "")):
+            for row in grid:
+                row.extend([empty] * (num_columns - len(row)))
+            grid.extend([[empty] * num_columns for _ in range(num_rows - len(grid))])
+
+    @overrides
+    def last_cell(self) -> tuple:
+        """Return the last (row, column) cell of the grid"""
+        self._load()
+        return (len(self._values), len(self._values[0]))
+
+    @overrides
+    def last_row_of_block(self, column_number: int) -> int:
+        """Return the last row of the block of non-empty cells at the top of the column"""
+        self._load()
+        row_number = 1
+        while _grid_value(self._values, row_number + 1, column_number, None) is not None:
+            row_number += 1
+        return row_number
+
+    @overrides
+    def value(self, row_number: int, column_number: int):
+        """Return the value of the cell
+        (it's read from the live sheet when the grid isn't needed otherwise, e.g. for a
+        quick look at A1)
+        """
+        if self._values is None:
+            value = super(ShadowSheet, self).value(row_number, column_number)
+        else:
+            value = _grid_value(self._values, row_number, column_number, None)
+        return value
+
+    @overrides
+    def formula(self, row_number: int, column_number: int) -> str:
+        """Return the formula (or the constant as text) of the cell"""
+        self._load()
+        return _grid_value(self._formulas, row_number, column_number, "")
+
+    @overrides
+    def read(self, first_cell: tuple, last_cell: tuple) -> List[list]:
+        """Return the values of the rectangle between the cells"""
+        self._load()
+        return [[_grid_value(self._values, row_number, column_number, None)
+                 for column_number in range(first_cell[1], last_cell[1] + 1)]
+                for row_number in range(first_cell[0], last_cell[0] + 1)]
+
+    @overrides
+    def read_formulas(self, first_cell: tuple, last_cell: tuple) -> List[list]:
+        """Return the formulas (or the constants as text) of the rectangle between the cells"""
+        self._load()
+        return [[_grid_value(self._formulas, row_number, column_number, "")
+                 for column_number in range(first_cell[1], last_cell[1] + 1)]
+                for row_number in range(first_cell[0], last_cell[0] + 1)]
+
+    @overrides
+    def write(self, first_cell: tuple, rows: List[list]):
+        """Write the rows of values into the grid and mark the cells dirty"""
+        (first_row, first_column) = first_cell
+        self._grow(first_row + len(rows) - 1, first_column + len(rows[0]) - 1)
+        for (row_number, values) in enumerate(rows, first_row):
+            for (column_number, value) in enumerate(values, first_column):
+                self._values[row_number - 1][column_number - 1] = value
+                self._formulas[row_number - 1][column_number - 1] = _formula_of_value(value)
+                self._dirty_cells.add((row_number, column_number))
+
+    @overrides
+    def format(self, cells: List[tuple], formatter: ValueAndFormat):
+        """Remember the format of the cells until the next flush"""
+        for cell in cells:
+            self._formatter_of_cell[cell] = formatter
+
+    @overrides
+    def copy_row(self, source_row_number: int, destination_row_number: int):
+        """Copy a row on the live sheet and in the grid"""
+        self.flush()
+        super(ShadowSheet, self).copy_row(source_row_number, destination_row_number)
+        self._grow(max(source_row_number, destination_row_number), 0)
+        for grid in (self._values, self._formulas):
+            grid[destination_row_number - 1] = list(grid[source_row_number - 1])
+
+    @overrides
+    def insert_columns(self, column_number: int, count: int):
+        """Insert the columns into the live sheet and the grid"""
+        self.flush()
+        super(ShadowSheet, self).insert_columns(column_number, count)
+        self._grow(0, column_number)
+        for (grid, empty) in ((self._values, None), (self._formulas, "")):
+            for row in grid:
+                row[column_number - 1:column_number - 1] = [empty] * count
+
+    @overrides
+    def copy_columns(self, source_column_number: int, destination_column_number: int,
+                     count: int):
+        """Copy the columns on the live sheet and in the grid"""
+        self.flush()
+        super(ShadowSheet, self).copy_columns(source_column_number,
+                                              destination_column_number, count)
+        self._grow(0, max(source_column_number, destination_column_number) + count - 1)
+        (source, destination) = (source_column_number - 1, destination_column_number - 1)
+        for grid in (self._values, self._formulas):
+            for row in grid:
+                row[destination:destination + count] = row[source:source + count]
+
+    @overrides
+    def flush(self):
+        """Write the dirty cells (one write per rectangle of them) and then format them
+        (one union range per format type, see LiveSheet.format)
+        """
+        for (first_cell, last_cell) in _rectangles(self._dirty_cells):
+            super(ShadowSheet, self).write(first_cell, self.read(first_cell, last_cell))
+        self._dirty_cells.clear()
+
+        cells_of_type = {}
+        for (cell, formatter) in self._formatter_of_cell.items():
+            (_, cells) = cells_of_type.setdefault(type(formatter), (formatter, []))
+            cells.append(cell)
+        for (formatter, cells) in cells_of_type.values():
+            super(ShadowSheet, self).format(cells, formatter)
+        self._formatter_of_cell.clear()
+
+
+def _get_column_by_number(sheet: SheetType, column_number: int) -> ColumnType:
+    """Return the column (aka range) of the sheet for column_number:column_number"""
+    column_index = column_number - 1
+    _ensure_valid_index(column_index)
+    return sheet[:, column_index]
+
+
+def _ensure_valid_index(index: int):
+    """Raise IndexError if the index is smaller than zero"""
+    if index < 0:
+        raise IndexError("'{}' supposed to be a non-negative integer")
+
+
+class XlwingsWorkbook:
+    """The workbook opened in the Excel application (through xlwings)
+    Its sheets are LiveSheets (or ShadowSheets in `shadow` mode) and every sheet is
+    wrapped only once, so that all its pending changes are in one place.
+    """
+
+    def __init__(self, file: str, read_only: bool, shadow: bool = False):
+        self.book = _ComProxy(xl).Book(file, read_only=read_only)
+        self._sheet_class = ShadowSheet if shadow else LiveSheet
+        self._sheet_of_name = {}
+        self._app_state = None
+
+    def _wrap(self, sheet: SheetType) -> LiveSheet:
+        """Return the (only) LiveSheet of the xlwings `sheet`"""
+        wrapper = self._sheet_class(sheet)
+        return self._sheet_of_name.setdefault(wrapper.name, wrapper)
+
+    def sheets(self) -> List[LiveSheet]:
+        """Return the sheets in the workbook's order"""
+        return [self._wrap(sheet) for sheet in self.book.sheets]
+
+    def sheet(self, name: str) -> LiveSheet:
+        """Return the named sheet or raise a KeyError"""
+        sheet = self._sheet_of_name.get(name)
+        if sheet is None:
+            sheet = self._wrap(self.book.sheets[name])
+        return sheet
+
+    def copy_sheet(self, source: LiveSheet, before_this_sheet: LiveSheet, name: str) -> LiveSheet:
+        """Create a copy of a sheet before another sheet
+        WARNING: this makes the script Windows dependent!
+        """
+        source.flush()
+        source.sheet.api.Copy(Before=before_this_sheet.sheet.api)
+        new_sheet_index = before_this_sheet.sheet.index - 2
+        new_sheet = self.book.sheets[new_sheet_index]
+        new_sheet.name = name
+        return self._wrap(new_sheet)
+
+    def flush(self):
+        """Write the pending changes of every sheet"""
+        for sheet in self._sheet_of_name.values():
+            sheet.flush()
+
+    def begin(self):
+        """Suspend the screen updates, the recalculation and the events of the Excel
+        application until end() (which restores their previous state)
+        WARNING: this makes the script Windows dependent!
+        """
+        app = self.book.app
+        self._app_state = (app, app.screen_updating, app.calculation, app.api.EnableEvents)
+        app.screen_updating = False
+        app.calculation = "manual"
+        app.api.EnableEvents = False
+
+    def end(self):
+        """Restore the state of the Excel application suspended by begin()
+        (only once, so calling it again is free)
+        """
+        if self._app_state is not None:
+            (app, screen_updating, calculation, enable_events) = self._app_state
+            self._app_state = None
+            app.api.EnableEvents = enable_events
+            app.calculation = calculation
+            app.screen_updating = screen_updating
+
+    def save(self):
+        """Recalculate the workbook once and save it"""
+        app = self.book.app
+        app.calculate()
+        self.book.save()
+
+    def discard(self):
+        """Close the workbook without saving its changes"""
+        self.book.close()
@@ -0,0 +1,242 @@
+# coding=utf-8
+"""Per-request metrics of the hattrick link
+A RequestMetrics is an HtLink hook: it is told about every request (method, link
+category, status, bytes, latency, retries, whether it was a cache hit) and about
+the time spent parsing the pages of each link category. The cache hits are only
+counted, so they don't skew the latencies of the network requests. At the end of
+a run it prints a summary table and exports the numbers as JSON or as Prometheus
+text (e.g. for a node exporter's textfile collector) with the request latency
+histograms per link category.
+"""
+import contextlib
+import json
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import common
+from hattrick import HtLink, RequestRecord
+
+
+# the upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_PREFIX = "hattrick"
+
+
+def _percentile(sorted_values: List[float], ratio: float) -> float:
+    """Return the `ratio` percentile of the `sorted_values` (nearest rank)
+    or 0.0 if there are none
+    """
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(ratio * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def _labels(**labels) -> str:
+    """Return the Prometheus label set of the `labels`"""
+    return "{{{}}}".format(",".join('{}="{}"'.format(key, value)
+                                    for (key, value) in labels.items()))
+
+
+class RequestMetrics:
+    """Collect the request and parse timings of a run (thread safe)"""
+
+    def __init__(self, export_path: Optional[str] = None):
+        """`export_path` is where `recording` exports the metrics to (see `export`)"""
+        self.export_path = export_path
+        self._lock = threading.Lock()
+        self.records = []
+        self.parse_seconds_of_category = {}
+        self.parse_count_of_category = {}
+
+    def request_done(self, record: RequestRecord):
+        """Record a finished (or failed) request"""
+        with self._lock:
+            self.records.append(record)
+
+    def page_parsed(self, category: str, seconds: float):
+        """Record the time spent parsing a page of the link `category`"""
+        with self._lock:
+            self.parse_seconds_of_category[category] = (
+                self.parse_seconds_of_category.get(category, 0.0) + seconds)
+            self.parse_count_of_category[category] = (
+                self.parse_count_of_category.get(category, 0) + 1)
+
+    def _records_by_endpoint(self) -> Dict[Tuple[str, str], Tuple[List[RequestRecord], int]]:
+        """Return the network records and the number of cache hits grouped by
+        (category, method)
+        """
+        with self._lock:
+            records = list(self.records)
+        endpoints = {}
+        for record in records:
+            (network_records, cache_hits) = endpoints.get((record.category, record.method),
+                                                          ([], 0))
+            if record.cached:
+                cache_hits += 1
+            else:
+                network_records.append(record)
+            endpoints[(record.category, record.method)] = (network_records, cache_hits)
+        return endpoints
+
+    def _histogram(self, records: List[RequestRecord]) -> List[int]:
+        """Return the cumulative latency bucket counts of the `records`
+        (the last one is +Inf)
+        """
+        counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        for record in records:
+            for (index, upper_bound) in enumerate(LATENCY_BUCKETS):
+                if record.latency <= upper_bound:
+                    counts[index] += 1
+            counts[-1] += 1
+        return counts
+
+    def summary(self) -> dict:
+        """Return the per-endpoint statistics (see `to_json`)"""
+        endpoints = []
+        for ((category, method), (records, cache_hits)) in sorted(
+                self._records_by_endpoint().items()):
+            latencies = sorted(record.latency for record in records)
+            endpoints.append({
+                "category": category,
+                "method": method,
+                "requests": len(records),
+                "cache_hits": cache_hits,
+                "errors": sum(1 for record in records if not 200 <= record.status < 300),
+                "bytes": sum(record.bytes for record in records),
+                "retries": sum(record.retries for record in records),
+                "latency_total": sum(latencies),
+                "latency_p50": _percentile(latencies, 0.5),
+                "latency_p95": _percentile(latencies, 0.95),
+                "latency_max": latencies[-1] if latencies else 0.0,
+                "latency_buckets": dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"],
+                                            self._histogram(records))),
+            })
+        with self._lock:
+            parsing = {
+                category: {"pages": self.parse_count_of_category[category], "seconds": seconds}
+                for (category, seconds) in sorted(self.parse_seconds_of_category.items())
+            }
+        return {"endpoints": endpoints, "parsing": parsing}
+
+    def summary_table(self) -> str:
+        """Return the summary as a printable table"""
+        summary = self.summary()
+        row_format = "{:<17} {:<5} {:>5} {:>5} {:>4} {:>10} {:>8} {:>8} {:>8} {:>9} {:>8}"
+        lines = [row_format.format("category", "meth", "reqs", "hits", "errs", "KiB", "p50 ms",
+                                   "p95 ms", "max ms", "total s", "parse s")]
+        parsing_of_category = dict(summary["parsing"])
+        for endpoint in summary["endpoints"]:
+            # the parse time belongs to the category, so it's only shown once
+            parsing = parsing_of_category.pop(endpoint["category"], None)
+            lines.append(row_format.format(
+                endpoint["category"], endpoint["method"], endpoint["requests"],
+                endpoint["cache_hits"], endpoint["errors"],
+                "{:,.0f}".format(endpoint["bytes"] / 1024),
+                "{:.0f}".format(endpoint["latency_p50"] * 1000),
+                "{:.0f}".format(endpoint["latency_p95"] * 1000),
+                "{:.0f}".format(endpoint["latency_max"] * 1000),
+                "{:.2f}".format(endpoint["latency_total"]),
+                "" if parsing is None else "{:.3f}".format(parsing["seconds"]),
+            ))
+        return "\n".join(lines)
+
+    def to_json(self) -> str:
+        """Return the summary as JSON"""
+        return json.dumps(self.summary(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP {}_request_duration_seconds The latency of the hattrick requests"
+            .format(METRIC_PREFIX),
+            "# TYPE {}_request_duration_seconds histogram".format(METRIC_PREFIX),
+        ]
+        endpoints = sorted(self._records_by_endpoint().items())
+        for ((category, method), (records, _)) in endpoints:
+            bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+            for (bound, count) in zip(bounds, self._histogram(records)):
+                lines.append("{}_request_duration_seconds_bucket{} {}".format(
+                    METRIC_PREFIX, _labels(category=category, method=method, le=bound), count))
+            labels = _labels(category=category, method=method)
+            lines.append("{}_request_duration_seconds_sum{} {}".format(
+                METRIC_PREFIX, labels, sum(record.latency for record in records)))
+            lines.append("{}_request_duration_seconds_count{} {}".format(
+                METRIC_PREFIX, labels, len(records)))
+
+        counters = (
+            ("request_bytes_total", "The downloaded bytes", lambda record: record.bytes),
+            ("request_retries_total", "The retried requests", lambda record: record.retries),
+        )
+        for (name, description, value_of) in counters:
+            lines.append("# HELP {}_{} {}".format(METRIC_PREFIX, name, description))
+            lines.append("# TYPE {}_{} counter".format(METRIC_PREFIX, name))
+            for ((category, method), (records, _)) in endpoints:
+                lines.append("{}_{}{} {}".format(
+                    METRIC_PREFIX, name, _labels(category=category, method=method),
+                    sum(value_of(record) for record in records)))
+
+        lines.append("# HELP {}_cache_hits_total The requests served from the response cache"
+                     .format(METRIC_PREFIX))
+        lines.append("# TYPE {}_cache_hits_total counter".format(METRIC_PREFIX))
+        for ((category, method), (_, cache_hits)) in endpoints:
+            lines.append("{}_cache_hits_total{} {}".format(
+                METRIC_PREFIX, _labels(category=category, method=method), cache_hits))
+
+        lines.append("# HELP {}_requests_total The requests by status".format(METRIC_PREFIX))
+        lines.append("# TYPE {}_requests_total counter".format(METRIC_PREFIX))
+        for ((category, method), (records, _)) in endpoints:
+            count_of_status = {}
+            for record in records:
+                count_of_status[record.status] = count_of_status.get(record.status, 0) + 1
+            for (status, count) in sorted(count_of_status.items()):
+                lines.append("{}_requests_total{} {}".format(
+                    METRIC_PREFIX, _labels(category=category, method=method, status=status),
+                    count))
+
+        lines.append("# HELP {}_parse_duration_seconds The time spent parsing the pages"
+                     .format(METRIC_PREFIX))
+        lines.append("# TYPE {}_parse_duration_seconds summary".format(METRIC_PREFIX))
+        with self._lock:
+            parsing = sorted(self.parse_seconds_of_category.items())
+            for (category, seconds) in parsing:
+                labels = _labels(category=category)
+                lines.append("{}_parse_duration_seconds_sum{} {}".format(
+                    METRIC_PREFIX, labels, seconds))
+                lines.append("{}_parse_duration_seconds_count{} {}".format(
+                    METRIC_PREFIX, labels, self.parse_count_of_category[category]))
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        """Write the metrics into `path` as JSON if it ends with .json or as Prometheus
+        text otherwise
+        """
+        text = self.to_json() if path.lower().endswith(".json") else self.to_prometheus()
+        with open(path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(text)
+
+
+@contextlib.contextmanager
+def recording(metrics: Optional[RequestMetrics]):
+    """Record the hattrick requests into `metrics` (if any) while in the context, then
+    print the summary table and export the metrics into its `export_path` (if any)
+    """
+    if metrics is None:
+        yield
+    else:
+        HtLink.add_hook(metrics)
+        try:
+            yield
+        finally:
+            HtLink.remove_hook(metrics)
+            print(metrics.summary_table())
+            if metrics.export_path is not None:
+                metrics.export(metrics.export_path)
+
+
+def request_metrics_from_args(args) -> Optional[RequestMetrics]:
+    """Return the RequestMetrics configured on the command line or None"""
+    path = getattr(args, common.METRICS_ARG)
+    return None if path is None else RequestMetrics(export_path=path)
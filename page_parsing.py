@@ -0,0 +1,461 @@
+# coding=utf-8
+"""The parsing of the hattrick pages
+The low level helpers find values in the pages (line by line while a page is being
+downloaded or in its decoded text) and the extractors parse whole pages: a player's
+page into a Player and the players list page into a PlayersListIndex.
+"""
+from collections import namedtuple
+import io
+import re
+from typing import Optional
+
+import requests
+
+from data import Player, Age, NationalPlayerStatus, Skillz, Speciality, Ability
+
+
+PageType = requests.models.Response
+OptionalInt = Optional[int]
+
+LEVEL_PATTERN = r"level='(?P<value>[0-9]+)'"
+
+
+def _page_text(page: PageType) -> str:
+    """Return the specified `page`'s text"""
+    return page.text
+
+
+def _page_content(page: PageType) -> bytes:
+    """Return the specified `page`'s content as bytes"""
+    return page.content
+
+
+def _dump_a_page_to_file(page: PageType, file_name: str):
+    """Dump the text of `page` into `file_name`
+    It might raise all kinds of io errors...
+    """
+    with io.open(file_name, mode="w", encoding="utf-8") as dump_file:
+        dump_file.write(_page_text(page))
+
+
+def _raise_and_try_dumping_page_error(
+        base_error_message: str, dump_suffix: str, page: PageType, regex: str = None,
+        exception_type: Exception = RuntimeError):
+    """Raise an `exception_type` error and try to dump the `page` to
+    crashdump.`dump_suffix`.html
+    `base_error_message` will be extended with (the optional) `regex` and the
+    dump file name if dumping succeeded
+    """
+    saved_page_file = "crashdump.{}.html".format(dump_suffix)
+    try:
+        _dump_a_page_to_file(page, saved_page_file)
+    except Exception:  # pylint: disable=broad-except
+        saved_page_file = None
+
+    if regex is not None:
+        error_message = "{} regex: '{}'".format(base_error_message, regex)
+    else:
+        error_message = base_error_message
+
+    if saved_page_file is not None:
+        error_message = ("{} this page dump might help: '{}'").format(
+            error_message, saved_page_file
+        )
+
+    raise exception_type(error_message)
+
+
+class NoDefinitionInThisLanguageError(Exception):
+    """Should be raised if we try to get the translation for a supported language
+    in LanguageDependentText, but it is None
+    """
+
+
+class LanguageDependentText:
+    """Store all the translations of a text in these 'language fields'"""
+
+    SUPPORTED_LANGUAGES = ["hungarian", "english"]
+
+    def __init__(self, **kwargs):
+        for language in self.SUPPORTED_LANGUAGES:
+            setattr(self, language, kwargs[language])
+
+    def translate_to(self, language: str):
+        """Get the text in the specified language
+        If the language is not supported -> AttributeError
+        If the language is supported, but the text is None ->
+        NoDefinitionInThisLanguageError
+        """
+        text = getattr(self, language)
+        if text is None:
+            available_definitions = {
+                language: value
+                for language in dir(self)
+                if not language.startswith("__")
+                and (value := getattr(self, language)) is not None
+            }
+            error_message = ("{} available definitions: {}"
+                             .format(language, available_definitions))
+            raise NoDefinitionInThisLanguageError(error_message)
+        return text
+
+    @classmethod
+    def find_language_in(cls, page: PageType):
+        """Find and return the page's language or raise a RuntimeError"""
+        page_language_regex = r'lang="(?P<language_id>[^"]+)"'
+        if match := re.search(page_language_regex, _page_text(page)):
+            page_language_pattern_to_script_language_mapping = {
+                "hu": cls.SUPPORTED_LANGUAGES[0],
+                "en": cls.SUPPORTED_LANGUAGES[1],
+            }
+            language_id = match.group("language_id")
+            if language_id not in page_language_pattern_to_script_language_mapping:
+                supported_language_ids = " ".join(
+                    page_language_pattern_to_script_language_mapping.keys()
+                )
+                raise RuntimeError(
+                    (
+                        "Unsupported page language id: '{}'"
+                        " The supported language ids are '{}'"
+                    ).format(language_id, supported_language_ids)
+                )
+
+            language = page_language_pattern_to_script_language_mapping[language_id]
+        else:
+            _raise_and_try_dumping_page_error(
+                "Failed to detect the page's language",
+                "lang",
+                page,
+                page_language_regex,
+            )
+        return language
+
+
+def _remove_witespace(raw_string: str) -> str:
+    """Return a new string without any whitespace"""
+    return "".join(raw_string.split())
+
+
+def _string_to_int(raw_string: str) -> int:
+    """Convert a string that contain numbers and optionally whitespace to int
+    """
+    return int(_remove_witespace(raw_string))
+
+
+class NoPatternMatchError(Exception):
+    """Raise when a pattern matching failed"""
+
+
+class FindState:
+    """Preserve state for a find algorithm with multiple phases"""
+
+    def __init__(self):
+        self.found_value = None
+        self._was_in_block = False
+        self._lines_parsed_in_block = 0
+
+    def found(self):
+        """Return if the searched value was found"""
+        return self.found_value is not None
+
+    def get_int_or_raise_and_try_dumping_page_error(
+            self, base_error_message: str, dump_suffix: str, page: PageType, regex: str = None):
+        """As its name suggests: it tries to return the `found_value` as `int`, or
+        if it wasn't found, call _raise_and_try_dumping_page_error()
+        If converting the found value to `int` fails, some kind of exception
+        will be raised too
+        """
+        if self.found():
+            int_value = _string_to_int(self.found_value)
+        else:
+            _raise_and_try_dumping_page_error(
+                base_error_message, dump_suffix, page, regex, NoPatternMatchError
+            )
+        return int_value
+
+    def find_in_a_block(self, block_pattern: str, value_pattern: str, text: str,
+                        num_lines_of_block: OptionalInt = None):
+        """Find the `block_pattern` then look for the `value_pattern` and, once found,
+        save it into this instance
+
+        `num_lines_of_block` can be used to end the block before the end of `text`
+        """
+        block_ends_at_text_end = num_lines_of_block is None
+        still_in_block = (block_ends_at_text_end
+                          or (self._lines_parsed_in_block < num_lines_of_block))
+        if self._was_in_block and still_in_block and not self.found():
+            if match := re.search(value_pattern, text):
+                self.found_value = match.group("value")
+            self._lines_parsed_in_block += 1
+
+        if not self.found() and re.search(block_pattern, text):
+            self._was_in_block = True
+
+
+class BlockValueFindState(FindState):
+    """Preserve state for block-value pattern-finding algorithms with multi-phases"""
+
+    def __init__(self, block_pattern: str, value_pattern: str,
+                 num_lines_of_block: OptionalInt = None):
+        super(BlockValueFindState, self).__init__()
+        self.block_pattern = block_pattern
+        self.value_pattern = value_pattern
+        self.num_lines_of_block = num_lines_of_block
+
+    def find_in(self, text: str):
+        """Find the `block_pattern` then look for the `value_pattern` and, once found,
+        save it into this instance
+        """
+        self.find_in_a_block(self.block_pattern, self.value_pattern, text, self.num_lines_of_block)
+
+
+def _replace_html_spaces(value: str) -> str:
+    r"""Return a new string with the following HTML characters replaced:
+    \xa0 -> " "
+    &nbsp; -> " "
+    """
+    return value.replace("\xa0", " ").replace("&nbsp;", " ")
+
+
+def _bytes_to_string(value: bytes) -> str:
+    """Convert `value` to string by also replacing the HTML spaces"""
+    return _replace_html_spaces(value.decode("utf-8"))
+
+
+def _find_values_in_blocks(search: dict, page: PageType):
+    """Find the things specified in the `search` dictionary on the `page`
+    The expected search dictionary format is this:
+    {
+        '<thing>': BlockValueFindState,
+    }
+    Return whether all of them was found
+    """
+    found_all = False
+    for byte_line in page.iter_lines():
+        found_all = _find_values_in_line(search, _bytes_to_string(byte_line))
+        if found_all:
+            break
+    return found_all
+
+
+def _find_values_in_line(search: dict, string_line: str) -> bool:
+    """Feed the next line of the page to the things specified in the `search` dictionary
+    (see _find_values_in_blocks) and return whether all of them was found
+    """
+    found_all = True
+    for pattern in search.values():
+        pattern.find_in(string_line)
+        if not pattern.found():
+            found_all = False
+    return found_all
+
+
+def _parse_int_values_from_blocks_into(container, search: dict, page: PageType):
+    """Find the things specified in the `search` dictionary on the `page`
+    and convert them into int values to be stored in the `container`
+    """
+    _find_values_in_blocks(search, page)
+    _store_int_values_found_in_blocks(container, search, page)
+
+
+def _store_int_values_found_in_blocks(container, search: dict, page: PageType):
+    """Convert the values found for the things specified in the `search` dictionary
+    into int values to be stored in the `container`
+    """
+    for (attribute, string_value) in search.items():
+        not_found_error_message = "Failed to find '{}'".format(attribute)
+        int_value = string_value.get_int_or_raise_and_try_dumping_page_error(
+            not_found_error_message, attribute, page, string_value.block_pattern
+        )
+        setattr(container, attribute, int_value)
+
+
+def _page_string(page: PageType) -> str:
+    """Return the specified `page`'s content decoded (as _bytes_to_string decodes the lines)
+    with every line break normalised to "\\n"
+    """
+    text = _page_content(page).decode("utf-8")
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _search_in_block(block_pattern: re.Pattern, value_pattern: re.Pattern, text: str):
+    """Return the first match of `value_pattern` in `text` after the line of the first
+    `block_pattern` match (the same thing BlockValueFindState finds line by line) or None
+    """
+    match = None
+    if block := block_pattern.search(text):
+        end_of_block_line = text.find("\n", block.start())
+        if end_of_block_line != -1:
+            match = value_pattern.search(text, end_of_block_line + 1)
+    return match
+
+
+def _int_of_match_or_raise_and_try_dumping_page_error(
+        match: Optional[re.Match], base_error_message: str, dump_suffix: str,
+        page: PageType, regex: str) -> int:
+    """Return the "value" group of the `match` as `int` or, if there is no match,
+    call _raise_and_try_dumping_page_error()
+    """
+    if match is None:
+        _raise_and_try_dumping_page_error(
+            base_error_message, dump_suffix, page, regex, NoPatternMatchError
+        )
+    return _string_to_int(match.group("value"))
+
+
+class PlayerPageExtractor:  # pylint: disable=too-few-public-methods
+    """Extract every field of a Player from the player's page
+    The page is decoded only once and all the patterns are compiled once per page
+    language. Every field is a precompiled search of its own over the decoded page
+    (a literal search is fast, while one alternation of all of them is a lot slower).
+    """
+
+    # The value patterns must not match line breaks as the values used to be
+    # searched line by line
+    TSI_VALUE_PATTERN = re.compile(r">(?P<value>[^><\n]+)</td>")
+    LEVEL_REGEX = re.compile(LEVEL_PATTERN)
+
+    TSI_BLOCK_PATTERN = re.compile(r"TSI</td>")
+    # attribute -> block pattern, all of them have a LEVEL_PATTERN value
+    ABILITY_BLOCK_PATTERNS = {
+        "form": re.compile(r"PlayerSkills_trForm"),
+        "stamina": re.compile(r"PlayerSkills_trStamina"),
+    }
+    SKILL_BLOCK_PATTERNS = {
+        "playmaking": re.compile(r"PlayerSkills_trPlaymaker"),
+        "winger": re.compile(r"PlayerSkills_trWinger"),
+        "passing": re.compile(r"PlayerSkills_trPasser"),
+        "scoring": re.compile(r"PlayerSkills_trScorer"),
+    }
+
+    def __init__(self, dictionary: dict, language: str):
+        def translate(key):
+            return dictionary[key].translate_to(language)
+
+        self.age_pattern = re.compile(translate("age"))
+        self.stars_pattern = re.compile(translate("avg_star_value"))
+        self.nt_pattern = re.compile(translate("nt"))
+        self.nt_prospect_pattern = re.compile(translate("nt_prospect"))
+        self.speciality_of_text = {
+            translate(tag): Speciality.parse_from_string(dictionary[tag].translate_to("english"))
+            for tag in dictionary if "spec:" in tag
+        }
+        self.speciality_pattern = re.compile(
+            r"(?P<spec>{})".format('|'.join(self.speciality_of_text.keys()))
+        )
+
+    def extract_into(self, player: Player, page: PageType):
+        """Parse all the info available on the player's `page` into the specified `player`
+        or raise a RuntimeError (NoPatternMatchError) or ValueError
+        The national team player status is based on the player's page only.
+        """
+        # the free text is searched as it is, the blocks with the HTML spaces replaced
+        text = _page_string(page)
+        block_text = _replace_html_spaces(text)
+
+        if match := self.age_pattern.search(text):
+            player.age = Age(int(match.group("years")), int(match.group("days")))
+        else:
+            _raise_and_try_dumping_page_error(
+                "Failed to find the player's age", "age", page, self.age_pattern.pattern
+            )
+
+        player.tsi = _int_of_match_or_raise_and_try_dumping_page_error(
+            _search_in_block(self.TSI_BLOCK_PATTERN, self.TSI_VALUE_PATTERN, block_text),
+            "Failed to find the 'TSI'", "TSI", page, self.TSI_VALUE_PATTERN.pattern,
+        )
+        for (attribute, block_pattern) in self.ABILITY_BLOCK_PATTERNS.items():
+            integer = _int_of_match_or_raise_and_try_dumping_page_error(
+                _search_in_block(block_pattern, self.LEVEL_REGEX, block_text),
+                "Failed to find the '{}'".format(attribute), attribute, page, LEVEL_PATTERN,
+            )
+            setattr(player, attribute, Ability.parse_from_int(integer))
+
+        skillz = Skillz()
+        for (attribute, block_pattern) in self.SKILL_BLOCK_PATTERNS.items():
+            int_value = _int_of_match_or_raise_and_try_dumping_page_error(
+                _search_in_block(block_pattern, self.LEVEL_REGEX, block_text),
+                "Failed to find '{}'".format(attribute), attribute, page, block_pattern.pattern,
+            )
+            setattr(skillz, attribute, int_value)
+        if match := self.speciality_pattern.search(text):
+            skillz.speciality = self.speciality_of_text[match.group("spec")]
+        else:
+            skillz.speciality = Speciality.Nothing
+        player.extra.skillz = skillz
+
+        if match := self.stars_pattern.search(text):
+            player.extra.stars = float(match.group("stars"))
+        else:
+            player.extra.stars = None
+
+        is_national_team_player = bool(self.nt_pattern.search(text))
+        player.ntp_status = NationalPlayerStatus(
+            is_national_team_player=is_national_team_player,
+            is_national_team_player_prospect=(not is_national_team_player
+                                              and bool(self.nt_prospect_pattern.search(text))),
+        )
+
+
+PlayersListEntry = namedtuple("PlayersListEntry",
+                              "name link player_id transfer_listed national_team_player")
+
+
+class PlayersListIndex:
+    """The players list page parsed once into entries indexed by name and by player id"""
+
+    TRANSFER_LISTED_MARKER = "transferlisted"
+    # If a NT player is on sale his status is only visible on the players list
+    # page within this many lines after his transfer listed row
+    NUM_LINES_OF_TRANSFER_LISTED_BLOCK = 10
+
+    def __init__(self, page: PageType, players_link: str, nt_pattern: str):
+        player_regex = re.compile(
+            r'\<a href="(?P<link>/{}/Player[^ ]+playerId=(?P<player_id>\d+)&[^ ]+)"'
+            r' title="[^"]+">(?P<name>[^<]+)'.format(players_link)
+        )
+        nt_regex = re.compile(nt_pattern)
+        self.entries = []
+        self._entry_of_name = {}
+        self._entry_of_id = {}
+
+        lines = _page_string(page).split("\n")
+        for (line_index, line) in enumerate(lines):
+            for match in player_regex.finditer(line):
+                transfer_listed = self.TRANSFER_LISTED_MARKER in line[match.end():]
+                if transfer_listed:
+                    block_start = line_index + 1
+                    block_end = block_start + self.NUM_LINES_OF_TRANSFER_LISTED_BLOCK
+                    national_team_player = any(
+                        nt_regex.search(_replace_html_spaces(block_line))
+                        for block_line in lines[block_start:block_end]
+                    )
+                else:
+                    national_team_player = False
+                entry = PlayersListEntry(
+                    name=match.group("name"),
+                    link=match.group("link"),
+                    player_id=match.group("player_id"),
+                    transfer_listed=transfer_listed,
+                    national_team_player=national_team_player,
+                )
+                self.entries.append(entry)
+                self._entry_of_name.setdefault(entry.name, entry)
+                self._entry_of_id.setdefault(entry.player_id, entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def by_name(self, name: str) -> Optional[PlayersListEntry]:
+        """Return the entry of the named player or None
+        If there is no exact match, the first player whose name starts with `name`
+        is returned (e.g. for names truncated to fit a sheet name)
+        """
+        entry = self._entry_of_name.get(name)
+        if entry is None:
+            entry = next((entry for entry in self.entries if entry.name.startswith(name)), None)
+        return entry
+
+    def by_id(self, player_id) -> Optional[PlayersListEntry]:
+        """Return the entry of the player with `player_id` or None"""
+        return self._entry_of_id.get(str(player_id))
@@ -0,0 +1,333 @@
+# coding=utf-8
+"""Micro-benchmarks of the page parsers of the `hattrick` and `page_parsing` modules
+Every parser runs against the sanitized page fixtures of the corpus directory
+(see CORPUS_VERSION) and reports its time (ns/op), the peak memory it allocates
+(B/op) and its throughput (pages/s). The results are compared to the stored
+baseline and any parser that got slower (or hungrier) than the tolerance allows
+fails the run.
+
+    python parser_benchmark.py run
+    python parser_benchmark.py run --save_baseline   # after an intended change
+    python parser_benchmark.py write_corpus          # after changing CORPUS_VERSION
+
+The timings are machine specific, so the baseline isn't versioned (it's ignored
+by git): save one on the machine that runs the comparison before comparing.
+"""
+import argparse
+from collections import namedtuple
+import gc
+import json
+import os
+import platform
+import re
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import fake_hattrick
+from data import Player, Team
+from hattrick import Hattrick, _parse_login_status, _parse_team_id
+from page_parsing import LanguageDependentText, PageType, PlayersListIndex
+
+
+CORPUS_VERSION = 1
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_corpus")
+CORPUS_MANIFEST = "manifest.json"
+BASELINE_FILE = "baseline.json"
+
+# the timings of short parsers are noisy, the allocations are far less so
+DEFAULT_TIME_TOLERANCE = 0.5
+DEFAULT_MEMORY_TOLERANCE = 0.1
+MEMORY_SLACK = 1024  # bytes, below this the allocation differences are just noise
+DEFAULT_MIN_TIME = 0.2  # seconds per measurement
+NUM_REPEATS = 5
+
+BenchmarkResult = namedtuple("BenchmarkResult", "name page ns_per_op bytes_per_op")
+
+
+def _to_page(path: str, url: str, cookie: str) -> PageType:
+    """Return the fixture at `path` as a response served from `url` to a request
+    with the `cookie` header
+    """
+    # pylint: disable=protected-access
+    with open(path, "rb") as fixture:
+        body = fixture.read()
+    page = requests.models.Response()
+    page.status_code = 200
+    page.url = url
+    page.headers = CaseInsensitiveDict({"Content-Type": "text/html; charset=utf-8"})
+    page.encoding = "utf-8"
+    page._content = body
+    page._content_consumed = True
+
+    request = requests.models.PreparedRequest()
+    request.prepare(method="GET", url=url, headers={"Cookie": cookie})
+    page.request = request
+    return page
+
+
+def load_corpus(corpus_dir: str) -> Dict[str, PageType]:
+    """Return the pages of the corpus by their names
+    Raise a RuntimeError if the corpus is missing or of another CORPUS_VERSION
+    """
+    manifest_path = os.path.join(corpus_dir, CORPUS_MANIFEST)
+    try:
+        with open(manifest_path, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    except OSError as error:
+        raise RuntimeError("No corpus in '{}', run write_corpus first".format(corpus_dir)) \
+            from error
+    if manifest["version"] != CORPUS_VERSION:
+        raise RuntimeError("The corpus is version {} instead of {}, run write_corpus".format(
+            manifest["version"], CORPUS_VERSION))
+    return {
+        name: _to_page(os.path.join(corpus_dir, page["file"]), page["url"], page["cookie"])
+        for (name, page) in manifest["pages"].items()
+    }
+
+
+def write_corpus(corpus_dir: str):
+    """Render the corpus pages from the fake Hattrick site (so they hold no real
+    user data) and write them with their manifest into `corpus_dir`
+    """
+    site = fake_hattrick.FakeHattrick(num_players=30)
+    player = next(player for player in site.players
+                  if player.more_transfers and player.speciality and player.stars)
+    server_url = "https://www{}.hattrick.org".format(fake_hattrick.SERVER_ID)
+    cookie = "{}=0; ht_user=userId=1&currentTeamId={}".format(
+        fake_hattrick.SESSION_COOKIE, fake_hattrick.TEAM_ID)
+    transfer_compare_link = "/Club/Transfers/TransferCompare.aspx?playerId={}".format(
+        player.player_id)
+    pages = {
+        "main": ("/en/", site.page("/en/", "Hattrick", "<p>Üdv!</p>", team_header=False)),
+        "landing": ("/MyHattrick/", site.page("/MyHattrick/", fake_hattrick.TEAM_NAME, "")),
+        "players_list": ("/Club/Players/?TeamID={}".format(fake_hattrick.TEAM_ID),
+                         site.page("/Club/Players/", "Játékosok", site.players_list_content())),
+        "player": ("/Club/Players/Player.aspx?playerId={}".format(player.player_id),
+                   site.page("/Club/Players/Player.aspx", player.name,
+                             site.player_content(player))),
+        "transfer_compare": (transfer_compare_link, site.page(
+            transfer_compare_link, "Átigazolások",
+            site.transfer_compare_content(player, more_loaded=False))),
+        "more_transfers": (transfer_compare_link, site.page(
+            transfer_compare_link, "Átigazolások",
+            site.transfer_compare_content(player, more_loaded=True))),
+        "finance": ("/Club/Finances/?teamId={}".format(fake_hattrick.TEAM_ID),
+                    site.page("/Club/Finances/", "Pénzügyek", site.finance_content())),
+    }
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    manifest = {"version": CORPUS_VERSION, "pages": {}}
+    for (name, (path, html)) in pages.items():
+        file_name = "{}.html".format(name)
+        with open(os.path.join(corpus_dir, file_name), "w", encoding="utf-8",
+                  newline="\n") as fixture:
+            fixture.write(html)
+        url = server_url + path if name != "main" else "https://www.hattrick.org/en/"
+        manifest["pages"][name] = {"file": file_name, "url": url, "cookie": cookie}
+    with open(os.path.join(corpus_dir, CORPUS_MANIFEST), "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    print("Wrote {} pages into '{}'".format(len(pages), corpus_dir))
+
+
+def _parsers(pages: Dict[str, PageType]) -> Dict[str, tuple]:
+    """Return the parser benchmarks as name -> (page name, parse function)"""
+    # pylint: disable=protected-access
+    ht = Hattrick(fake_hattrick.CURRENCY)  # pylint: disable=invalid-name
+    ht.language = LanguageDependentText.find_language_in(pages["landing"])
+    ht.team = Team(team_id=fake_hattrick.TEAM_ID, name=fake_hattrick.TEAM_NAME)
+    players_list_link = Hattrick.PLAYERS_LINK
+    nt_pattern = ht._translate_to_page_language("nt")
+    extractor = ht._player_page_extractor()
+    player = pages["player"]
+
+    return {
+        "login_form": ("main", lambda: ht._fill_in_form_with_lookup_values(pages["main"], {})),
+        "login_status": ("landing", lambda: _parse_login_status(pages["landing"])),
+        "page_language": ("landing", lambda: LanguageDependentText.find_language_in(
+            pages["landing"])),
+        "team_id": ("landing", lambda: _parse_team_id(pages["landing"])),
+        "team_name": ("landing", lambda: ht._parse_team_name_by_id(
+            pages["landing"], fake_hattrick.TEAM_ID)),
+        "players_list_index": ("players_list", lambda: PlayersListIndex(
+            pages["players_list"], players_list_link, nt_pattern)),
+        "player_page": ("player", lambda: extractor.extract_into(
+            Player("benchmark", link="", player_id="1"), player)),
+        "transfer_compare_link": ("player", lambda: ht._parse_transfer_compare_link(player)),
+        "more_transfers_link": ("transfer_compare", lambda: ht._there_is_more_transfer_to_load(
+            pages["transfer_compare"])),
+        "load_more_transfers_form": ("transfer_compare", lambda: ht._load_more_transfers_form(
+            pages["transfer_compare"])),
+        "sell_base_price": ("more_transfers", lambda: ht._parse_sell_base_price(
+            pages["more_transfers"])),
+        "team_finance": ("finance", lambda: ht._parse_team_finance(pages["finance"])),
+    }
+
+
+def _ns_per_op(function: Callable, min_time: float) -> float:
+    """Return the best time of `function` in nanoseconds out of NUM_REPEATS
+    measurements, each running it for at least `min_time` seconds
+    """
+    num_ops = 1
+    while True:
+        started = time.perf_counter_ns()
+        for _ in range(num_ops):
+            function()
+        elapsed = time.perf_counter_ns() - started
+        if elapsed >= min_time * 1e9:
+            break
+        num_ops *= 2
+
+    best = elapsed / num_ops
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(NUM_REPEATS - 1):
+            started = time.perf_counter_ns()
+            for _ in range(num_ops):
+                function()
+            best = min(best, (time.perf_counter_ns() - started) / num_ops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best
+
+
+def _bytes_per_op(function: Callable) -> int:
+    """Return the peak memory allocated by one call of `function` in bytes"""
+    function()  # warm up the regex and extractor caches
+    tracemalloc.start()
+    try:
+        (before, _) = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        function()
+        (_, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before
+
+
+def run_benchmarks(pages: Dict[str, PageType], name_filter: str,
+                   min_time: float) -> List[BenchmarkResult]:
+    """Run the parser benchmarks whose name matches `name_filter` and return the results"""
+    results = []
+    for (name, (page_name, function)) in _parsers(pages).items():
+        if re.search(name_filter, name):
+            bytes_per_op = _bytes_per_op(function)
+            results.append(BenchmarkResult(name, page_name, _ns_per_op(function, min_time),
+                                           bytes_per_op))
+    return results
+
+
+def _print_results(results: List[BenchmarkResult], baseline: dict):
+    """Print the results as a table with the change relative to the `baseline`"""
+    row_format = "{:<26} {:<17} {:>12} {:>12} {:>11} {:>8}"
+    print(row_format.format("parser", "page", "ns/op", "B/op", "pages/s", "vs base"))
+    for result in results:
+        base = baseline.get(result.name)
+        change = ("" if base is None
+                  else "{:+.0%}".format(result.ns_per_op / base["ns_per_op"] - 1))
+        print(row_format.format(result.name, result.page, "{:,.0f}".format(result.ns_per_op),
+                                "{:,}".format(result.bytes_per_op),
+                                "{:,.0f}".format(1e9 / result.ns_per_op), change))
+
+    total_ns = sum(result.ns_per_op for result in results)
+    num_pages = len({result.page for result in results})
+    if total_ns:
+        print("all parsers over the {} corpus pages: {:,.0f} pages/s".format(
+            num_pages, num_pages * 1e9 / total_ns))
+
+
+def _regressions(results: List[BenchmarkResult], baseline: dict, time_tolerance: float,
+                 memory_tolerance: float) -> List[str]:
+    """Return the descriptions of the results that are worse than the `baseline`
+    by more than the tolerated ratios
+    """
+    regressions = []
+    for result in results:
+        base = baseline.get(result.name)
+        if base is not None:
+            for (metric, unit, tolerance, slack) in (
+                    ("ns_per_op", "ns/op", time_tolerance, 0),
+                    ("bytes_per_op", "B/op", memory_tolerance, MEMORY_SLACK)):
+                (value, base_value) = (getattr(result, metric), base[metric])
+                if value > base_value * (1 + tolerance) and value - base_value > slack:
+                    regressions.append("{}: {:,.0f} {} instead of {:,.0f} {}".format(
+                        result.name, value, unit, base_value, unit))
+    return regressions
+
+
+def _load_baseline(path: str) -> dict:
+    """Return the stored baseline results by parser name (empty if there's none)"""
+    try:
+        with open(path, encoding="utf-8") as baseline_file:
+            stored = json.load(baseline_file)
+    except OSError:
+        print("No baseline in '{}' yet, save one with --save_baseline".format(path))
+        stored = {}
+    if stored and stored.get("corpus_version") != CORPUS_VERSION:
+        print("Ignoring the baseline of corpus version {}".format(stored.get("corpus_version")))
+        stored = {}
+    return stored.get("results", {})
+
+
+def _save_baseline(path: str, results: List[BenchmarkResult]):
+    """Store the `results` as the new baseline"""
+    stored = {
+        "corpus_version": CORPUS_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {
+            result.name: {"ns_per_op": round(result.ns_per_op),
+                          "bytes_per_op": result.bytes_per_op}
+            for result in results
+        },
+    }
+    with open(path, "w", encoding="utf-8") as baseline_file:
+        json.dump(stored, baseline_file, indent=2, sort_keys=True)
+    print("Saved the baseline into '{}'".format(path))
+
+
+def main():
+    """parse args and run the benchmarks or write the corpus"""
+    parser = argparse.ArgumentParser(description="Benchmark the Hattrick page parsers")
+    parser.add_argument("command", choices=("run", "write_corpus"))
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="the corpus directory")
+    parser.add_argument("--baseline", default=None,
+                        help="the baseline file (default: the one in the corpus directory)")
+    parser.add_argument("--save_baseline", action="store_true",
+                        help="store the results as the new baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TIME_TOLERANCE,
+                        help="the allowed slowdown ratio before failing e.g. 0.5 for 50%%")
+    parser.add_argument("--memory_tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE,
+                        help="the allowed ratio of extra allocated memory before failing")
+    parser.add_argument("--filter", default="", help="only run the parsers matching this regex")
+    parser.add_argument("--min_time", type=float, default=DEFAULT_MIN_TIME,
+                        help="the minimum time of a measurement in seconds")
+    args = parser.parse_args()
+
+    exit_code = 0
+    if args.command == "write_corpus":
+        write_corpus(args.corpus)
+    else:
+        baseline_path = args.baseline or os.path.join(args.corpus, BASELINE_FILE)
+        results = run_benchmarks(load_corpus(args.corpus), args.filter, args.min_time)
+        baseline = _load_baseline(baseline_path)
+        _print_results(results, baseline)
+        if args.save_baseline:
+            _save_baseline(baseline_path, results)
+        elif regressions := _regressions(results, baseline, args.tolerance,
+                                         args.memory_tolerance):
+            print("\nWorse than the baseline:")
+            for regression in regressions:
+                print("  " + regression)
+            exit_code = 1
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
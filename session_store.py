@@ -0,0 +1,73 @@
+# coding=utf-8
+"""Keep a logged in Hattrick session between runs
+The session (cookies, server and team info) is saved into a JSON file that only
+its owner can read, as anyone with those cookies can act on our behalf.
+"""
+import json
+import os
+import stat
+from typing import Optional
+
+import common
+
+
+class InsecureSessionFileError(Exception):
+    """Should be raised when the session file is accessible by others than its owner"""
+
+
+class SessionStore:
+    """A permissions-restricted session file"""
+
+    FILE_MODE = 0o600
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _ensure_private(self):
+        """Raise an InsecureSessionFileError if the group or others can access the file
+        (only checked where the file permissions are POSIX ones)
+        """
+        if os.name == "posix":
+            mode = os.stat(self.path).st_mode
+            if mode & (stat.S_IRWXG | stat.S_IRWXO):
+                raise InsecureSessionFileError(
+                    "'{}' must only be accessible by its owner (mode: {:o})"
+                    .format(self.path, stat.S_IMODE(mode))
+                )
+
+    def load(self) -> Optional[dict]:
+        """Return the saved session state or None if there's none (or it's unreadable)
+        A session file that others can access is refused with a warning (and None is
+        returned), so the caller logs in again and the next `save` makes it private
+        """
+        try:
+            self._ensure_private()
+            with open(self.path, encoding="utf-8") as session_file:
+                state = json.load(session_file)
+        except InsecureSessionFileError as error:
+            print("Ignoring the stored session: {}".format(error))
+            state = None
+        except (OSError, ValueError):
+            state = None
+        return state
+
+    def save(self, state: dict):
+        """Save the session `state` into a file only the owner can access"""
+        descriptor = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, self.FILE_MODE)
+        with os.fdopen(descriptor, "w", encoding="utf-8") as session_file:
+            if os.name == "posix":
+                os.fchmod(session_file.fileno(), self.FILE_MODE)  # in case it already existed
+            json.dump(state, session_file)
+
+    def clear(self):
+        """Forget the saved session"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def session_store_from_args(args) -> Optional[SessionStore]:
+    """Return the SessionStore configured on the command line or None"""
+    path = getattr(args, common.SESSION_FILE_ARG)
+    return None if path is None else SessionStore(path)
@@ -0,0 +1,301 @@
+# coding=utf-8
+"""The sheets of the excel persistence module
+Every cell access goes through a Sheet, e.g. a LiveSheet (or a ShadowSheet) of the
+workbook opened in the Excel application (see live_sheet.py) or a sheet of the .xlsx
+file (see xlsx.py). Neither backend is imported here, so each one only needs its own
+dependencies.
+"""
+from abc import abstractmethod
+import contextlib
+from copy import copy
+import time
+from typing import Any, Dict, List
+
+from overrides import overrides
+
+
+CellType = Any  # an xlwings Range of the Excel application (see live_sheet.py)
+
+FIRST_ROW = "1:1"
+FIRST_COLUMN = "A:A"
+
+# the kinds of the COM round trips to the Excel application (see ComCalls)
+READ = "read"
+WRITE = "write"
+FORMAT = "format"
+COPY = "copy"
+ROUND_TRIP_KINDS = (READ, WRITE, FORMAT, COPY)
+
+
+class ComCalls:
+    """Every COM round trip of the xlwings layer is reported to the HOOKS (see add_hook) with
+    the Excel operation it belongs to (see operation) by the proxy wrapping the xlwings
+    objects (see live_sheet._ComProxy)
+    """
+
+    HOOKS = []
+    _operation = None
+
+    @classmethod
+    def add_hook(cls, hook):
+        """Add a `hook` to be told about every COM round trip and Excel operation
+        A hook has a `round_trip(operation, kind)` and an `operation_done(operation, seconds)`
+        method, where the operation is None outside of the operations
+        (see com_metrics.ComMetrics)
+        """
+        cls.HOOKS = cls.HOOKS + [hook]
+
+    @classmethod
+    def remove_hook(cls, hook):
+        """Remove a hook added by `add_hook`"""
+        cls.HOOKS = [added for added in cls.HOOKS if added is not hook]
+
+    @classmethod
+    def report(cls, kind: str):
+        """Report a COM round trip of the `kind` (one of ROUND_TRIP_KINDS) to the hooks"""
+        for hook in cls.HOOKS:
+            hook.round_trip(cls._operation, kind)
+
+    @classmethod
+    @contextlib.contextmanager
+    def operation(cls, name: str):
+        """Attribute the round trips in the context to the named operation, time it and
+        report it to the hooks at the end
+        """
+        hooks = cls.HOOKS
+        outer_operation = cls._operation
+        cls._operation = name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls._operation = outer_operation
+            if hooks:
+                seconds = time.perf_counter() - started
+                for hook in hooks:
+                    hook.operation_done(name, seconds)
+
+
+def _rgb_to_int(rgb: tuple) -> int:
+    """Return the Excel colour value of the (red, green, blue) colour"""
+    return rgb[0] + rgb[1] * 256 + rgb[2] * 256 * 256
+
+
+def _font_with(font, bold: bool, rgb: tuple):
+    """Return a copy of the openpyxl `font` with the boldness and the (red, green, blue) colour"""
+    font = copy(font)
+    font.bold = bold
+    font.color = "FF{:02X}{:02X}{:02X}".format(*rgb)
+    return font
+
+
+class ValueAndFormat:  # pylint: disable=too-few-public-methods
+    """Store a value and allow custom cell formatting via inheritance
+    The format may only depend on the type, as all the cells of the same type are
+    formatted together (see LiveSheet.format)
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    @abstractmethod
+    def format_cell_win32(self, cell: CellType):
+        """The abstract cell formatter function
+        WARNING: this makes the script Windows dependent!
+        """
+
+    @abstractmethod
+    def format_cell_openpyxl(self, cell):
+        """The abstract cell formatter function of the openpyxl cells (see xlsx.py)"""
+
+
+class NtpValueAndFormat(ValueAndFormat):  # pylint: disable=too-few-public-methods
+    """National Team Player formatter"""
+
+    NICE_GREEN = (0, 176, 80)
+
+    def __init__(self):
+        super(NtpValueAndFormat, self).__init__("IGEN!!!")
+
+    @overrides
+    def format_cell_win32(self, cell: CellType):
+        """Apply the emblematic NTP formatting to the cell
+        WARNING: this makes the script Windows dependent!
+        """
+        cell.api.Font.Bold = True
+        cell.api.Font.Color = _rgb_to_int(self.NICE_GREEN)
+
+    @overrides
+    def format_cell_openpyxl(self, cell):
+        """Apply the emblematic NTP formatting to the openpyxl cell"""
+        cell.font = _font_with(cell.font, True, self.NICE_GREEN)
+
+
+class ValueWithNormalFormat(ValueAndFormat):  # pylint: disable=too-few-public-methods
+    """Normal format with no special colour or font or anything"""
+
+    BLACK = (0, 0, 0)
+
+    @overrides
+    def format_cell_win32(self, cell: CellType):
+        """(Re-)set the format to the normal
+        WARNING: this makes the script Windows dependent!
+        """
+        cell.api.Font.Bold = False
+        cell.api.Font.Color = _rgb_to_int(self.BLACK)
+
+    @overrides
+    def format_cell_openpyxl(self, cell):
+        """(Re-)set the format of the openpyxl cell to the normal"""
+        cell.font = _font_with(cell.font, False, self.BLACK)
+
+
+def _plain_value(generic_value):
+    """Return the value to be written of a plain value or a ValueAndFormat"""
+    return generic_value.value if isinstance(generic_value, ValueAndFormat) else generic_value
+
+
+def contiguous_spans(value_of_position: Dict[int, Any]) -> List[tuple]:
+    """Return the values grouped into (first position, [values]) spans of
+    consecutive positions
+    """
+    spans = []
+    for position in sorted(value_of_position):
+        value = _plain_value(value_of_position[position])
+        if spans and spans[-1][0] + len(spans[-1][1]) == position:
+            spans[-1][1].append(value)
+        else:
+            spans.append((position, [value]))
+    return spans
+
+
+def is_formula(formula: str) -> bool:
+    """Return whether the formula (or constant as text) of a cell is really a formula"""
+    return isinstance(formula, str) and formula.startswith("=")
+
+
+class HeaderIndex:
+    """The positions of the headers in the first row (or column) of a sheet
+    The headers are read with a single bulk range read and end after
+    `num_empty_cells_means_eor` consecutive empty cells.
+    """
+
+    def __init__(self, sheet: "Sheet", headers_address: str, num_empty_cells_means_eor=3):
+        if headers_address not in (FIRST_ROW, FIRST_COLUMN):
+            raise ValueError("Unsupported headers: '{}'".format(headers_address))
+        self.sheet = sheet
+        self.headers_address = headers_address
+        self.num_empty_cells_means_eor = num_empty_cells_means_eor
+        self._position_of_name = None
+
+    def _read(self) -> dict:
+        """Read the headers and return their positions by name"""
+        (last_row, last_column) = self.sheet.last_cell()
+        if self.headers_address == FIRST_ROW:
+            headers = self.sheet.read((1, 1), (1, last_column))[0]
+        else:
+            headers = [row[0] for row in self.sheet.read((1, 1), (last_row, 1))]
+
+        position_of_name = {}
+        none_counter = 0
+        for (index, value) in enumerate(headers):
+            if value is None:
+                none_counter += 1
+            else:
+                none_counter = 0
+                position_of_name.setdefault(value, index + 1)
+            if none_counter == self.num_empty_cells_means_eor:
+                break
+        return position_of_name
+
+    def position(self, name: str):
+        """Return the (one-based) column (or row) number of the named header or None"""
+        if self._position_of_name is None:
+            self._position_of_name = self._read()
+        return self._position_of_name.get(name)
+
+    def position_or_raise(self, name: str) -> int:
+        """Return the position of the named header or raise a RuntimeError"""
+        position = self.position(name)
+        if position is None:
+            raise RuntimeError("Failed to find '{}' in '{}'!{}".format(
+                name, self.sheet.name, self.headers_address))
+        return position
+
+    def invalidate(self):
+        """Forget the positions, so they are read again when needed next time
+        (e.g. after inserting columns)
+        """
+        self._position_of_name = None
+
+
+class Sheet:
+    """A sheet of the workbook
+    The cells are (row, column) tuples and the values of a range are lists of rows.
+    """
+
+    def __init__(self):
+        self._header_indices = {}
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """The name of the sheet"""
+
+    def headers(self, headers_address: str = FIRST_ROW) -> HeaderIndex:
+        """Return the (cached) HeaderIndex of the first row or column"""
+        if headers_address not in self._header_indices:
+            self._header_indices[headers_address] = HeaderIndex(self, headers_address)
+        return self._header_indices[headers_address]
+
+    @abstractmethod
+    def last_cell(self) -> tuple:
+        """Return the last (row, column) cell of the used range"""
+
+    @abstractmethod
+    def last_row_of_block(self, column_number: int) -> int:
+        """Return the last row of the block of non-empty cells at the top of the column"""
+
+    @abstractmethod
+    def value(self, row_number: int, column_number: int):
+        """Return the value of the cell"""
+
+    @abstractmethod
+    def formula(self, row_number: int, column_number: int) -> str:
+        """Return the formula (or the constant as text) of the cell"""
+
+    def read(self, first_cell: tuple, last_cell: tuple) -> List[list]:
+        """Return the values of the rectangle between the cells"""
+        return [[self.value(row_number, column_number)
+                 for column_number in range(first_cell[1], last_cell[1] + 1)]
+                for row_number in range(first_cell[0], last_cell[0] + 1)]
+
+    def read_formulas(self, first_cell: tuple, last_cell: tuple) -> List[list]:
+        """Return the formulas (or the constants as text) of the rectangle between the cells"""
+        return [[self.formula(row_number, column_number)
+                 for column_number in range(first_cell[1], last_cell[1] + 1)]
+                for row_number in range(first_cell[0], last_cell[0] + 1)]
+
+    @abstractmethod
+    def write(self, first_cell: tuple, rows: List[list]):
+        """Write the rows of values from the `first_cell` on"""
+
+    @abstractmethod
+    def format(self, cells: List[tuple], formatter: ValueAndFormat):
+        """Format the cells with the formatter"""
+
+    @abstractmethod
+    def copy_row(self, source_row_number: int, destination_row_number: int):
+        """Copy a row (with its formulas and formats) over another one"""
+
+    @abstractmethod
+    def insert_columns(self, column_number: int, count: int):
+        """Insert `count` empty columns before the column (the rest shift to the right)"""
+
+    @abstractmethod
+    def copy_columns(self, source_column_number: int, destination_column_number: int,
+                     count: int):
+        """Copy `count` columns (with their formulas and formats) over other ones"""
+
+    def flush(self):
+        """Write the pending changes (if there are any)"""
@@ -0,0 +1,32 @@
+"""Tests of the vectorized training simulation of train.py"""
+import numpy as np
+
+import train
+
+
+def test_weeks_until_array_matches_the_weekly_simulation():
+    (weeks, ages) = train.weeks_until_array(12, 160, 5.0, 7, 5, 100, 10, "W", True, 17)
+    level = 5.0
+    for week in range(weeks):
+        assert level < 12
+        level += train.training_progress(level, 7, 5, 100, 10, "W", True,
+                                         17 + week // train.SEASON_WEEKS)
+    assert level >= 12
+    assert ages == 17 + weeks // train.SEASON_WEEKS
+
+
+def test_weeks_until_array_of_an_impossible_training_is_unreached():
+    # there's no background goalkeeping training
+    (weeks, ages) = train.weeks_until_array(12, 160, 5.0, 7, 5, 100, 10, "GK", False, 17)
+    assert (weeks, ages) == (train.UNREACHED, train.UNREACHED)
+
+
+def test_weeks_until_array_of_a_reached_level_is_zero_even_without_training():
+    (weeks, ages) = train.weeks_until_array(4, 160, 5.0, 7, 5, 100, 10, "GK", False, 17)
+    assert (weeks, ages) == (0, 17)
+
+
+def test_weeks_until_array_beyond_the_horizon_is_unreached():
+    (weeks, _) = train.weeks_until_array(12, 32, np.array([5.0, 3.0]), 7, 5, 100, 10, "W", True,
+                                         np.array([17, 19]))
+    assert weeks.tolist() == [29, train.UNREACHED]  # the second one would need 34 weeks
@@ -1,7 +1,13 @@
 from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import csv
+import json
 import math
+import os
+import time
 
 import click
+import numpy as np
 
 
 def level_coeff(level):
@@ -11,32 +17,36 @@ def level_coeff(level):
         return (54.676 / level) - 1.438
 
 
+COEFF_OF_COACH_LEVEL = {
+    8: 1.0375,
+    7: 1.0000,
+    6: 0.9200,
+    5: 0.8324,
+    4: 0.7343,
+}
+
+
 def coach_coeff(level):
-    coeff_of_coach_level = {
-        8: 1.0375,
-        7: 1.0000,
-        6: 0.9200,
-        5: 0.8324,
-        4: 0.7343,
-    }
-    return coeff_of_coach_level[level]
+    return COEFF_OF_COACH_LEVEL[level]
+
+
+COEFF_OF_ASSISTANT_LEVEL = {
+    10: 1.350,
+    9: 1.315,
+    8: 1.280,
+    7: 1.245,
+    6: 1.210,
+    5: 1.175,
+    4: 1.140,
+    3: 1.105,
+    2: 1.070,
+    1: 1.035,
+    0: 1.000,
+}
 
 
 def assistant_coeff(level):
-    coeff_of_assistant_level = {
-        10: 1.350,
-        9: 1.315,
-        8: 1.280,
-        7: 1.245,
-        6: 1.210,
-        5: 1.175,
-        4: 1.140,
-        3: 1.105,
-        2: 1.070,
-        1: 1.035,
-        0: 1.000,
-    }
-    return coeff_of_assistant_level[level]
+    return COEFF_OF_ASSISTANT_LEVEL[level]
 
 
 def intensity_coeff(percent):
@@ -62,22 +72,24 @@ COEFF_OF_TRAIN_TYPE = {
 }
 
 
+BACKGROUND_RATIO_OF_TRAIN_TYPE = {
+    "DF": 1 / 6,
+    "PM": 1 / 8,
+    "W": 1 / 8,
+    "PS": 1 / 6,
+    "SC": 1 / 6,
+    "FirstPS": 1 / 6,
+    "ZoneDF": 1 / 6,
+    "WingAttack": 5 / 39,
+}
+
+
 def train_coeff(train_type, full_train_position):
     c = COEFF_OF_TRAIN_TYPE[train_type]
     if full_train_position:
         ratio = 1.0
     else:
-        backround_ratio_of_train_type = {
-            "DF": 1 / 6,
-            "PM": 1 / 8,
-            "W": 1 / 8,
-            "PS": 1 / 6,
-            "SC": 1 / 6,
-            "FirstPS": 1 / 6,
-            "ZoneDF": 1 / 6,
-            "WingAttack": 5 / 39,
-        }
-        ratio = backround_ratio_of_train_type[train_type]
+        ratio = BACKGROUND_RATIO_OF_TRAIN_TYPE[train_type]
     return c * ratio
 
 
@@ -105,6 +117,138 @@ def training_progress(level, coach, assist, intensity, stamina, train_type, full
     return progress
 
 
+SEASON_WEEKS = 16
+
+
+class TrainingModel:
+    """The training of a player with fixed staff, intensity, stamina and training settings
+    The settings are validated and their coefficients are multiplied once, while level_coeff
+    is tabulated (and linearly interpolated), so a weekly step is a table lookup and a few
+    multiplications.
+    """
+
+    LEVEL_STEP = 0.01  # the resolution of the level_coeff table
+    MAX_TABULATED_LEVEL = 30  # level_coeff is calculated directly above this level
+    # the level_coeff table (and the slopes between its entries) shared by every model
+    _level_coeffs = []
+    _level_coeff_slopes = []
+
+    def __init__(self, coach, assist, intensity, stamina, train_type, full, play_time=90):
+        if coach not in COEFF_OF_COACH_LEVEL:
+            raise ValueError("The coach's level must be one of {}".format(
+                sorted(COEFF_OF_COACH_LEVEL)))
+        if assist not in COEFF_OF_ASSISTANT_LEVEL:
+            raise ValueError("The coach assistants' level must be one of {}".format(
+                sorted(COEFF_OF_ASSISTANT_LEVEL)))
+        if not (0 <= intensity <= 100 and 0 <= stamina <= 100):
+            raise ValueError("The intensity and the stamina must be percentages")
+        if train_type not in COEFF_OF_TRAIN_TYPE:
+            raise ValueError("Unknown training type '{}'".format(train_type))
+        if not full and train_type not in BACKGROUND_RATIO_OF_TRAIN_TYPE:
+            raise ValueError("'{}' can't be trained in the background".format(train_type))
+        self.constant_coeff = (coach_coeff(coach) * assistant_coeff(assist)
+                               * intensity_coeff(intensity) * stamina_coeff(stamina)
+                               * train_coeff(train_type, full) * play_time_coeff(play_time))
+        if not TrainingModel._level_coeffs:
+            TrainingModel._tabulate_level_coeff()
+
+    @classmethod
+    def _tabulate_level_coeff(cls):
+        num_steps = int(round(cls.MAX_TABULATED_LEVEL / cls.LEVEL_STEP))
+        coeffs = [level_coeff(step * cls.LEVEL_STEP) for step in range(num_steps + 1)]
+        cls._level_coeff_slopes = [(coeffs[step + 1] - coeffs[step]) / cls.LEVEL_STEP
+                                   for step in range(num_steps)]
+        cls._level_coeffs = coeffs[:-1]
+
+    def level_coeff(self, level):
+        """The (interpolated) level_coeff of the level"""
+        step = int(level / self.LEVEL_STEP)
+        if 0 <= step < len(self._level_coeffs):
+            coeff = (self._level_coeffs[step]
+                     + (level - step * self.LEVEL_STEP) * self._level_coeff_slopes[step])
+        else:
+            coeff = level_coeff(level)
+        return coeff
+
+    def weekly_coeff(self, age):
+        """The coefficient of a week's training at the age (apart from the level's)"""
+        return self.constant_coeff * age_coeff(age)
+
+    def weekly_progress(self, level, age):
+        """The (interpolated) training_progress of a week"""
+        return min(self.level_coeff(level) * self.weekly_coeff(age), 1.0)
+
+    def simulate_seasons(self, number_of_seasons, level, age):
+        """simulate_seasons with the model's settings"""
+        seasons = []
+        for _ in range(number_of_seasons):
+            weekly_coeff = self.weekly_coeff(age)
+            init_level = level
+            for _ in range(SEASON_WEEKS):
+                level += min(self.level_coeff(level) * weekly_coeff, 1.0)
+            seasons.append(Season(in_age=age, in_level=init_level, progress=level - init_level,
+                                  out_level=level, out_age=age + 1))
+            age += 1
+        return (math.floor(level), seasons)
+
+
+def level_coeff_array(level):
+    """The level_coeff of every level of the array"""
+    level = np.asarray(level, dtype=float)
+    with np.errstate(divide="ignore"):
+        return np.where(level < 9, 16.289 * np.exp(-0.1396 * level), (54.676 / level) - 1.438)
+
+
+def _coeff_array(coeff, values):
+    """Return coeff(value) for every value of the array (calling coeff once per distinct value)"""
+    values = np.asarray(values)
+    (distinct_values, inverse) = np.unique(values, return_inverse=True)
+    coeffs = np.array([coeff(value.item()) for value in distinct_values], dtype=float)
+    return coeffs[inverse].reshape(values.shape)
+
+
+def _train_coeff_array(train_type, full):
+    """Return the train_coeff of every (broadcast) pair of the train type and full arrays
+    (NaN for the training types that can't be trained in the background)
+    """
+    (train_type, full) = np.broadcast_arrays(np.asarray(train_type), np.asarray(full, dtype=bool))
+    coeffs = np.empty(train_type.shape)
+    for distinct_train_type in np.unique(train_type):
+        if distinct_train_type.item() not in COEFF_OF_TRAIN_TYPE:
+            raise KeyError(distinct_train_type.item())
+        for distinct_full in np.unique(full[train_type == distinct_train_type]):
+            pairs = (train_type == distinct_train_type) & (full == distinct_full)
+            try:
+                coeffs[pairs] = train_coeff(distinct_train_type.item(), bool(distinct_full))
+            except KeyError:
+                coeffs[pairs] = np.nan
+    return coeffs
+
+
+def _constant_coeff_array(coach, assist, intensity, stamina, train_type, full):
+    """The product of the coefficients of training_progress that don't change week by week
+    (all but the level and the age ones) for every combination of the parameter arrays
+    """
+    return (_coeff_array(coach_coeff, coach)
+            * _coeff_array(assistant_coeff, assist)
+            * intensity_coeff(np.asarray(intensity, dtype=float))
+            * stamina_coeff(np.asarray(stamina, dtype=float))
+            * _train_coeff_array(train_type, full)
+            * play_time_coeff())
+
+
+def training_progress_array(level, coach, assist, intensity, stamina, train_type, full, age):
+    """The training_progress of every combination of the (broadcastable) parameter arrays
+    (NaN where training_progress would raise a KeyError for a background only training type)
+    Every coefficient is computed on the shape of its own parameter and they are only broadcast
+    when they are multiplied, so e.g. an open grid of millions of combinations is cheap.
+    """
+    progress = (level_coeff_array(level)
+                * _constant_coeff_array(coach, assist, intensity, stamina, train_type, full)
+                * age_coeff(np.asarray(age, dtype=float)))
+    return np.minimum(progress, 1.0)
+
+
 @click.group()
 @click.option("-l", "--level", required=True, type=int, help="Current skill level.")
 @click.option("-c", "--coach", required=True, type=int, help="The coach's level.")
@@ -137,19 +281,115 @@ Season = namedtuple("Season", "in_age in_level progress out_level out_age")
 
 
 def simulate_seasons(number_of_seasons, level, coach, assist, intensity, stamina, train_type, full, age):
-    season_weeks = 16
-    seasons = []
+    model = TrainingModel(coach, assist, intensity, stamina, train_type, full)
+    return model.simulate_seasons(number_of_seasons, level, age)
+
+
+SeasonArrays = namedtuple("SeasonArrays", "in_age in_level progress out_level out_age")
+
+
+def _players_array(level, coach, assist, intensity, stamina, train_type, full, age):
+    """Return the level, age and constant coefficient (see _constant_coeff_array) arrays of
+    every player of the (broadcastable) parameter arrays, all of the players' shape
+    """
+    constant_coeff = _constant_coeff_array(coach, assist, intensity, stamina, train_type, full)
+    shape = np.broadcast_shapes(np.shape(level), np.shape(age), constant_coeff.shape)
+    return (np.broadcast_to(np.asarray(level, dtype=float), shape),
+            np.broadcast_to(np.asarray(age, dtype=int), shape),
+            np.broadcast_to(constant_coeff, shape))
+
+
+def _advance_week(level, weekly_coeff):
+    """The levels of the players after a week of training (the one step of every simulation)"""
+    return level + np.minimum(level_coeff_array(level) * weekly_coeff, 1.0)
+
+
+def _advance_season(level, constant_coeff, age):
+    """The levels of the players of the age after a season of training"""
+    weekly_coeff = constant_coeff * age_coeff(age)
+    for _ in range(SEASON_WEEKS):
+        level = _advance_week(level, weekly_coeff)
+    return level
+
+
+def simulate_seasons_array(number_of_seasons, level, coach, assist, intensity, stamina, train_type,
+                           full, age):
+    """simulate_seasons for every player of the (broadcastable) parameter arrays at once
+    Return the floor of the reached levels and the SeasonArrays whose arrays have a last
+    dimension of the seasons on top of the players' shape.
+    """
+    (level, age, constant_coeff) = _players_array(level, coach, assist, intensity, stamina,
+                                                  train_type, full, age)
+    seasons = SeasonArrays(*(np.empty(level.shape + (number_of_seasons,))
+                             for _ in SeasonArrays._fields))
     for season in range(number_of_seasons):
-        season_progress = 0
-        init_level = level
-        for _ in range(season_weeks):
-            progress = training_progress(level, coach, assist, intensity, stamina, train_type, full, age)
-            level += progress
-            season_progress += progress
-        seasons.append(Season(in_age=age, in_level=init_level, progress=season_progress,
-                              out_level=level, out_age=age + 1))
-        age += 1
-    return (math.floor(level), seasons)
+        seasons.in_level[..., season] = level
+        seasons.in_age[..., season] = age + season
+        level = _advance_season(level, constant_coeff, age + season)
+        seasons.out_level[..., season] = level
+        seasons.out_age[..., season] = age + season + 1
+    np.subtract(seasons.out_level, seasons.in_level, out=seasons.progress)
+    return (np.floor(level), seasons)
+
+
+def final_levels_array(number_of_seasons, level, coach, assist, intensity, stamina, train_type,
+                       full, age):
+    """The (unfloored) level every player of the (broadcastable) parameter arrays reaches after
+    the seasons, like simulate_seasons_array but without keeping the seasons
+    """
+    (level, age, constant_coeff) = _players_array(level, coach, assist, intensity, stamina,
+                                                  train_type, full, age)
+    for season in range(number_of_seasons):
+        level = _advance_season(level, constant_coeff, age + season)
+    return level
+
+
+def progress_curves_array(number_of_weeks, level, coach, assist, intensity, stamina, train_type,
+                          full, age):
+    """The cumulative training progress curve of every player of the (broadcastable) parameter
+    arrays i.e. their levels week by week
+    Return an array with a last dimension of the weeks (the first one is the initial level)
+    on top of the players' shape.
+    """
+    (level, age, constant_coeff) = _players_array(level, coach, assist, intensity, stamina,
+                                                  train_type, full, age)
+    curves = np.empty(level.shape + (number_of_weeks + 1,))
+    curves[..., 0] = level
+    for week in range(number_of_weeks):
+        if week % SEASON_WEEKS == 0:
+            weekly_coeff = constant_coeff * age_coeff(age + week // SEASON_WEEKS)
+        curves[..., week + 1] = _advance_week(curves[..., week], weekly_coeff)
+    return curves
+
+
+def _search_curves(curves, values):
+    """numpy.searchsorted of every value in its own (non-decreasing) curve i.e. the index of
+    the first point of the curve not below the value (the length of the curve if there's none),
+    which is the number of the curve's points below the value
+    """
+    return np.count_nonzero(curves < values[..., np.newaxis], axis=-1)
+
+
+# the number of weeks of the players who don't reach the target level in time
+UNREACHED = -1
+
+
+def weeks_until_array(target_level, max_weeks, level, coach, assist, intensity, stamina,
+                      train_type, full, age):
+    """The number of weeks every player of the (broadcastable) parameter arrays needs to reach
+    the target level (UNREACHED if it takes more than max_weeks or the training is impossible)
+    and the player's age then
+    """
+    curves = progress_curves_array(max_weeks, level, coach, assist, intensity, stamina,
+                                   train_type, full, age)
+    target_level = np.broadcast_to(np.asarray(target_level, dtype=float), curves.shape[:-1])
+    weeks = _search_curves(curves, target_level)
+    # the curves of the impossible trainings are NaN after the initial level
+    impossible = np.isnan(curves[..., -1]) & (weeks > 0)
+    weeks = np.where((weeks > max_weeks) | impossible, UNREACHED, weeks)
+    ages = np.where(weeks == UNREACHED, UNREACHED,
+                    np.asarray(age, dtype=int) + weeks // SEASON_WEEKS)
+    return (weeks, ages)
 
 
 @train.command()
@@ -182,5 +422,305 @@ def season(ctx, number_of_seasons):
               .format(season.in_age, season.in_level, season.progress, season.out_level, season.out_age))
 
 
+def _int_list(ctx, param, value):
+    """Parse a comma separated list of integers and inclusive ranges e.g. 0-3,5"""
+    if value is None:
+        return None
+    values = []
+    try:
+        for part in value.split(","):
+            (first, _, last) = part.partition("-")
+            values.extend(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise click.BadParameter("'{}' is not a list of integers and ranges".format(value))
+    return values
+
+
+def _train_type_list(ctx, param, value):
+    """Parse a comma separated list of training types or all of them"""
+    if value is None:
+        return None
+    if value.lower() == "all":
+        return list(COEFF_OF_TRAIN_TYPE)
+    train_type_of_name = {train_type.lower(): train_type for train_type in COEFF_OF_TRAIN_TYPE}
+    try:
+        return [train_type_of_name[name.lower()] for name in value.split(",")]
+    except KeyError as error:
+        raise click.BadParameter("unknown training type {}".format(error))
+
+
+def _open_grid(axes):
+    """Return every list of the axes as an array along its own dimension (see numpy.ix_)"""
+    return [np.asarray(values).reshape([-1 if dimension == axis else 1
+                                        for dimension in range(len(axes))])
+            for (axis, values) in enumerate(axes)]
+
+
+def _parameter_list_options(command):
+    """Add the options of the parameter lists of a grid to the command (see _axes)"""
+    options = [
+        click.option("--levels", callback=_int_list,
+                     help="The skill levels e.g. 1-20 (default: --level)."),
+        click.option("--coaches", callback=_int_list,
+                     help="The coach's levels e.g. 4-8 (default: --coach)."),
+        click.option("--assists", callback=_int_list,
+                     help="The coach assistants' levels e.g. 0-10 (default: --assist)."),
+        click.option("--intensities", callback=_int_list,
+                     help="The training intensities e.g. 80-100 (default: --intensity)."),
+        click.option("--staminas", callback=_int_list,
+                     help="The stamina percentages e.g. 5-20 (default: --stamina)."),
+        click.option("--train-types", callback=_train_type_list,
+                     help="The training types e.g. W,PM or all (default: --train-type)."),
+        click.option("--slots", type=click.Choice(["full", "background", "both"]),
+                     help="The training slots (default: --full/--background)."),
+        click.option("--ages", callback=_int_list,
+                     help="The player's ages e.g. 17-20 (default: --age)."),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def _axes(ctx, levels, coaches, assists, intensities, staminas, train_types, slots, ages):
+    """Return the list of values of every parameter by name (the group's option by default)"""
+    full_of_slots = {"full": [True], "background": [False], "both": [True, False]}
+    return {
+        "level": levels or [ctx.obj["level"]],
+        "coach": coaches or [ctx.obj["coach"]],
+        "assist": assists or [ctx.obj["assist"]],
+        "intensity": intensities or [ctx.obj["intensity"]],
+        "stamina": staminas or [ctx.obj["stamina"]],
+        "train_type": train_types or [ctx.obj["train_type"]],
+        "full": full_of_slots[slots] if slots else [ctx.obj["full"]],
+        "age": ages or [ctx.obj["age"]],
+    }
+
+
+@train.command()
+@_parameter_list_options
+@click.option("--top", default=10, type=int, help="The number of best combinations to print.")
+@click.option("-o", "--output", default=None,
+              help="Save the progress of every combination with the axes into this .npz file.")
+@click.pass_context
+def grid(ctx, top, output, **parameter_lists):
+    """Print the best weekly progresses of every combination of the parameter lists"""
+    axes = _axes(ctx, **parameter_lists)
+    started = time.perf_counter()
+    progress = training_progress_array(*_open_grid(list(axes.values())))
+    seconds = time.perf_counter() - started
+    print("{:,} combinations in {:.3f} seconds".format(progress.size, seconds))
+
+    top = min(top, progress.size)
+    if top > 0:
+        ranked = np.nan_to_num(progress, nan=-1.0)  # the impossible combinations are the last
+        best = np.argpartition(ranked, ranked.size - top, axis=None)[-top:]
+        for flat_index in best[np.argsort(ranked.flat[best])[::-1]]:
+            index = np.unravel_index(flat_index, progress.shape)
+            combination = ", ".join("{}={}".format(name, values[i])
+                                    for ((name, values), i) in zip(axes.items(), index))
+            print("{:.4f}: {}".format(progress[index], combination))
+
+    if output is not None:
+        np.savez(output, progress=progress,
+                 **{name: np.asarray(values) for (name, values) in axes.items()})
+
+
+SWEEP_COLUMNS = ("coach", "assist", "train_type", "full", "intensity", "stamina", "age", "level",
+                 "out_level")
+SWEEP_JOURNAL_SUFFIX = ".journal"
+SWEEP_SHARD_SIZE = 100000  # the maximum number of players simulated (and kept) at once
+
+
+def _sweep_shards(axes, number_of_seasons):
+    """Return the shards of the axes: the (intensity, stamina, age, level) players of every
+    (coach, assist, train type, full) where the training exists, in chunks of at most
+    SWEEP_SHARD_SIZE players (see _sweep_shard)
+    """
+    player_axes = (axes["intensity"], axes["stamina"], axes["age"], axes["level"])
+    num_players = math.prod(len(values) for values in player_axes)
+    shards = []
+    for coach in axes["coach"]:
+        for assist in axes["assist"]:
+            for train_type in axes["train_type"]:
+                for full in axes["full"]:
+                    try:
+                        train_coeff(train_type, full)
+                    except KeyError:  # there's no background training of the type
+                        continue
+                    for first in range(0, num_players, SWEEP_SHARD_SIZE):
+                        last = min(first + SWEEP_SHARD_SIZE, num_players)
+                        shards.append((len(shards), coach, assist, train_type, full,
+                                       player_axes, first, last, number_of_seasons))
+    return shards
+
+
+def _sweep_shard(shard):
+    """Simulate the seasons of the players of the shard and return the shard's id, its
+    results as CSV rows and the number of rows (it runs in a worker process)
+    """
+    (shard_id, coach, assist, train_type, full, player_axes, first, last,
+     number_of_seasons) = shard
+    indices = np.unravel_index(np.arange(first, last), [len(values) for values in player_axes])
+    (intensity, stamina, age, level) = (np.asarray(values)[index]
+                                        for (values, index) in zip(player_axes, indices))
+    out_levels = final_levels_array(number_of_seasons, level, coach, assist, intensity, stamina,
+                                    train_type, full, age)
+    prefix = "{},{},{},{},".format(coach, assist, train_type, full)
+    rows = "".join("{}{},{},{},{},{:.4f}\n".format(prefix, *player)
+                   for player in zip(intensity.tolist(), stamina.tolist(), age.tolist(),
+                                     level.tolist(), out_levels.tolist()))
+    return (shard_id, rows, len(out_levels))
+
+
+def _read_journal(journal):
+    """Return the parameters and the (shard id, output offset) entries of the journal, where
+    the first entry is the end of the header (with a None id), or None if it has no header
+    A torn last line (of an interrupted write) is ignored.
+    """
+    with open(journal, encoding="utf-8") as journal_file:
+        lines = journal_file.read().split("\n")[:-1]  # the last one is empty or torn
+    if len(lines) < 2:
+        return None
+    entries = [(None, int(lines[1]))]
+    for line in lines[2:]:
+        (shard_id, offset) = (int(field) for field in line.split())
+        entries.append((shard_id, offset))
+    return (json.loads(lines[0]), entries)
+
+
+def _resume_sweep(output, journal, parameters):
+    """Return the ids of the shards already in the output (and drop any unjournaled rows
+    after them) or start a new output (with its header) and journal
+    """
+    journaled = None
+    if os.path.isfile(journal) and os.path.isfile(output):
+        journaled = _read_journal(journal)
+    if journaled is None:
+        with open(output, "w", encoding="utf-8", newline="") as output_file:
+            csv.writer(output_file, lineterminator="\n").writerow(SWEEP_COLUMNS)
+            header_end = output_file.tell()
+        with open(journal, "w", encoding="utf-8") as journal_file:
+            journal_file.write("{}\n{}\n".format(json.dumps(parameters), header_end))
+        done_shard_ids = set()
+    else:
+        (journaled_parameters, entries) = journaled
+        if journaled_parameters != parameters:
+            raise click.ClickException("'{}' is a sweep of other parameters".format(output))
+        done_shard_ids = {shard_id for (shard_id, _) in entries[1:]}
+        os.truncate(output, entries[-1][1])
+    return done_shard_ids
+
+
+def _player_list(ctx, param, value):
+    """Parse a comma separated list of LEVEL:AGE players e.g. 5:17,6.5:18"""
+    if value is None:
+        return None
+    try:
+        return [(float(level), int(age))
+                for (level, age) in (player.split(":") for player in value.split(","))]
+    except ValueError:
+        raise click.BadParameter("'{}' is not a list of LEVEL:AGE players".format(value))
+
+
+@train.command()
+@click.option("-p", "--players", callback=_player_list,
+              help="The players' LEVEL:AGE e.g. 5:17,6.5:18 (default: --level:--age).")
+@click.option("--train-types", callback=_train_type_list,
+              help="The training types e.g. W,PM or all (default: --train-type).")
+@click.option("-n", "--number-of-seasons", default=1, type=click.IntRange(min=1),
+              help="The number of consecutive seasons to simulate the training for.")
+@click.pass_context
+def squad(ctx, players, train_types, number_of_seasons):
+    """Print the reached levels of every player for every training type after the seasons"""
+    players = players or [(ctx.obj["level"], ctx.obj["age"])]
+    train_types = train_types or [ctx.obj["train_type"]]
+    (levels, ages) = (np.array(values)[:, np.newaxis] for values in zip(*players))
+    (_, seasons) = simulate_seasons_array(number_of_seasons, levels, ctx.obj["coach"],
+                                          ctx.obj["assist"], ctx.obj["intensity"],
+                                          ctx.obj["stamina"], np.array(train_types),
+                                          ctx.obj["full"], ages)
+    print("{:<12}".format("level:age") + "".join("{:>12}".format(t) for t in train_types))
+    for (index, (level, age)) in enumerate(players):
+        print("{:<12}".format("{:.2f}:{}".format(level, age)) + "".join(
+            "{:>12.2f}".format(out_level) for out_level in seasons.out_level[index, :, -1]))
+
+
+@train.command()
+@click.option("-p", "--players", callback=_player_list,
+              help="The players' LEVEL:AGE e.g. 5:17,6.5:18 (default: --level:--age).")
+@click.option("--target-level", required=True, type=float,
+              help="The skill level the players have to reach e.g. 12.")
+@click.option("--max-seasons", default=10, type=click.IntRange(min=1),
+              help="The number of seasons to look for the target level in.")
+@click.pass_context
+def until(ctx, players, target_level, max_seasons):
+    """Print the number of weeks every player needs to reach the target level and their age then"""
+    players = players or [(ctx.obj["level"], ctx.obj["age"])]
+    (levels, ages) = (np.array(values) for values in zip(*players))
+    (weeks, out_ages) = weeks_until_array(target_level, max_seasons * SEASON_WEEKS, levels,
+                                          ctx.obj["coach"], ctx.obj["assist"],
+                                          ctx.obj["intensity"], ctx.obj["stamina"],
+                                          ctx.obj["train_type"], ctx.obj["full"], ages)
+    print("{:<12}{:>8}{:>16}{:>6}".format("level:age", "weeks", "seasons+weeks", "age"))
+    for ((level, age), week, out_age) in zip(players, weeks, out_ages):
+        if week == UNREACHED:
+            print("{:<12}  not within {} seasons".format("{:.2f}:{}".format(level, age),
+                                                         max_seasons))
+        else:
+            print("{:<12}{:>8}{:>16}{:>6}".format(
+                "{:.2f}:{}".format(level, age), week,
+                "{}+{}".format(week // SEASON_WEEKS, week % SEASON_WEEKS), out_age))
+
+
+@train.command()
+@_parameter_list_options
+@click.option("-n", "--number-of-seasons", default=1, type=click.IntRange(min=1),
+              help="The number of consecutive seasons to simulate the training for.")
+@click.option("-o", "--output", required=True,
+              help="The CSV file of the reached levels (an interrupted sweep is resumed).")
+@click.option("-w", "--workers", default=None, type=click.IntRange(min=1),
+              help="The number of worker processes (default: the number of CPUs).")
+@click.pass_context
+def sweep(ctx, number_of_seasons, output, workers, **parameter_lists):
+    """Simulate the seasons of every combination of the parameter lists on a process pool
+    and stream the reached levels into a CSV file as the shards are done
+    The finished shards are journaled next to the file, so running the same sweep again
+    continues where it stopped. Only a few shards of bounded size are in memory at once.
+    """
+    axes = _axes(ctx, **parameter_lists)
+    journal = output + SWEEP_JOURNAL_SUFFIX
+    workers = workers or os.cpu_count()
+    done_shard_ids = _resume_sweep(output, journal, {"axes": axes, "seasons": number_of_seasons,
+                                                     "shard_size": SWEEP_SHARD_SIZE})
+    shards = [shard for shard in _sweep_shards(axes, number_of_seasons)
+              if shard[0] not in done_shard_ids]
+    num_shards = len(shards) + len(done_shard_ids)
+    num_done = len(done_shard_ids)
+    num_rows = 0
+    if done_shard_ids:
+        print("Resuming '{}' ({}/{} shards are done already)".format(output, num_done, num_shards))
+    started = time.perf_counter()
+    with ProcessPoolExecutor(workers) as executor, \
+            open(output, "ab") as output_file, open(journal, "a", encoding="utf-8") as journal_file:
+        max_pending = 2 * workers
+        pending = set()
+        while shards or pending:
+            while shards and len(pending) < max_pending:  # only a few shards are in memory
+                pending.add(executor.submit(_sweep_shard, shards.pop(0)))
+            (done, pending) = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                (shard_id, rows, num_shard_rows) = future.result()
+                output_file.write(rows.encode("utf-8"))
+                output_file.flush()
+                journal_file.write("{} {}\n".format(shard_id, output_file.tell()))
+                journal_file.flush()
+                num_done += 1
+                num_rows += num_shard_rows
+                elapsed = time.perf_counter() - started
+                print("\r{}/{} shards, {:,} rows, {:.0f}s".format(num_done, num_shards, num_rows,
+                                                                  elapsed), end="", flush=True)
+    print()
+
+
 if __name__ == '__main__':
     train()
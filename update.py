@@ -1,32 +1,55 @@
 # coding=utf-8
 """Automate my hattrick player status monitoring"""
+import argparse
+
+from cache import response_cache_from_args
+from com_metrics import com_metrics_from_args, recording_com_calls
 import common
-from excel import Excel
 from hattrick import Hattrick
+from metrics import recording, request_metrics_from_args
+from session_store import session_store_from_args
 
 
 def _update(args):
     """Update all _existing_ monitored stuff we care about"""
-    read_only = getattr(args, common.READ_ONLY_ARG)
-    ht = Hattrick(args.currency, args.user, args.password)  # pylint: disable=invalid-name
-    xl = Excel(args.spreadsheet, read_only)  # pylint: disable=invalid-name
-    with ht, xl:
+    max_workers = getattr(args, common.WORKERS_ARG)
+    cache = response_cache_from_args(args)
+    session_store = session_store_from_args(args)
+    ht = Hattrick(args.currency, args.user, args.password,  # pylint: disable=invalid-name
+                  max_workers, cache, session_store)
+    xl = common.persistence_from_args(args)  # pylint: disable=invalid-name
+    com_metrics = com_metrics_from_args(args)
+    with recording(request_metrics_from_args(args)), recording_com_calls(com_metrics), ht, xl:
         team = ht.download_team()
         print(team)
         xl.update_team(team)
         print()
 
         players_list_page = ht.download_player_list_page()  # only download once
-        for name in xl.monitored_players_names():
-            player = ht.download_player_by_name(name, players_list_page)
+        names = xl.monitored_players_names()
+        for player in ht.download_players(names, players_list_page):
             print(player)
             xl.update_player(player)
             print()
 
 
+def _positive_int(string):
+    """Parse a strictly positive integer CLI argument"""
+    try:
+        value = int(string)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError("'{}' is not a positive integer".format(string))
+    return value
+
+
 def main():
     """parse args and perform the automation"""
     parser = common.cli_arg_parser()
+    parser.add_argument("-w", "--{}".format(common.WORKERS_ARG), required=False,
+                        type=_positive_int, default=10,
+                        help="the maximum number of concurrent hattrick downloads")
     args = parser.parse_args()
 
     pause = getattr(args, common.PAUSE_ARG)
@@ -0,0 +1,259 @@
+# coding=utf-8
+"""The headless backend of the excel persistence module
+The .xlsx file is read and written directly with openpyxl, so neither the Excel application
+nor Windows is needed. The formulas are not calculated though, Excel recalculates them when
+it opens the file next time.
+"""
+from copy import copy
+import re
+from typing import List
+
+import openpyxl
+from openpyxl.formula.tokenizer import Token, Tokenizer
+from openpyxl.formula.translate import Translator
+from openpyxl.utils import column_index_from_string, get_column_letter
+from overrides import overrides
+
+from sheet import Sheet, ValueAndFormat, is_formula
+
+
+# the parts of an A1-style reference: $column$row, where every part is optional
+CELL_REFERENCE_PATTERN = re.compile(r"(\$?)([A-Z]{1,3})?(\$?)(\d+)?")
+
+
+def _cells(worksheet) -> dict:
+    """Return the existing cells of the worksheet by (row, column)
+    (unlike worksheet.cell(), looking a cell up here does not create it)
+    """
+    return worksheet._cells  # pylint: disable=protected-access
+
+
+def _shifted_reference(reference: str, column_number: int, count: int) -> str:
+    """Return the A1-style reference (e.g. A1, $B$2:C3, D:E) with the columns from
+    `column_number` on shifted to the right by `count` columns
+    Anything else (e.g. a defined name) is returned as it is.
+    """
+    parts = reference.split(":")
+    matches = [CELL_REFERENCE_PATTERN.fullmatch(part) for part in parts]
+    kinds = {(bool(match.group(2)), bool(match.group(4))) for match in matches if match}
+    is_a1_reference = (all(matches) and len(parts) <= 2 and len(kinds) == 1
+                       and kinds != {(False, False)}
+                       and (len(parts) == 2 or kinds == {(True, True)}))
+
+    shifted_reference = reference
+    if is_a1_reference:
+        shifted_parts = []
+        for match in matches:
+            (column_dollar, letters, row_dollar, row) = match.groups("")
+            if letters and column_index_from_string(letters) >= column_number:
+                letters = get_column_letter(column_index_from_string(letters) + count)
+            shifted_parts.append(column_dollar + letters + row_dollar + row)
+        shifted_reference = ":".join(shifted_parts)
+    return shifted_reference
+
+
+def _shift_columns_in_formula(formula: str, formula_sheet_title: str, shifted_sheet_title: str,
+                              column_number: int, count: int) -> str:
+    """Return the formula (of a cell on `formula_sheet_title`) with its references to the
+    columns of `shifted_sheet_title` from `column_number` on shifted by `count` columns
+    """
+    tokenizer = Tokenizer(formula)
+    for token in tokenizer.items:
+        if token.type == Token.OPERAND and token.subtype == Token.RANGE:
+            (sheet_part, separator, reference) = token.value.rpartition("!")
+            if sheet_part:
+                referenced_sheet_title = sheet_part.strip("'").replace("''", "'")
+            else:
+                referenced_sheet_title = formula_sheet_title
+            if referenced_sheet_title == shifted_sheet_title:
+                token.value = sheet_part + separator + _shifted_reference(reference,
+                                                                          column_number, count)
+    return tokenizer.render()
+
+
+def _copy_cell(worksheet, source: tuple, destination: tuple):
+    """Copy the value and the style of the `source` (row, column) cell over the `destination`
+    The relative references of a formula are translated to the new place like Excel does.
+    """
+    source_cell = _cells(worksheet).get(source)
+    if source_cell is None:
+        _cells(worksheet).pop(destination, None)
+    else:
+        destination_cell = worksheet.cell(*destination)
+        value = source_cell.value
+        if is_formula(value):
+            value = Translator(value, origin=source_cell.coordinate).translate_formula(
+                destination_cell.coordinate)
+        destination_cell.value = value
+        destination_cell._style = copy(source_cell._style)  # pylint: disable=protected-access
+
+
+class XlsxSheet(Sheet):
+    """A sheet of the .xlsx workbook loaded into memory by openpyxl
+    The value of a formula cell is its result Excel saved last time, as long as it's
+    still the same cell, i.e. until the sheet's columns are shifted (or for a copied sheet)
+    it's unknown (None).
+    Inserting columns updates the references of the formulas (of every sheet), but not the
+    merged cells, the conditional formats or the column widths of the shifted columns.
+    """
+
+    def __init__(self, workbook: "XlsxWorkbook", worksheet, formula_results_title: str = None):
+        super(XlsxSheet, self).__init__()
+        self.workbook = workbook
+        self.worksheet = worksheet
+        self._formula_results_title = formula_results_title
+
+    @property
+    @overrides
+    def name(self) -> str:
+        """The name of the sheet"""
+        return self.worksheet.title
+
+    @overrides
+    def last_cell(self) -> tuple:
+        """Return the last (row, column) cell of the used range"""
+        return (self.worksheet.max_row, self.worksheet.max_column)
+
+    @overrides
+    def last_row_of_block(self, column_number: int) -> int:
+        """Return the last row of the block of non-empty cells at the top of the column"""
+        row_number = 1
+        while self.value(row_number + 1, column_number) is not None:
+            row_number += 1
+        return row_number
+
+    @overrides
+    def value(self, row_number: int, column_number: int):
+        """Return the value of the cell (the last saved result of a formula)"""
+        cell = _cells(self.worksheet).get((row_number, column_number))
+        value = None if cell is None else cell.value
+        if is_formula(value):
+            value = self.workbook.formula_result(self._formula_results_title,
+                                                 row_number, column_number)
+        return value
+
+    @overrides
+    def formula(self, row_number: int, column_number: int) -> str:
+        """Return the formula (or the constant as text) of the cell"""
+        cell = _cells(self.worksheet).get((row_number, column_number))
+        value = None if cell is None else getattr(cell.value, "text", cell.value)
+        return "" if value is None else str(value)
+
+    @overrides
+    def write(self, first_cell: tuple, rows: List[list]):
+        """Write the rows of values from the `first_cell` on"""
+        for (row_number, values) in enumerate(rows, first_cell[0]):
+            for (column_number, value) in enumerate(values, first_cell[1]):
+                self.worksheet.cell(row_number, column_number).value = value
+
+    @overrides
+    def format(self, cells: List[tuple], formatter: ValueAndFormat):
+        """Format the cells one by one (it's all in memory)"""
+        for cell in cells:
+            formatter.format_cell_openpyxl(self.worksheet.cell(*cell))
+
+    @overrides
+    def copy_row(self, source_row_number: int, destination_row_number: int):
+        """Copy a row (with its formulas and formats) over another one"""
+        for column_number in range(1, self.worksheet.max_column + 1):
+            _copy_cell(self.worksheet, (source_row_number, column_number),
+                       (destination_row_number, column_number))
+        row_dimensions = self.worksheet.row_dimensions
+        row_dimensions[destination_row_number].height = row_dimensions[source_row_number].height
+
+    @overrides
+    def insert_columns(self, column_number: int, count: int):
+        """Insert `count` empty columns before the column (the rest shift to the right)"""
+        self.worksheet.insert_cols(column_number, count)
+        for worksheet in self.workbook.book.worksheets:
+            for cell in _cells(worksheet).values():
+                if is_formula(cell.value):
+                    cell.value = _shift_columns_in_formula(cell.value, worksheet.title,
+                                                           self.name, column_number, count)
+        self._formula_results_title = None
+
+    @overrides
+    def copy_columns(self, source_column_number: int, destination_column_number: int,
+                     count: int):
+        """Copy `count` columns (with their formulas, formats and widths) over other ones"""
+        for column_offset in range(count):
+            (source_column, destination_column) = (source_column_number + column_offset,
+                                                   destination_column_number + column_offset)
+            for row_number in range(1, self.worksheet.max_row + 1):
+                _copy_cell(self.worksheet, (row_number, source_column),
+                           (row_number, destination_column))
+            column_dimensions = self.worksheet.column_dimensions
+            column_dimensions[get_column_letter(destination_column)].width = \
+                column_dimensions[get_column_letter(source_column)].width
+
+
+class XlsxWorkbook:
+    """The .xlsx workbook loaded into memory by openpyxl (see XlsxSheet)"""
+
+    def __init__(self, file: str, read_only: bool):
+        self.file = file
+        self.read_only = read_only
+        self.book = openpyxl.load_workbook(file, keep_vba=file.lower().endswith(".xlsm"))
+        self._formula_results_book = None
+        self._sheet_of_worksheet = {}
+
+    def _wrap(self, worksheet, formula_results_title: str = None) -> XlsxSheet:
+        """Return the (only) XlsxSheet of the openpyxl `worksheet`"""
+        if worksheet not in self._sheet_of_worksheet:
+            self._sheet_of_worksheet[worksheet] = XlsxSheet(self, worksheet,
+                                                            formula_results_title)
+        return self._sheet_of_worksheet[worksheet]
+
+    def sheets(self) -> List[XlsxSheet]:
+        """Return the sheets in the workbook's order"""
+        return [self._wrap(worksheet, worksheet.title) for worksheet in self.book.worksheets]
+
+    def sheet(self, name: str) -> XlsxSheet:
+        """Return the named sheet or raise a KeyError"""
+        worksheet = self.book[name]
+        return self._wrap(worksheet, worksheet.title)
+
+    def formula_result(self, sheet_title: str, row_number: int, column_number: int):
+        """Return the result of a formula Excel saved last time (None if it's unknown)
+        The results are only loaded (from the file again) when they are needed first.
+        """
+        result = None
+        if sheet_title is not None:
+            if self._formula_results_book is None:
+                self._formula_results_book = openpyxl.load_workbook(self.file, data_only=True)
+            if sheet_title in self._formula_results_book:
+                cell = _cells(self._formula_results_book[sheet_title]).get(
+                    (row_number, column_number))
+                result = None if cell is None else cell.value
+        return result
+
+    def copy_sheet(self, source: XlsxSheet, before_this_sheet: XlsxSheet, name: str) -> XlsxSheet:
+        """Create a copy of a sheet before another sheet
+        (only the cells, the styles and the dimensions are copied, the images and
+        the charts are not)
+        """
+        worksheet = self.book.copy_worksheet(source.worksheet)
+        worksheet.title = name
+        self.book.move_sheet(worksheet, self.book.index(before_this_sheet.worksheet)
+                             - self.book.index(worksheet))
+        return self._wrap(worksheet)
+
+    def begin(self):
+        """There's no application to suspend, openpyxl doesn't calculate anything"""
+
+    def end(self):
+        """There's no application to restore (see begin)"""
+
+    def flush(self):
+        """Everything is in memory already (see save)"""
+
+    def save(self):
+        """Save the workbook into its file (unless it's read-only), so that Excel
+        recalculates it when it's opened next time
+        """
+        if not self.read_only:
+            self.book.calculation.fullCalcOnLoad = True
+            self.book.save(self.file)
+
+    def discard(self):
+        """Nothing was written to the file yet, the changes are just dropped"""